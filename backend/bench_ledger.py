@@ -0,0 +1,93 @@
+"""
+Benchmark de concurrencia del ledger de préstamos (SQLite WAL).
+
+Muchos hilos intentan prestar y devolver copias de un conjunto pequeño de
+títulos "populares" a la vez. Al final se verifica que ningún título tenga
+más préstamos abiertos que copias, y se reporta el throughput y la latencia
+de cada operación.
+
+Uso:
+    python bench_ledger.py [hilos] [operaciones_por_hilo]   (default: 32 500)
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from agents.ledger import LoanLedger
+from agents.search_index import title_key
+
+N_THREADS = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+OPS_PER_THREAD = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+HOT_TITLES = [f"Libro popular {i}" for i in range(5)]
+COPIES_PER_TITLE = 3
+
+db_path = os.path.join(tempfile.mkdtemp(), "ledger.db")
+ledger = LoanLedger(db_path)
+for title in HOT_TITLES:
+    ledger.add_copies(title, COPIES_PER_TITLE)
+
+latencies = []
+loans_ok = 0
+loans_rejected = 0
+lock = threading.Lock()
+
+
+def worker(worker_id: int):
+    global loans_ok, loans_rejected
+    rng = random.Random(worker_id)
+    my_loans = []
+    local_latencies = []
+    ok = rejected = 0
+    for _ in range(OPS_PER_THREAD):
+        start = time.perf_counter()
+        if my_loans and rng.random() < 0.5:
+            ledger.return_loan(my_loans.pop())
+        else:
+            loan = ledger.checkout(f"user{worker_id}", title_key(rng.choice(HOT_TITLES)))
+            if loan:
+                my_loans.append(loan["loan_id"])
+                ok += 1
+            else:
+                rejected += 1
+        local_latencies.append(time.perf_counter() - start)
+    with lock:
+        latencies.extend(local_latencies)
+        loans_ok += ok
+        loans_rejected += rejected
+
+
+print(f"{N_THREADS} hilos x {OPS_PER_THREAD} operaciones sobre {len(HOT_TITLES)} títulos "
+      f"({COPIES_PER_TITLE} copias c/u)")
+start = time.perf_counter()
+threads = [threading.Thread(target=worker, args=(i,)) for i in range(N_THREADS)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+elapsed = time.perf_counter() - start
+
+# Verificación: nunca más préstamos abiertos que copias
+conn = ledger.conn()
+over_lent = conn.execute(
+    "SELECT book_key, COUNT(*) FROM loans WHERE returned_at IS NULL "
+    "GROUP BY book_key HAVING COUNT(*) > ?", (COPIES_PER_TITLE,)
+).fetchall()
+mismatched = conn.execute(
+    "SELECT COUNT(*) FROM copies c WHERE (c.status = 'loaned') != EXISTS ("
+    "SELECT 1 FROM loans l WHERE l.copy_id = c.id AND l.returned_at IS NULL)"
+).fetchone()[0]
+
+latencies.sort()
+total_ops = len(latencies)
+print("=" * 50)
+print(f"Operaciones: {total_ops} en {elapsed:.2f}s ({total_ops / elapsed:,.0f} ops/s)")
+print(f"Préstamos concedidos: {loans_ok}, rechazados sin copia: {loans_rejected}")
+print(f"p50: {latencies[total_ops // 2] * 1000:.3f} ms")
+print(f"p99: {latencies[int(total_ops * 0.99)] * 1000:.3f} ms")
+print(f"Títulos sobre-prestados: {len(over_lent)}  Copias inconsistentes: {mismatched}")
@@ -0,0 +1,83 @@
+"""
+Benchmark del índice de búsqueda del catálogo (search_book).
+
+Genera un catálogo sintético, construye el índice y mide la latencia de
+búsqueda (p50/p99) con consultas por título, autor, prefijo y con errores.
+
+Uso:
+    python bench_search.py [numero_de_libros]   (default: 1000000)
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from agents.catalog import Book
+from agents.search_index import CatalogIndex
+
+N_BOOKS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+N_QUERIES = 2000
+SYLLABLES = ["ma", "ri", "ca", "lo", "te", "so", "na", "da", "ve", "ro", "gar", "mar", "quez", "ción", "ñe", "lí"]
+SECTIONS = ["Ficción", "Técnica", "Clásicos", "Historia", "Poesía", "Filosofía"]
+STATUSES = ["Disponible", "Prestado", "Reservado"]
+
+random.seed(42)
+
+
+def word() -> str:
+    return "".join(random.choice(SYLLABLES) for _ in range(random.randint(2, 4)))
+
+
+# Vocabulario con distribución tipo Zipf (pocas palabras muy frecuentes)
+vocab = [word() for _ in range(50_000)]
+weights = [1 / (rank + 1) for rank in range(len(vocab))]
+authors = [f"{word().title()} {word().title()}" for _ in range(20_000)]
+
+print(f"Generando {N_BOOKS:,} libros...")
+titles = random.choices(vocab, weights=weights, k=N_BOOKS * 3)
+books = [
+    Book(
+        " ".join(titles[i * 3:i * 3 + random.randint(1, 3)]).capitalize(),
+        random.choice(authors),
+        f"Sección {random.choice(SECTIONS)}, Estante {random.randint(1, 20)}, Nivel {random.randint(1, 5)}",
+        random.choice(STATUSES),
+    )
+    for i in range(N_BOOKS)
+]
+
+start = time.perf_counter()
+index = CatalogIndex(books)
+print(f"Índice construido en {time.perf_counter() - start:.1f}s")
+
+
+def make_query() -> str:
+    book = random.choice(books)
+    kind = random.random()
+    if kind < 0.4:
+        return book.title
+    if kind < 0.7:
+        return book.author.split()[-1].lower()
+    if kind < 0.9:
+        return book.title.split()[0][:4]
+    # Error de tipeo: se omite una letra
+    term = book.title.split()[0]
+    pos = random.randrange(len(term))
+    return term[:pos] + term[pos + 1:]
+
+
+queries = [make_query() for _ in range(N_QUERIES)]
+latencies = []
+for query in queries:
+    start = time.perf_counter()
+    index.search(query, limit=10)
+    latencies.append(time.perf_counter() - start)
+
+latencies.sort()
+print("=" * 50)
+print(f"Consultas: {N_QUERIES}")
+print(f"p50: {latencies[len(latencies) // 2] * 1000:.2f} ms")
+print(f"p95: {latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms")
+print(f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
@@ -11,20 +11,120 @@ Este módulo implementa un agente con:
 - Integración con herramientas
 """
 
+import json
 import re
 import sys
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Iterator, Generator, Optional
 from agents.tools import AGENT_TOOLS
+from agents.tool_registry import get_tool_registry, ToolSpec, ToolInputError
+from agents.tool_cache import get_tool_cache
+from agents.semantic_cache import get_semantic_cache
 from agents.memory import get_session_memory, get_semantic_memory
-from models.llm import get_llm
+from agents.fast_path import match_intent, predict_actions, render_answer, FAST_PATH_THRESHOLD
+from agents.speculation import Speculation, SPECULATION_ENABLED
+from agents.observation_encoder import encode_observation
+from models.llm import get_llm, get_chat_llm, LLM_MODEL, LLM_SMALL_MODEL
+from models.token_budget import PromptSection, count_tokens, get_token_budget, record_budget
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, AIMessage
 from monitoring.metrics import get_metrics_collector
 from monitoring.logger import get_logger
 
 
+# Prompt de sistema ReAct; se mantiene constante para que Ollama reutilice su caché KV
+REACT_SYSTEM_PROMPT = """Eres BiblioAgent, un asistente inteligente de biblioteca con memoria conversacional.
+
+IMPORTANTE: 
+- Debes RECORDAR información personal del usuario como nombre, edad, preferencias, problemas que te haya contado, etc.
+- Si el usuario menciona datos personales (nombre, edad, problemas, intereses), GUÁRDALOS en tu memoria para referencias futuras
+- Usa esta información en tus respuestas para personalizar la experiencia
+
+Tu tarea es:
+1. Extraer información personal del usuario de sus mensajes
+2. Analizar la pregunta del usuario
+3. Decidir qué herramientas necesitas usar
+4. Ejecutar las herramientas necesarias
+5. Responder de manera clara, útil y PERSONALIZADA usando la información que recuerdes del usuario
+
+Herramientas disponibles (argumentos en JSON):
+""" + get_tool_registry().prompt_block() + """
+
+Formato de razonamiento:
+Thought: [tu razonamiento sobre qué hacer]
+Action: [nombre_herramienta]
+Action Input: {"argumento": valor} (objeto JSON con los argumentos de la herramienta, en una línea)
+(puedes escribir varios pares Action/Action Input seguidos si las consultas son independientes)
+Observation: [resultado de la acción]
+... (repetir si es necesario)
+Final Answer: [respuesta final al usuario]
+
+Si preguntan por varios libros, usa las herramientas de varios elementos en una sola acción.
+Si no necesitas herramientas, responde directamente."""
+
+# La observación la escribe el agente, no el modelo: se corta la generación ahí
+REACT_STOP_SEQUENCES = ["Observation:"]
+
+# Estimación inicial de tokens de una generación sin corte (se ajusta en línea)
+DEFAULT_FULL_GENERATION_TOKENS = 256
+
+# Estimación inicial de la latencia de una llamada al LLM, en segundos (se ajusta en línea)
+DEFAULT_LLM_LATENCY = float(os.environ.get("LLM_LATENCY_ESTIMATE", "5"))
+LLM_LATENCY_ALPHA = 0.2
+
+# Cierre de la observación cuando el plazo del request solo admite una llamada más
+FORCE_FINAL_PROMPT = (
+	"Se acabó el tiempo para usar herramientas. Responde ahora con \"Final Answer:\" "
+	"usando solo las observaciones anteriores."
+)
+# Cierre de la observación cuando la ventana de contexto no admite más observaciones
+CONTEXT_FULL_PROMPT = (
+	"No queda espacio para más herramientas. Responde ahora con \"Final Answer:\" "
+	"usando solo las observaciones anteriores."
+)
+DEADLINE_TEMPLATE_INTRO = "No alcancé a completar el análisis a tiempo; esto es lo que encontré:"
+DEADLINE_NO_DATA_ANSWER = (
+	"No alcancé a responder a tiempo porque el sistema está con alta demanda. "
+	"Por favor intenta nuevamente en unos momentos."
+)
+
+# Tokens de la ventana de contexto que se dejan libres para los pasos y observaciones ReAct
+REACT_STEPS_RESERVE = int(os.environ.get("REACT_STEPS_RESERVE", "1024"))
+# Con menos tokens libres que esto, el siguiente paso debe ser la respuesta final
+MIN_OBSERVATION_TOKENS = 64
+
+# Ejecución concurrente de las acciones de un mismo paso ReAct
+TOOL_WORKERS = int(os.environ.get("TOOL_WORKERS", "4"))
+DEFAULT_TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "10"))
+TOOL_TIMEOUTS = {
+	'search_books_batch': 20.0,
+	'check_availability_many': 20.0,
+}
+
+# Herramientas de solo lectura: pueden ejecutarse en paralelo entre sí.
+# Las que escriben en el ledger se ejecutan una tras otra, en el orden pedido.
+PARALLEL_SAFE_TOOLS = frozenset([
+	'search_book', 'check_availability', 'check_availability_many',
+	'search_books_batch', 'calculate_fine', 'get_policies'
+])
+
+_tool_pool: Optional[ThreadPoolExecutor] = None
+_tool_pool_lock = threading.Lock()
+
+def _get_tool_pool() -> ThreadPoolExecutor:
+	"""Pool de hilos compartido para ejecutar herramientas."""
+	global _tool_pool
+	if _tool_pool is None:
+		with _tool_pool_lock:
+			if _tool_pool is None:
+				_tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+	return _tool_pool
+
+
 class LibraryAgent:
 	"""
 	Agente inteligente para gestión de biblioteca con capacidad de:
@@ -36,17 +136,35 @@ class LibraryAgent:
 	
 	def __init__(self):
 		self.llm = get_llm()
+		self.chat_llm = get_chat_llm()
+		# Cascada de modelos: el pequeño elige acciones y planifica; el grande
+		# redacta la respuesta final y toma el paso si el pequeño falla
+		self.cascade = bool(LLM_SMALL_MODEL) and LLM_SMALL_MODEL != LLM_MODEL
+		if self.cascade:
+			self.small_llm = get_llm(LLM_SMALL_MODEL)
+			self.small_chat_llm = get_chat_llm(LLM_SMALL_MODEL)
+		# Modo JSON: solo para reparar argumentos de acciones mal formados
+		self.json_llm = get_chat_llm(format="json", temperature=0)
 		self.tools = {tool['name']: tool['func'] for tool in AGENT_TOOLS}
+		self.registry = get_tool_registry()
+		self.tool_cache = get_tool_cache()
+		self.semantic_cache = get_semantic_cache()
 		self.memory = get_session_memory()
 		self.semantic_memory = get_semantic_memory()
 		self.plan = []
 		self.max_iterations = 5
+		self.full_generation_tokens = float(DEFAULT_FULL_GENERATION_TOKENS)
+		self.llm_latency = DEFAULT_LLM_LATENCY
+		# Los promedios móviles se actualizan desde requests concurrentes
+		self._stats_lock = threading.Lock()
+		self.fast_path_threshold = FAST_PATH_THRESHOLD
+		self.token_budget = get_token_budget()
 		
 		# Sistema de observabilidad
 		self.metrics = get_metrics_collector()
 		self.logger = get_logger()
 	
-	def think(self, question: str) -> str:
+	def think(self, question: str, deadline: Optional[float] = None) -> str:
 		"""
 		IE3, IE4, IE6: Memoria, Contexto y Toma de decisiones adaptativas
 		
@@ -54,61 +172,36 @@ class LibraryAgent:
 		1. Qué herramientas necesita usar
 		2. En qué orden ejecutarlas
 		3. Cómo adaptarse a las respuestas de las herramientas
+		4. Cuándo dejar de razonar para responder dentro del plazo
 		
 		Args:
 			question: Pregunta del usuario
+			deadline: Plazo del request (timestamp de time.time()); None = sin plazo
 		
 		Returns:
 			Respuesta final del agente
 		"""
-		# Construir contexto con memoria (IE3, IE4)
-		context = self.memory.build_context_string()
-		
-		# Prompt con patrón ReAct mejorado para memoria
-		system_prompt = """Eres BiblioAgent, un asistente inteligente de biblioteca con memoria conversacional.
-
-IMPORTANTE: 
-- Debes RECORDAR información personal del usuario como nombre, edad, preferencias, problemas que te haya contado, etc.
-- Si el usuario menciona datos personales (nombre, edad, problemas, intereses), GUÁRDALOS en tu memoria para referencias futuras
-- Usa esta información en tus respuestas para personalizar la experiencia
-
-Tu tarea es:
-1. Extraer información personal del usuario de sus mensajes
-2. Analizar la pregunta del usuario
-3. Decidir qué herramientas necesitas usar
-4. Ejecutar las herramientas necesarias
-5. Responder de manera clara, útil y PERSONALIZADA usando la información que recuerdes del usuario
-
-Herramientas disponibles:
-- search_book(termino): Buscar libros
-- check_availability(titulo): Verificar disponibilidad
-- create_loan(user_id, titulo): Crear préstamo
-- calculate_fine(dias): Calcular multa
-- get_policies(consulta): Consultar políticas
-- reserve_book(user_id, titulo): Reservar libro
-
-Formato de razonamiento:
-Thought: [tu razonamiento sobre qué hacer]
-Action: [nombre_herramienta]
-Action Input: [parámetros]
-Observation: [resultado de la acción]
-... (repetir si es necesario)
-Final Answer: [respuesta final al usuario]
-
-Si no necesitas herramientas, responde directamente."""
-		
-		user_prompt = f"""Contexto de conversaciones anteriores:
-{context if context else "Primera conversación - no hay contexto previo"}
-
-Pregunta del usuario: {question}
-
-Responde siguiendo el patrón ReAct y RECUERDA información importante del usuario."""
-		
-		# Ejecutar el LLM con ReAct
-		response = self._execute_react(f"{system_prompt}\n\n{user_prompt}")
-		
-		# Extraer la respuesta final (sin Thought/Action/Observation)
-		final_answer = self._extract_final_answer(response)
+		# IE6: Consultas de una sola herramienta se responden sin LLM
+		fast = self._try_fast_path(question)
+		if fast:
+			final_answer = fast['answer']
+		else:
+			# Paráfrasis de una pregunta ya respondida: se reutiliza la respuesta
+			final_answer, vector = self._semantic_lookup(question)
+			if final_answer is None:
+				start_time = time.time()
+				
+				# Anticipar las herramientas probables mientras el LLM genera
+				speculation = self._speculate(question)
+				
+				# Ejecutar el LLM con ReAct
+				messages, budget = self._build_messages(question)
+				response, tools_used, deadline_hit = self._execute_react(messages, deadline, speculation, budget)
+				
+				# Extraer la respuesta final (sin Thought/Action/Observation)
+				final_answer = self._extract_final_answer(response)
+				if not deadline_hit:
+					self._semantic_store(vector, question, final_answer, time.time() - start_time, tools_used)
 		
 		# IE3: Extraer información personal del usuario de la conversación
 		self._extract_user_info(question)
@@ -118,6 +211,147 @@ Responde siguiendo el patrón ReAct y RECUERDA información importante del usuar
 		
 		return final_answer
 	
+	def think_stream(self, question: str, deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+		"""
+		Versión en streaming de think().
+		
+		Emite los pasos intermedios ReAct como eventos estructurados y la
+		respuesta final token a token, a medida que Ollama la genera.
+		
+		Args:
+			question: Pregunta del usuario
+			deadline: Plazo del request (timestamp de time.time()); None = sin plazo
+		
+		Yields:
+			Eventos {'type': 'thought'|'action'|'observation'|'token'|'done', ...}
+		"""
+		fast = self._try_fast_path(question)
+		if fast:
+			yield {'type': 'action', 'tool': fast['tool'], 'input': fast['input']}
+			yield {'type': 'observation', 'tool': fast['tool'], 'text': fast['result']}
+			yield {'type': 'token', 'text': fast['answer']}
+			final_answer = fast['answer']
+		else:
+			final_answer, vector = self._semantic_lookup(question)
+			if final_answer is not None:
+				yield {'type': 'token', 'text': final_answer}
+			else:
+				start_time = time.time()
+				response = ""
+				tools_used = []
+				deadline_hit = None
+				speculation = self._speculate(question)
+				messages, budget = self._build_messages(question)
+				for event in self._react_events(messages, stream=True, deadline=deadline,
+				                                speculation=speculation, budget=budget):
+					if event['type'] == 'final':
+						response = event['text']
+						deadline_hit = event['deadline_hit']
+						continue
+					if event['type'] == 'action':
+						tools_used.append(event['tool'])
+					yield event
+				final_answer = self._extract_final_answer(response)
+				if not deadline_hit:
+					self._semantic_store(vector, question, final_answer, time.time() - start_time, tools_used)
+		
+		self._extract_user_info(question)
+		self.memory.save_context(question, final_answer)
+		
+		yield {'type': 'done', 'answer': final_answer}
+	
+	def _semantic_lookup(self, question: str) -> Tuple[Optional[str], Any]:
+		"""
+		Busca la respuesta de una pregunta equivalente ya respondida.
+		
+		Returns:
+			(respuesta cacheada o None, embedding de la pregunta para _semantic_store)
+		"""
+		if self.semantic_cache is None:
+			return None, None
+		return self.semantic_cache.lookup(question, self.memory)
+	
+	def _semantic_store(self, vector, question: str, answer: str, latency: float, tools_used: List[str]):
+		"""Guarda la respuesta en la caché semántica (si es reutilizable)."""
+		if self.semantic_cache is not None:
+			self.semantic_cache.store(vector, question, answer, latency, tools_used)
+	
+	def _speculate(self, question: str) -> Optional[Speculation]:
+		"""Lanza en segundo plano las herramientas que probablemente pedirá el modelo."""
+		if not SPECULATION_ENABLED:
+			return None
+		predicted = predict_actions(question)
+		if not predicted:
+			return None
+		return Speculation(self.registry, _get_tool_pool(), self._call_tool, predicted)
+	
+	def _try_fast_path(self, question: str) -> Optional[Dict[str, Any]]:
+		"""
+		IE6: Responde sin LLM si la consulta corresponde a una sola herramienta.
+		
+		Returns:
+			Dict con 'tool', 'input', 'result' y 'answer', o None si se debe
+			usar el flujo ReAct (sin coincidencia, confianza baja o la
+			herramienta no encontró resultados)
+		"""
+		intent = match_intent(question)
+		if not intent or intent['confidence'] < self.fast_path_threshold:
+			self.metrics.track_fast_path(False, intent['tool'] if intent else None,
+			                             intent['confidence'] if intent else 0.0)
+			return None
+		
+		result = self._execute_action({'tool': intent['tool'], 'input': intent['input']})
+		if result.startswith(("No se encontr", "No se pudo", "Error al ejecutar")):
+			# El LLM puede reformular la búsqueda: mejor que una respuesta vacía
+			self.metrics.track_fast_path(False, intent['tool'], intent['confidence'])
+			return None
+		
+		self.metrics.track_fast_path(True, intent['tool'], intent['confidence'])
+		return {
+			'tool': intent['tool'],
+			'input': intent['input'],
+			'result': result,
+			'answer': render_answer(intent['tool'], result)
+		}
+	
+	def _build_messages(self, question: str) -> Tuple[List[BaseMessage], Dict[str, Any]]:
+		"""
+		Construye los mensajes ReAct iniciales.
+		
+		El system prompt es constante: todo lo variable (memoria, pregunta)
+		va en el mensaje del usuario, de modo que el prefijo sea idéntico
+		entre requests y Ollama pueda reutilizar su caché KV.
+		
+		La memoria se ajusta al presupuesto de tokens dejando REACT_STEPS_RESERVE
+		libres para los pasos: primero se recorta el resumen de conversaciones
+		previas, luego el historial (desde los mensajes más antiguos) y por
+		último el perfil del usuario.
+		
+		Returns:
+			(mensajes, desglose de tokens por sección)
+		"""
+		# Construir contexto con memoria (IE3, IE4)
+		sections = self.memory.context_sections()
+		template = """Contexto de conversaciones anteriores:
+{context}
+
+Pregunta del usuario: {question}
+
+Responde siguiendo el patrón ReAct y RECUERDA información importante del usuario."""
+		texts, budget = self.token_budget.fit([
+			PromptSection('system', REACT_SYSTEM_PROMPT),
+			PromptSection('question', template.format(context="", question=question)),
+			PromptSection('profile', sections['profile'], value=3),
+			PromptSection('history', sections['history'], value=2, keep='tail'),
+			PromptSection('summary', sections['summary'], value=1, separator='. '),
+		], reserve=REACT_STEPS_RESERVE)
+		context = self.memory.format_context(texts)
+		
+		return [SystemMessage(content=REACT_SYSTEM_PROMPT), HumanMessage(content=template.format(
+			context=context if context else "Primera conversación - no hay contexto previo",
+			question=question
+		))], budget
+	
 	def _extract_user_info(self, user_message: str):
 		"""
 		IE3: Extrae información personal del usuario de sus mensajes.
@@ -198,75 +432,498 @@ Responde siguiendo el patrón ReAct y RECUERDA información importante del usuar
 		
 		return '\n'.join(clean_lines) if clean_lines else response
 	
-	def _execute_react(self, prompt: str) -> str:
+	def _execute_react(self, messages: List[BaseMessage], deadline: Optional[float] = None,
+	                   speculation: Optional[Speculation] = None,
+	                   budget: Optional[Dict[str, Any]] = None) -> Tuple[str, List[str], Optional[str]]:
 		"""
 		Ejecuta el patrón ReAct iterativamente.
 		
 		Args:
-			prompt: Prompt inicial
+			messages: Mensajes iniciales (system + usuario)
+			deadline: Plazo del request (timestamp); None = sin plazo
+			speculation: Herramientas anticipadas para la primera acción
+			budget: Desglose de tokens de los mensajes iniciales (_build_messages)
 		
 		Returns:
-			Respuesta final del agente
+			(respuesta final del agente, herramientas ejecutadas,
+			cómo se cortó por plazo: 'forced_final', 'templated' o None)
+		"""
+		response = ""
+		tools_used = []
+		deadline_hit = None
+		for event in self._react_events(messages, deadline=deadline, speculation=speculation, budget=budget):
+			if event['type'] == 'final':
+				response = event['text']
+				deadline_hit = event['deadline_hit']
+			elif event['type'] == 'action':
+				tools_used.append(event['tool'])
+		return response, tools_used, deadline_hit
+	
+	def _react_events(self, messages: List[BaseMessage], stream: bool = False,
+	                  deadline: Optional[float] = None,
+	                  speculation: Optional[Speculation] = None,
+	                  budget: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
 		"""
-		current_prompt = prompt
+		Bucle ReAct expresado como secuencia de eventos.
 		
-		for iteration in range(self.max_iterations):
-			# Obtener respuesta del LLM
-			llm_response = self.llm.invoke(current_prompt)
-			
-			# Verificar si hay acciones que ejecutar
-			action = self._parse_action(llm_response)
-			
-			if not action or "Final Answer" in llm_response:
-				# Extraer respuesta final
-				if "Final Answer:" in llm_response:
-					return llm_response.split("Final Answer:")[-1].strip()
-				return llm_response
-			
-			# Ejecutar acción
-			action_result = self._execute_action(action)
-			
-			# Actualizar prompt con observación
-			current_prompt += f"\n\nObservation: {action_result}"
+		Cada iteración agrega la respuesta del modelo como turno del asistente
+		y la observación como turno del usuario. Los mensajes previos no se
+		modifican, así que con la caché KV de Ollama cada paso solo paga los
+		tokens de la nueva observación.
+		
+		Con stream=True la parte "Final Answer:" se emite token a token
+		(eventos 'token'); el resto de la generación solo se usa para
+		decidir acciones.
+		
+		Con deadline, tras cada paso se compara el tiempo restante con la
+		latencia observada del LLM: si no cabe otro paso más la respuesta,
+		se pide la respuesta final con lo observado; si no cabe ni una
+		llamada, se responde con plantilla a partir de las observaciones.
+		
+		Las observaciones entran al prompt en forma compacta (tablas, campos
+		seleccionados, filas limitadas; ver observation_encoder).
+		
+		Con budget, las observaciones se recortan para no exceder la ventana
+		de contexto; si ya no queda espacio para otra observación, se pide la
+		respuesta final. Al terminar se registra el desglose de tokens.
+		
+		Args:
+			messages: Mensajes iniciales (system + usuario)
+			stream: Si generar con streaming desde Ollama
+			deadline: Plazo del request (timestamp); None = sin plazo
+			speculation: Herramientas anticipadas; se usan si la primera
+				generación pide alguna de ellas y el resto se descarta
+			budget: Desglose de tokens de los mensajes iniciales (_build_messages)
+		
+		Yields:
+			Eventos 'thought', 'action', 'observation', 'token' y uno 'final'
+			con la respuesta (sin procesar) del agente y 'deadline_hit'
+		"""
+		messages = list(messages)
+		llm_response = ""
+		observed: List[Tuple[str, str]] = []
+		force_final = False
+		context_full = False
+		if budget is not None:
+			budget['sections'].update(steps=0, observations=0)
+		
+		try:
+			for iteration in range(self.max_iterations):
+				# El modelo pequeño propone el paso; si responde o falla, se escala.
+				# Con observaciones ya reunidas lo esperable es la respuesta final,
+				# que redacta el grande: no se gasta una generación del pequeño
+				draft, escalation = None, None
+				if self.cascade and not (force_final or context_full or observed):
+					draft, escalation = self._draft_step(iteration, messages)
+				
+				if draft is not None:
+					llm_response, streamed = draft, False
+				else:
+					# Obtener respuesta del LLM
+					start_time = time.time()
+					if stream:
+						llm_response, streamed, info = yield from self._stream_generation(messages)
+					else:
+						llm_response, info = self._generate(messages)
+						streamed = False
+					self._track_llm_call(iteration, info, time.time() - start_time, 'large', escalation)
+					self._track_early_stop(llm_response, info)
+				
+				if budget is not None:
+					budget['sections']['steps'] += count_tokens(llm_response)
+					budget['total'] += count_tokens(llm_response)
+				
+				# Verificar si hay acciones que ejecutar
+				actions = self._parse_actions(llm_response)
+				prefetched = None
+				if speculation is not None:
+					# Solo la primera generación aprovecha las herramientas anticipadas
+					prefetched = speculation.settle([] if "Final Answer" in llm_response else actions)
+					speculation = None
+				
+				if not actions or "Final Answer" in llm_response or force_final or context_full:
+					# Extraer respuesta final
+					if "Final Answer:" in llm_response:
+						final = llm_response.split("Final Answer:")[-1].strip()
+					elif actions:
+						# Respuesta final forzada, pero el modelo volvió a pedir acciones
+						final = self._templated_answer(observed)
+					else:
+						final = llm_response
+					if stream and not streamed:
+						yield {'type': 'token', 'text': self._extract_final_answer(final)}
+					self.metrics.track_iterations(iteration + 1, True)
+					if force_final:
+						self.metrics.track_deadline('forced_final', iteration + 1, deadline - time.time())
+					yield {'type': 'final', 'text': final, 'deadline_hit': 'forced_final' if force_final else None}
+					return
+				
+				thought = re.search(r'Thought:\s*(.+)', llm_response)
+				if thought:
+					self.logger.log_thought(thought.group(1))
+					yield {'type': 'thought', 'text': thought.group(1).strip()}
+				for action in actions:
+					yield {'type': 'action', 'tool': action['tool'], 'input': action['input']}
+				
+				# Ejecutar acciones (las independientes en paralelo)
+				results = self._execute_actions(actions, prefetched)
+				for action, result in zip(actions, results):
+					observed.append((action['tool'], result))
+					yield {'type': 'observation', 'tool': action['tool'], 'text': result}
+				
+				mode = self._budget_mode(deadline)
+				if mode == 'template':
+					# No alcanza ni para una llamada más al LLM
+					final = self._templated_answer(observed)
+					if stream:
+						yield {'type': 'token', 'text': final}
+					self.metrics.track_iterations(iteration + 1, False)
+					self.metrics.track_deadline('templated', iteration + 1, deadline - time.time())
+					yield {'type': 'final', 'text': final, 'deadline_hit': 'templated'}
+					return
+				force_final = mode == 'final'
+				
+				# Al prompt va la versión compacta (los eventos llevan la salida original)
+				results = self._encode_observations(actions, results)
+				if budget is not None:
+					results = self._fit_observations(results, budget)
+					context_full = budget['limit'] - budget['total'] < MIN_OBSERVATION_TOKENS
+				
+				# Agregar el turno del modelo y todas las observaciones como mensajes nuevos
+				# (sin la "Observation:" que el modelo haya inventado, como en streaming)
+				messages.append(AIMessage(content=self._cut_hallucinated_observation(llm_response)))
+				messages.append(HumanMessage(content=(
+					f"{self._format_observations(actions, results)}\n\n" + (
+						FORCE_FINAL_PROMPT if force_final
+						else CONTEXT_FULL_PROMPT if context_full
+						else "Pensemos en el siguiente paso basándonos en esta observación."
+					)
+				)))
 			
-			# Solicitar siguiente pensamiento
-			current_prompt += "\n\nPensemos en el siguiente paso basándonos en esta observación."
+			# Si llegamos aquí, retornar última respuesta
+			self.metrics.track_iterations(self.max_iterations, False)
+			if stream:
+				yield {'type': 'token', 'text': self._extract_final_answer(llm_response)}
+			yield {'type': 'final', 'text': llm_response, 'deadline_hit': None}
+		finally:
+			if speculation is not None:
+				# Si el bucle terminó sin llegar a una acción, descartar lo anticipado
+				speculation.settle([])
+			if budget is not None:
+				record_budget('agent', budget)
+	
+	def _encode_observations(self, actions: List[Dict[str, Any]], results: List[str]) -> List[str]:
+		"""Codifica las salidas de un paso para el prompt y registra el tamaño antes y después."""
+		encoded = []
+		for action, result in zip(actions, results):
+			rendered = encode_observation(action['tool'], result)
+			self.metrics.track_observation(action['tool'], len(result), len(rendered),
+			                               count_tokens(result), count_tokens(rendered))
+			encoded.append(rendered)
+		return encoded
+	
+	def _fit_observations(self, results: List[str], budget: Dict[str, Any]) -> List[str]:
+		"""
+		Recorta las observaciones de un paso al espacio libre de la ventana de contexto.
+		
+		El espacio se reparte por igual entre las observaciones del paso; de
+		cada una se conserva el inicio. Actualiza el desglose de tokens.
+		"""
+		share = (budget['limit'] - budget['total']) // len(results)
+		fitted = []
+		for result in results:
+			text, dropped = self.token_budget.fit_text(result, share)
+			kept = count_tokens(text)
+			if dropped:
+				budget['trimmed']['observations'] = budget['trimmed'].get('observations', 0) + dropped
+			budget['sections']['observations'] += kept
+			budget['total'] += kept
+			fitted.append(text)
+		return fitted
+
+	def _budget_mode(self, deadline: Optional[float]) -> str:
+		"""
+		Decide cómo seguir según el tiempo restante hasta el plazo.
+		
+		Returns:
+			'continue' si caben otro paso y la respuesta final, 'final' si solo
+			cabe una llamada más al LLM, 'template' si no cabe ninguna
+		"""
+		if deadline is None:
+			return 'continue'
+		remaining = deadline - time.time()
+		if remaining >= 2 * self.llm_latency:
+			return 'continue'
+		if remaining >= self.llm_latency:
+			return 'final'
+		return 'template'
+	
+	def _templated_answer(self, observed: List[Tuple[str, str]]) -> str:
+		"""Respuesta sin LLM a partir de las observaciones obtenidas hasta ahora."""
+		if not observed:
+			return DEADLINE_NO_DATA_ANSWER
+		parts = [DEADLINE_TEMPLATE_INTRO]
+		for tool, result in observed:
+			rendered = render_answer(tool, result)
+			if rendered not in parts:
+				parts.append(rendered)
+		return "\n\n".join(parts)
+	
+	def _generate(self, messages: List[BaseMessage], llm=None) -> Tuple[str, Dict[str, Any]]:
+		"""
+		Genera una respuesta completa del modelo (por defecto, el grande).
+		
+		Returns:
+			(texto generado, metadatos de Ollama como prompt_eval_count)
+		"""
+		message = (llm or self.chat_llm).invoke(messages, stop=REACT_STOP_SEQUENCES)
+		return message.content, getattr(message, 'response_metadata', None) or {}
+	
+	def _draft_step(self, iteration: int, messages: List[BaseMessage]) -> Tuple[Optional[str], Optional[str]]:
+		"""
+		Genera un paso ReAct con el modelo pequeño.
+		
+		Solo se acepta si propone acciones válidas (herramienta existente y
+		argumentos que cumplen su esquema); la respuesta final al usuario
+		siempre la redacta el modelo grande. Se usa solo en los pasos previos
+		a la primera observación.
+		
+		Returns:
+			(respuesta del modelo pequeño o None si hay que escalar,
+			motivo del escalamiento: 'final_answer', 'parse_error' o 'error')
+		"""
+		start_time = time.time()
+		try:
+			draft, info = self._generate(messages, self.small_chat_llm)
+		except Exception as e:
+			self.logger.log_error('llm', type(e).__name__, f"{LLM_SMALL_MODEL}: {e}")
+			return None, 'error'
+		self._track_llm_call(iteration, info, time.time() - start_time, 'small')
+		
+		if "Final Answer" in draft:
+			return None, 'final_answer'
+		actions = self._parse_actions(draft)
+		if not actions or not all(self._valid_action(action) for action in actions):
+			return None, 'parse_error'
+		self._track_early_stop(draft, info)
+		return draft, None
+	
+	def _valid_action(self, action: Dict[str, Any]) -> bool:
+		"""Si la acción nombra una herramienta existente con argumentos válidos."""
+		spec = self.registry.get(action['tool'])
+		if spec is None:
+			return False
+		try:
+			spec.parse(action['input'])
+		except ToolInputError:
+			return False
+		return True
+	
+	def _stream_generation(self, messages: List[BaseMessage]) -> Generator[Dict[str, Any], None, Tuple[str, bool, Dict[str, Any]]]:
+		"""
+		Genera con streaming, emitiendo como 'token' solo lo que sigue a
+		"Final Answer:".
+		
+		Si el modelo ignora las stop sequences y empieza a inventar una
+		"Observation:", se corta el stream (lo que aborta la generación).
+		
+		Returns:
+			(texto completo generado, si se emitió alguna parte como token,
+			metadatos de Ollama del último fragmento)
+		"""
+		marker = "Final Answer:"
+		buffer = ""
+		start = -1  # Posición del buffer desde la que falta emitir
+		streamed = False
+		info: Dict[str, Any] = {}
+		
+		chunks = self.chat_llm.stream(messages, stop=REACT_STOP_SEQUENCES)
+		try:
+			for chunk in chunks:
+				buffer += chunk.content
+				info = getattr(chunk, 'response_metadata', None) or info
+				if start < 0:
+					idx = buffer.find(marker)
+					if idx == -1:
+						cut = self._cut_hallucinated_observation(buffer)
+						if cut != buffer:
+							buffer = cut
+							break
+						continue
+					start = idx + len(marker)
+				
+				text = buffer[start:]
+				if not streamed:
+					# Omitir espacios iniciales de la respuesta
+					text = text.lstrip()
+				if text:
+					yield {'type': 'token', 'text': text}
+					streamed = True
+					start = len(buffer)
+		finally:
+			chunks.close()
+		
+		return buffer, streamed, info
+	
+	def _track_llm_call(self, iteration: int, info: Dict[str, Any], latency: float,
+	                    tier: str = 'large', escalation: Optional[str] = None):
+		"""
+		Registra los tokens de prompt/completion informados por Ollama y
+		actualiza la latencia estimada de una llamada (para los plazos).
+		
+		Args:
+			tier: Nivel de la cascada que respondió ('small' o 'large')
+			escalation: Motivo por el que el paso pasó del modelo pequeño al grande
+		"""
+		if info.get('cache_hit'):
+			# Respondida desde la caché de completions: no hubo llamada al modelo
+			return
+		with self._stats_lock:
+			self.llm_latency += LLM_LATENCY_ALPHA * (latency - self.llm_latency)
+		prompt_tokens = info.get('prompt_eval_count', 0) or 0
+		completion_tokens = info.get('eval_count', 0) or 0
+		self.metrics.track_llm_call(iteration, prompt_tokens, completion_tokens, latency, {'tier': tier})
+		self.metrics.track_model_call(tier, 'react', latency, prompt_tokens, completion_tokens, escalation)
+	
+	def _track_early_stop(self, response: str, info: Dict[str, Any]):
+		"""
+		Estima los tokens ahorrados al cortar la generación tras la acción.
+		
+		Las generaciones que terminan con normalidad (respuesta final) ajustan
+		un promedio móvil de su largo; las cortadas tras "Action Input:"
+		ahorran la diferencia entre ese promedio y lo que sí se generó.
+		"""
+		generated = info.get('eval_count', 0) or 0
+		if not generated:
+			return
 		
-		# Si llegamos aquí, retornar última respuesta
-		return llm_response
+		if "Action Input:" in response and "Final Answer" not in response:
+			saved = max(0, int(self.full_generation_tokens - generated))
+			self.metrics.track_early_stop(generated, saved)
+		else:
+			with self._stats_lock:
+				self.full_generation_tokens = 0.8 * self.full_generation_tokens + 0.2 * generated
+	
+	def _cut_hallucinated_observation(self, response: str) -> str:
+		"""Descarta todo lo que el modelo haya escrito desde su propia "Observation:"."""
+		idx = response.find("Observation:")
+		if idx == -1 or "Action:" not in response[:idx]:
+			return response
+		return response[:idx].rstrip()
 	
-	def _parse_action(self, response: str) -> Dict[str, Any]:
+	def _parse_actions(self, response: str) -> List[Dict[str, Any]]:
 		"""
-		Extrae acción de la respuesta del LLM.
+		Extrae todas las acciones de la respuesta del LLM.
+		
+		Cada "Action:" toma el "Action Input:" que le sigue antes de la
+		próxima acción; si es un objeto JSON puede ocupar varias líneas.
+		Las acciones repetidas se ejecutan una sola vez.
 		
 		Args:
 			response: Respuesta del LLM
 		
 		Returns:
-			Dict con 'tool' y 'input' o None
+			Lista de dicts con 'tool' y 'input' (vacía si no hay acciones)
 		"""
-		# Buscar patrón "Action: tool_name"
-		action_match = re.search(r'Action:\s*(\w+)', response)
-		if not action_match:
-			return None
+		response = self._cut_hallucinated_observation(response)
 		
-		tool_name = action_match.group(1)
+		# Buscar patrones "Action: tool_name"
+		matches = list(re.finditer(r'Action:\s*(\w+)', response))
+		actions = []
+		seen = set()
+		for i, match in enumerate(matches):
+			end = matches[i + 1].start() if i + 1 < len(matches) else len(response)
+			action = (match.group(1), self._action_input(response[match.end():end]))
+			if action not in seen:
+				seen.add(action)
+				actions.append({'tool': action[0], 'input': action[1]})
+		return actions
+	
+	def _action_input(self, segment: str) -> str:
+		"""Texto del "Action Input:" de un segmento (objeto JSON completo o una línea)."""
+		input_match = re.search(r'Action Input:[ \t]*', segment)
+		if not input_match:
+			return ""
+		rest = segment[input_match.end():]
+		if rest.lstrip().startswith('{'):
+			rest = rest.lstrip()
+			try:
+				_, end = json.JSONDecoder().raw_decode(rest)
+				return rest[:end]
+			except ValueError:
+				pass
+		return rest.split('\n', 1)[0].strip()
+	
+	def _execute_actions(self, actions: List[Dict[str, Any]], prefetched: Optional[List[Any]] = None) -> List[str]:
+		"""
+		Ejecuta las acciones de un paso ReAct.
 		
-		# Buscar input
-		input_match = re.search(r'Action Input:\s*(.+)', response)
-		action_input = input_match.group(1).strip() if input_match else ""
+		Las herramientas de solo lectura corren en paralelo en el pool de
+		herramientas; las que escriben, una tras otra. Cada acción tiene su
+		propio tiempo límite (TOOL_TIMEOUTS), también si es la única del paso.
 		
-		return {
-			'tool': tool_name,
-			'input': action_input
+		Args:
+			actions: Acciones del paso
+			prefetched: Por cada acción, el Future de su ejecución anticipada o None
+		
+		Returns:
+			Resultados en el mismo orden que las acciones
+		"""
+		prefetched = prefetched or [None] * len(actions)
+		
+		pool = _get_tool_pool()
+		request = self.metrics.current_request
+		
+		def run(action):
+			# El request en curso de las métricas es por hilo
+			self.metrics.current_request = request
+			try:
+				return self._execute_action(action)
+			finally:
+				self.metrics.current_request = None
+		
+		futures = {
+			i: (pool.submit(run, action), time.time())
+			for i, action in enumerate(actions)
+			if action['tool'] in PARALLEL_SAFE_TOOLS and prefetched[i] is None
 		}
+		results = [None] * len(actions)
+		for i, action in enumerate(actions):
+			if prefetched[i] is not None:
+				results[i] = self._execute_action(action, prefetched[i])
+			elif i not in futures:
+				results[i] = self._wait_action(action, pool.submit(run, action), time.time())
+		for i, (future, submitted) in futures.items():
+			results[i] = self._wait_action(actions[i], future, submitted)
+		return results
 	
-	def _execute_action(self, action: Dict[str, Any]) -> str:
+	def _wait_action(self, action: Dict[str, Any], future, submitted: float) -> str:
+		"""Espera el resultado de una acción hasta su tiempo límite."""
+		timeout = TOOL_TIMEOUTS.get(action['tool'], DEFAULT_TOOL_TIMEOUT)
+		try:
+			return future.result(timeout=max(0.0, submitted + timeout - time.time()))
+		except FutureTimeoutError:
+			self.metrics.track_tool(action['tool'], timeout, False, action['input'], "timeout")
+			self.metrics.track_error('tool', 'TimeoutError', f"{action['tool']}: sin respuesta en {timeout:g}s")
+			self.logger.log_error('tool', 'TimeoutError', f"{action['tool']}: sin respuesta en {timeout:g}s")
+			return f"Error al ejecutar {action['tool']}: sin respuesta en {timeout:g}s"
+	
+	def _format_observations(self, actions: List[Dict[str, Any]], results: List[str]) -> str:
+		"""Observaciones de un paso en un solo mensaje, numeradas si son varias."""
+		if len(actions) == 1:
+			return f"Observation: {results[0]}"
+		return "\n".join(
+			f"Observation {i} ({action['tool']}: {action['input']}): {result}"
+			for i, (action, result) in enumerate(zip(actions, results), 1)
+		)
+	
+	def _execute_action(self, action: Dict[str, Any], prefetched=None) -> str:
 		"""
 		Ejecuta una acción usando las herramientas disponibles.
 		
 		Args:
 			action: Dict con 'tool' (nombre) y 'input' (parámetros)
+			prefetched: Future de la misma llamada lanzada de forma especulativa
 		
 		Returns:
 			Resultado de la acción
@@ -284,12 +941,16 @@ Responde siguiendo el patrón ReAct y RECUERDA información importante del usuar
 		try:
 			# Ejecutar herramienta con input parseado
 			start_time = time.time()
-			result = self._call_tool(tool_name, tool_input)
+			if prefetched is not None:
+				# Ya en curso (o terminada) desde antes de la primera generación
+				result, cache_hit = prefetched.result(timeout=TOOL_TIMEOUTS.get(tool_name, DEFAULT_TOOL_TIMEOUT))
+			else:
+				result, cache_hit = self._call_tool(tool_name, tool_input)
 			end_time = time.time()
 			latency = end_time - start_time
 			
 			# Registrar ejecución exitosa de herramienta
-			self.metrics.track_tool(tool_name, latency, True, tool_input, result)
+			self.metrics.track_tool(tool_name, latency, True, tool_input, result, cache_hit)
 			self.logger.log_observation(tool_name, result, latency)
 			
 			return result
@@ -305,31 +966,69 @@ Responde siguiendo el patrón ReAct y RECUERDA información importante del usuar
 			
 			return f"Error al ejecutar {tool_name}: {error_msg}"
 	
-	def _call_tool(self, tool_name: str, tool_input: str) -> str:
+	def _call_tool(self, tool_name: str, tool_input: str) -> Tuple[str, Optional[bool]]:
 		"""
-		Llama a una herramienta con input parseado.
+		Llama a una herramienta con argumentos validados según su esquema.
+		
+		Si el input no cumple el esquema, se pide al LLM en modo JSON que lo
+		convierta, en lugar de gastar una iteración ReAct completa. Los
+		resultados de herramientas cacheables se sirven desde la caché.
 		
 		Args:
 			tool_name: Nombre de la herramienta
-			tool_input: Input en formato string
+			tool_input: Input en formato string (objeto JSON o separado por comas)
 		
 		Returns:
-			Resultado de la herramienta
+			(resultado, acierto de caché: True/False, o None si no es cacheable)
 		"""
-		tool_func = self.tools[tool_name]
+		spec = self.registry.get(tool_name)
+		try:
+			arguments = spec.parse(tool_input)
+		except ToolInputError as e:
+			arguments = self._repair_tool_input(spec, tool_input, e)
 		
-		# Parsear input simple
-		inputs = [s.strip() for s in tool_input.split(',')]
+		if not self.tool_cache.cacheable(tool_name):
+			return self.tools[tool_name](**arguments), None
 		
-		# Llamar a la herramienta
-		if len(inputs) == 1:
-			return tool_func(inputs[0])
-		elif len(inputs) == 2:
-			return tool_func(inputs[0], inputs[1])
-		elif len(inputs) == 3:
-			return tool_func(inputs[0], inputs[1], int(inputs[2]) if inputs[2].isdigit() else inputs[2])
-		else:
-			return tool_func(*inputs)
+		cached = self.tool_cache.get(tool_name, arguments)
+		if cached is not None:
+			return cached, True
+		
+		generation = self.tool_cache.generation
+		result = self.tools[tool_name](**arguments)
+		self.tool_cache.put(tool_name, arguments, result, generation)
+		return result, False
+	
+	def _repair_tool_input(self, spec: ToolSpec, tool_input: str, error: ToolInputError) -> Dict[str, Any]:
+		"""
+		Convierte un input inválido en argumentos con el LLM restringido a JSON.
+		
+		Raises:
+			ToolInputError: si la salida tampoco cumple el esquema (el mensaje
+			incluye los argumentos esperados, para la siguiente iteración)
+		"""
+		messages = [
+			SystemMessage(content="Convierte la entrada en un objeto JSON con los argumentos de la herramienta, "
+			                      "según el esquema. Responde solo con el JSON."),
+			HumanMessage(content=(
+				f"Herramienta: {spec.name}\n"
+				f"Esquema: {json.dumps(spec.schema, ensure_ascii=False)}\n"
+				f"Entrada: {tool_input}\n"
+				f"Error: {error}"
+			))
+		]
+		start_time = time.time()
+		try:
+			arguments = json.loads(self.json_llm.invoke(messages).content)
+			if not isinstance(arguments, dict):
+				raise ToolInputError("la salida no es un objeto JSON")
+			arguments = spec.validate(arguments)
+		except Exception:
+			self.metrics.track_action_repair(spec.name, False, time.time() - start_time)
+			raise ToolInputError(f"{error}. Argumentos esperados: {spec.signature_hint()}")
+		
+		self.metrics.track_action_repair(spec.name, True, time.time() - start_time)
+		return arguments
 	
 	def plan_task(self, objective: str) -> List[str]:
 		"""
@@ -349,17 +1048,36 @@ Desglosa este objetivo en pasos específicos y ordenados.
 Cada paso debe ser una acción concreta.
 Formato: lista numerada."""
 		
-		response = self.llm.invoke(plan_prompt)
+		# El modelo pequeño planifica; si no produce una lista, se escala al grande
+		steps, escalation = [], None
+		if self.cascade:
+			try:
+				steps = self._parse_plan(self._invoke_plan(self.small_llm, 'small', plan_prompt))
+				escalation = None if steps else 'parse_error'
+			except Exception as e:
+				self.logger.log_error('llm', type(e).__name__, f"{LLM_SMALL_MODEL}: {e}")
+				escalation = 'error'
+		if not steps:
+			steps = self._parse_plan(self._invoke_plan(self.llm, 'large', plan_prompt, escalation))
 		
-		# Extraer pasos de la lista
+		self.plan = steps
+		return steps
+	
+	def _invoke_plan(self, llm, tier: str, prompt: str, escalation: Optional[str] = None) -> str:
+		"""Llama al modelo de planificación registrando su nivel en la cascada."""
+		start_time = time.time()
+		response = llm.invoke(prompt)
+		self.metrics.track_model_call(tier, 'plan', time.time() - start_time, escalation=escalation)
+		return response
+	
+	def _parse_plan(self, response: str) -> List[str]:
+		"""Extrae los pasos de la lista del plan."""
 		steps = []
 		lines = response.split('\n')
 		for line in lines:
 			# Buscar líneas con números o viñetas
 			if re.match(r'^\d+[\.\)]\s+', line) or line.strip().startswith('-'):
 				steps.append(line.strip())
-		
-		self.plan = steps
 		return steps
 	
 	def execute_plan(self, objective: str) -> str:
@@ -0,0 +1,139 @@
+"""
+IL2.1 - Catálogo de libros en memoria
+IE1: Herramientas del agente con acceso eficiente a los datos de la biblioteca
+
+El catálogo se carga una sola vez y se mantiene en memoria como registros
+compactos (__slots__). Solo se vuelve a leer el archivo cuando cambia su
+mtime o tamaño, y esa verificación se hace como máximo una vez por intervalo,
+de modo que las llamadas a herramientas no hacen I/O de archivo.
+
+Formato de cada línea del catálogo:
+- Título | Autor | Ubicación | Estado
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Any
+
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), '../data/catalogo_libros.txt')
+
+# Segundos entre verificaciones de cambios en el archivo
+RELOAD_CHECK_INTERVAL = 2.0
+
+AVAILABLE_STATUS = 'disponible'
+
+
+class Book:
+	"""Registro de un libro del catálogo."""
+
+	__slots__ = ('title', 'author', 'location', 'status')
+
+	def __init__(self, title: str, author: str, location: str, status: str):
+		self.title = title
+		self.author = author
+		self.location = location
+		self.status = status
+
+	@property
+	def available(self) -> bool:
+		"""Indica si el libro figura como disponible en el catálogo."""
+		return self.status.lower() == AVAILABLE_STATUS
+
+	def to_dict(self) -> Dict[str, Any]:
+		"""Representación serializable del libro."""
+		return {
+			'title': self.title,
+			'author': self.author,
+			'location': self.location,
+			'status': self.status,
+			'available': self.available
+		}
+
+	def __repr__(self) -> str:
+		return f"Book({self.title!r}, {self.author!r})"
+
+
+def parse_catalog(content: str) -> List[Book]:
+	"""
+	Parsea el contenido del archivo de catálogo.
+
+	Las líneas sin separador '|' (encabezados, vacías) se ignoran; las
+	columnas faltantes quedan vacías.
+	"""
+	books = []
+	for line in content.split('\n'):
+		if '|' not in line:
+			continue
+		parts = [p.strip() for p in line.strip().lstrip('-').split('|')]
+		parts += [''] * (4 - len(parts))
+		if not parts[0]:
+			continue
+		books.append(Book(parts[0], parts[1], parts[2], parts[3]))
+	return books
+
+
+class CatalogStore:
+	"""
+	Catálogo en memoria con recarga por cambios en el archivo.
+
+	Los listeners registrados con on_reload() se llaman tras cada recarga,
+	para que los índices derivados se reconstruyan.
+	"""
+
+	def __init__(self, path: str = CATALOG_PATH, check_interval: float = RELOAD_CHECK_INTERVAL):
+		self.path = path
+		self.check_interval = check_interval
+		self._books: List[Book] = []
+		self._signature = None
+		self._last_check = float('-inf')
+		self._lock = threading.Lock()
+		self._listeners: List[Callable[[List[Book]], None]] = []
+		self.version = 0
+
+	def books(self) -> List[Book]:
+		"""Retorna los libros, recargando si el archivo cambió."""
+		now = time.monotonic()
+		if now - self._last_check >= self.check_interval:
+			self._reload_if_changed(now)
+		return self._books
+
+	def on_reload(self, listener: Callable[[List[Book]], None]):
+		"""Registra una función a llamar con los libros tras cada recarga."""
+		self._listeners.append(listener)
+
+	def _reload_if_changed(self, now: float):
+		with self._lock:
+			if now - self._last_check < self.check_interval:
+				return
+			self._last_check = now
+			try:
+				stat = os.stat(self.path)
+			except OSError:
+				return
+			signature = (stat.st_mtime_ns, stat.st_size)
+			if signature == self._signature:
+				return
+
+			with open(self.path, 'r', encoding='utf-8') as f:
+				books = parse_catalog(f.read())
+			self._books = books
+			self._signature = signature
+			self.version += 1
+
+		for listener in self._listeners:
+			listener(books)
+
+
+# Instancia global del catálogo
+_catalog_store: Optional[CatalogStore] = None
+_store_lock = threading.Lock()
+
+def get_catalog_store() -> CatalogStore:
+	"""Retorna la instancia global del catálogo en memoria."""
+	global _catalog_store
+	if _catalog_store is None:
+		with _store_lock:
+			if _catalog_store is None:
+				_catalog_store = CatalogStore()
+	return _catalog_store
@@ -0,0 +1,252 @@
+"""
+IL2.1 - Ejecución concurrente del agente
+
+El agente es síncrono (cada paso ReAct bloquea en una llamada HTTP a Ollama),
+por lo que no puede ejecutarse directamente dentro del event loop de FastAPI.
+Este módulo provee un pool acotado de hilos de trabajo:
+- Las llamadas al agente se ejecutan fuera del event loop
+- Un límite de requests en vuelo evita saturar al modelo
+- Control de admisión: la cola de espera tiene profundidad máxima; con la
+  cola llena el request se rechaza de inmediato (HTTP 503 con Retry-After)
+  en lugar de acumularse hasta que el cliente corte por timeout
+- Cada request tiene un plazo (deadline): si vence mientras espera en la
+  cola, se descarta sin ejecutar al agente
+- El tiempo de espera y la profundidad de la cola se registran en MetricsCollector
+"""
+
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.metrics import get_metrics_collector
+from monitoring.logger import get_logger
+
+# Configuración del pool (sobrescribible por entorno)
+AGENT_WORKERS = int(os.environ.get("AGENT_WORKERS", "4"))
+AGENT_MAX_IN_FLIGHT = int(os.environ.get("AGENT_MAX_IN_FLIGHT", str(AGENT_WORKERS)))
+AGENT_MAX_QUEUE = int(os.environ.get("AGENT_MAX_QUEUE", str(4 * AGENT_WORKERS)))
+# Plazo total de un request (espera en cola + ejecución), en segundos
+AGENT_REQUEST_DEADLINE = float(os.environ.get("AGENT_REQUEST_DEADLINE", "30"))
+
+# Peso de la última ejecución en el promedio móvil del tiempo de servicio
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+	"""
+	Request rechazado por el control de admisión.
+
+	reason: 'queue_full' (cola llena) o 'expired' (venció el plazo en la cola)
+	"""
+
+	status_code = 503
+
+	def __init__(self, reason: str, retry_after: int):
+		self.reason = reason
+		self.retry_after = retry_after
+		message = "cola llena" if reason == 'queue_full' else "plazo vencido en la cola"
+		super().__init__(f"Agente saturado ({message}), reintentar en {retry_after}s")
+
+
+class AgentExecutor:
+	"""
+	Pool de hilos acotado para trabajo del agente.
+
+	Las llamadas a Ollama son I/O (HTTP), por lo que los hilos liberan el GIL
+	mientras esperan al modelo y varias generaciones pueden avanzar en paralelo.
+	"""
+
+	def __init__(self, max_workers: int = AGENT_WORKERS, max_in_flight: int = AGENT_MAX_IN_FLIGHT,
+	             max_queue: int = AGENT_MAX_QUEUE, request_deadline: float = AGENT_REQUEST_DEADLINE):
+		self.max_workers = max_workers
+		self.max_in_flight = max(1, max_in_flight)
+		self.max_queue = max(0, max_queue)
+		self.request_deadline = request_deadline
+		self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+		self.slots = asyncio.Semaphore(self.max_in_flight)
+		self.in_flight = 0
+		# Requests esperando un cupo (solo se modifica desde el event loop)
+		self.queued = 0
+		self.service_time = 1.0
+		self._count_lock = threading.Lock()
+		self.metrics = get_metrics_collector()
+
+	def deadline(self) -> float:
+		"""Plazo (timestamp) para un request que llega ahora."""
+		return time.time() + self.request_deadline
+
+	def retry_after(self) -> int:
+		"""Segundos estimados hasta que se libere lugar en la cola."""
+		return max(1, math.ceil(self.service_time * (self.queued + 1) / self.max_in_flight))
+
+	def check_admission(self):
+		"""
+		Rechaza de inmediato si no hay cupo libre y la cola está llena.
+
+		Raises:
+			AdmissionRejected
+		"""
+		if self.slots.locked() and self.queued >= self.max_queue:
+			self.metrics.track_admission('queue_full', self.queued)
+			raise AdmissionRejected('queue_full', self.retry_after())
+
+	async def _acquire(self, deadline: float):
+		"""Espera un cupo hasta `deadline` (lanza AdmissionRejected si no se obtiene)."""
+		if not self.slots.locked():
+			# Cupo libre: se toma sin ceder el event loop
+			await self.slots.acquire()
+			return
+		self.check_admission()
+		self.queued += 1
+		self.metrics.track_admission('enqueued', self.queued)
+		try:
+			await asyncio.wait_for(self.slots.acquire(), timeout=max(0.0, deadline - time.time()))
+		except asyncio.TimeoutError:
+			self.metrics.track_admission('expired', self.queued - 1)
+			raise AdmissionRejected('expired', self.retry_after())
+		finally:
+			self.queued -= 1
+			self.metrics.set_queue_depth(self.queued)
+
+	async def run(self, func: Callable[..., Any], *args, deadline: Optional[float] = None, **kwargs) -> Any:
+		"""
+		Ejecuta `func` en el pool sin bloquear el event loop.
+
+		Espera un cupo libre si ya hay `max_in_flight` ejecuciones activas.
+
+		Args:
+			deadline: Plazo del request (timestamp); por defecto, ahora + AGENT_REQUEST_DEADLINE
+
+		Returns:
+			Resultado de `func`
+
+		Raises:
+			AdmissionRejected: Cola llena o plazo vencido antes de ejecutar
+		"""
+		enqueued_at = time.time()
+		deadline = deadline or self.deadline()
+		await self._acquire(deadline)
+		future = self._submit(enqueued_at, deadline, func, args, kwargs)
+		# Si el request se cancela (cliente desconectado) el hilo sigue ocupando
+		# su cupo hasta terminar: se espera sin propagar la cancelación al Future
+		return await asyncio.shield(future)
+
+	async def stream(self, func: Callable[..., Iterator[Any]], *args, deadline: Optional[float] = None,
+	                 **kwargs) -> AsyncIterator[Any]:
+		"""
+		Consume en el pool un generador síncrono y reenvía sus elementos.
+
+		Todo el generador se ejecuta en un único hilo de trabajo (las métricas
+		del request son por hilo) y ocupa un cupo mientras dura.
+
+		Yields:
+			Elementos producidos por `func`
+
+		Raises:
+			AdmissionRejected: Cola llena o plazo vencido antes de ejecutar
+		"""
+		enqueued_at = time.time()
+		deadline = deadline or self.deadline()
+		loop = asyncio.get_running_loop()
+		queue: asyncio.Queue = asyncio.Queue()
+		cancelled = threading.Event()
+		finished = object()
+
+		def produce():
+			generator = func(*args, **kwargs)
+			try:
+				for item in generator:
+					if cancelled.is_set():
+						break
+					loop.call_soon_threadsafe(queue.put_nowait, item)
+			finally:
+				# Cerrar el generador corta también el stream HTTP hacia Ollama
+				generator.close()
+
+		await self._acquire(deadline)
+		future = self._submit(enqueued_at, deadline, produce, (), {})
+		# Fin del stream también si el request se descarta antes de ejecutarse
+		future.add_done_callback(lambda f: queue.put_nowait(finished))
+		abandoned = True
+		try:
+			while True:
+				item = await queue.get()
+				if item is finished:
+					break
+				yield item
+			abandoned = False
+		finally:
+			cancelled.set()
+			if abandoned:
+				# Quien consumía dejó de iterar y nadie esperará el Future:
+				# su error (p. ej. AdmissionRejected) se registra al terminar
+				future.add_done_callback(self._log_abandoned)
+		await asyncio.shield(future)
+	
+	def _log_abandoned(self, future: asyncio.Future):
+		"""Consume y registra el error de un stream que ya nadie consume."""
+		if future.cancelled():
+			return
+		error = future.exception()
+		if error is not None:
+			get_logger().log_error('executor', type(error).__name__, f"stream abandonado: {error}")
+	
+	def _submit(self, enqueued_at: float, deadline: float, func: Callable[..., Any],
+	            args: tuple, kwargs: dict) -> asyncio.Future:
+		"""
+		Envía `func` al pool con un cupo ya tomado.
+		
+		El cupo se libera cuando el hilo de trabajo termina, no cuando deja de
+		esperarlo el request: así max_in_flight acota las ejecuciones reales.
+		"""
+		loop = asyncio.get_running_loop()
+		try:
+			future = loop.run_in_executor(self.pool, self._run_timed, enqueued_at, deadline, func, args, kwargs)
+		except BaseException:
+			self.slots.release()
+			raise
+		future.add_done_callback(lambda f: self.slots.release())
+		return future
+
+	def _run_timed(self, enqueued_at: float, deadline: float, func: Callable[..., Any],
+	               args: tuple, kwargs: dict) -> Any:
+		"""Ejecuta en el hilo de trabajo registrando la espera en cola."""
+		started_at = time.time()
+		if started_at > deadline:
+			# Con más cupos que hilos, el request pudo vencer en la cola del pool
+			self.metrics.track_admission('expired', self.queued)
+			raise AdmissionRejected('expired', self.retry_after())
+		with self._count_lock:
+			self.in_flight += 1
+			in_flight = self.in_flight
+		self.metrics.track_queue_wait(started_at - enqueued_at, in_flight)
+		try:
+			return func(*args, **kwargs)
+		finally:
+			elapsed = time.time() - started_at
+			with self._count_lock:
+				self.in_flight -= 1
+				in_flight = self.in_flight
+				self.service_time += SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+			self.metrics.set_in_flight(in_flight)
+
+	def shutdown(self):
+		"""Libera los hilos del pool."""
+		self.pool.shutdown(wait=False)
+
+
+# Instancia global del executor
+_agent_executor = None
+
+def get_agent_executor() -> AgentExecutor:
+	"""Retorna la instancia global del executor del agente."""
+	global _agent_executor
+	if _agent_executor is None:
+		_agent_executor = AgentExecutor()
+	return _agent_executor
@@ -0,0 +1,168 @@
+"""
+IL2.1 - Ruta rápida determinista
+IE6: Toma de decisiones adaptativa según el tipo de consulta
+
+Muchas consultas se resuelven con una sola herramienta ("Calcula la multa por
+5 días", "¿Está disponible 1984?"). Este módulo las reconoce con expresiones
+regulares precompiladas, extrae los parámetros (slots) y entrega una respuesta
+con plantilla, sin invocar al LLM.
+
+Las preguntas de cantidades solo son de políticas si preguntan por lo que
+permite el reglamento ("¿Cuántos libros puedo pedir?", "¿Cuánto dura el
+préstamo?"); las que mencionan un título, autor o tema ("¿Cuántos libros de
+Orwell tienen?", "¿Cuántas veces han prestado 1984?", "Cuántos libros hay
+sobre Python?") no tienen ruta rápida y las resuelve el agente. Lo mismo con
+"límite", "período" o "políticas" si no van seguidos de vocabulario de la
+biblioteca (préstamo, reserva, renovación, libros): "¿Cuál es el límite de
+mi tarjeta?" o "el período de 1984" no son consultas de políticas.
+
+Cada patrón tiene una confianza fija; el agente solo usa la ruta rápida si la
+confianza supera su umbral y, en caso contrario, sigue el flujo ReAct normal.
+Las mismas reglas predicen las herramientas que el agente probablemente
+pedirá primero, para anticiparlas mientras el LLM genera (predict_actions).
+"""
+
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.router import detect_domain
+
+# Umbral mínimo de confianza para responder sin LLM (sobrescribible por entorno)
+FAST_PATH_THRESHOLD = float(os.environ.get("FAST_PATH_THRESHOLD", "0.85"))
+
+_DAYS = r'(\d{1,4})\s*d[ií]as?'
+
+# (herramienta, patrón, confianza); el primer grupo es el parámetro de la herramienta
+INTENT_PATTERNS = [
+	('calculate_fine', re.compile(r'\b(?:multa|debo|deber[ií]a pagar|cu[aá]nto pago)\b.*?' + _DAYS, re.IGNORECASE), 0.95),
+	('calculate_fine', re.compile(_DAYS + r'\s+(?:de\s+)?(?:retraso|atraso)', re.IGNORECASE), 0.9),
+	('check_availability', re.compile(
+		r'^\W*(?:est[aá]|se encuentra)\s+disponibles?\s+(?:el\s+libro\s+)?["“«\']?(.+?)["”»\']?\s*\?*$',
+		re.IGNORECASE), 0.9),
+	('check_availability', re.compile(
+		r'^\W*(?:verifica|revisa|consulta)?\s*(?:la\s+)?disponibilidad\s+(?:de|del)\s+(?:libro\s+)?["“«\']?(.+?)["”»\']?\s*\?*$',
+		re.IGNORECASE), 0.9),
+	('search_book', re.compile(
+		r'^\W*(?:busca|buscar|b[uú]scame|encuentra|mu[eé]strame)\s+(?:libros?\s+)?(?:de|sobre|del|acerca de)\s+(.+?)\s*[.?!]*$',
+		re.IGNORECASE), 0.9),
+	('search_book', re.compile(
+		r'^\W*(?:hay|tienen)\s+libros?\s+(?:de|sobre|del)\s+(.+?)(?:\s+disponibles?)?\s*[.?!]*$',
+		re.IGNORECASE), 0.9),
+	('get_policies', re.compile(
+		r'^\W*(?:cu[aá]nt[oa]s?\s+(?:d[ií]as|libros|reservas|renovaciones|veces)\s+'
+		r'(?:puedo|se\s+(?:pueden?|permiten?)|me\s+(?:dan|prestan|permiten)|(?:como\s+)?m[aá]ximo)|'
+		r'cu[aá]nto\s+(?:tiempo\s+)?duran?\s+(?:el|los|un)\s+pr[eé]stamos?|(?:c[oó]mo|puedo)\s+renovar|'
+		r'(?:cu[aá]l(?:es)?\s+(?:es|son)\s+)?(?:el\s+|las?\s+)?(?:l[ií]mite|pol[ií]ticas?|per[ií]odo)\s+'
+		r'(?:de|del|para)\s+(?:(?:el|la|los|las|mis?)\s+)?'
+		r'(?:pr[eé]stamos?|reservas?|renovaci[oó]n(?:es)?|libros|multas?|biblioteca)|'
+		r'(?:dame\s+)?informaci[oó]n\s+sobre\s+(?:la\s+|las\s+|los\s+)?(?:renovaci[oó]n|multas?|pr[eé]stamos?|reservas?))\b(.*)$',
+		re.IGNORECASE), 0.9),
+]
+
+# Consultas que requieren razonamiento o memoria: nunca por la ruta rápida
+_NEEDS_AGENT = re.compile(
+	r'\b(?:me llamo|mi nombre|recuerdas|te dije|y (?:si|tambi[eé]n)|recomi[eé]ndame|reserva|prest[aá]me|pr[eé]stame)\b',
+	re.IGNORECASE
+)
+
+
+def match_intent(question: str) -> Optional[Dict[str, Any]]:
+	"""
+	Detecta una intención resoluble con una sola herramienta.
+
+	Args:
+		question: Pregunta del usuario
+
+	Returns:
+		Dict con 'tool', 'input' y 'confidence', o None si no hay coincidencia
+	"""
+	question = question.strip()
+	if _NEEDS_AGENT.search(question):
+		return None
+
+	domain = detect_domain(question)
+	for tool, pattern, confidence in INTENT_PATTERNS:
+		match = pattern.search(question)
+		if not match:
+			continue
+
+		slot = match.group(1).strip(' "\'“”«».,;:¿?¡!')
+		if tool == 'get_policies':
+			# Las políticas se consultan con la pregunta completa
+			slot = question
+		elif tool != 'calculate_fine' and domain == 'policies':
+			# Una consulta de libros con vocabulario de políticas es ambigua
+			confidence -= 0.2
+
+		if not slot:
+			continue
+
+		return {'tool': tool, 'input': slot, 'confidence': confidence}
+
+	return None
+
+
+# Herramientas de solo lectura que se pueden anticipar
+SPECULATIVE_TOOLS = frozenset(['search_book', 'get_policies', 'check_availability'])
+
+# Título citado entre comillas en la pregunta
+_QUOTED_TITLE = re.compile(r'["“«]([^"”»]{2,})["”»]')
+
+
+def predict_actions(question: str) -> List[Dict[str, str]]:
+	"""
+	Predice las primeras acciones del agente para una pregunta.
+
+	Usa la intención detectada aunque su confianza no alcance el umbral de
+	la ruta rápida; si no hay intención, un título entre comillas o el
+	dominio de la pregunta (detect_domain).
+
+	Returns:
+		Lista de dicts con 'tool' y 'input' (vacía si no hay predicción)
+	"""
+	question = question.strip()
+	intent = match_intent(question)
+	if intent:
+		if intent['tool'] in SPECULATIVE_TOOLS:
+			return [{'tool': intent['tool'], 'input': intent['input']}]
+		return []
+
+	quoted = _QUOTED_TITLE.search(question)
+	if quoted:
+		title = quoted.group(1).strip()
+		return [{'tool': 'check_availability', 'input': title}, {'tool': 'search_book', 'input': title}]
+
+	if detect_domain(question) == 'policies' and not _NEEDS_AGENT.search(question):
+		return [{'tool': 'get_policies', 'input': question}]
+	return []
+
+
+def render_answer(tool: str, result: str) -> str:
+	"""
+	Convierte la salida de la herramienta en la respuesta final al usuario.
+
+	Args:
+		tool: Herramienta ejecutada
+		result: Salida de la herramienta
+
+	Returns:
+		Respuesta con plantilla
+	"""
+	if tool == 'search_book':
+		try:
+			books = json.loads(result)
+		except ValueError:
+			return result
+		lines = ["Encontré estos libros en el catálogo:"]
+		for book in books:
+			line = f"- {book.get('title', '')}"
+			if book.get('author'):
+				line += f", de {book['author']}"
+			lines.append(line)
+		return "\n".join(lines)
+
+	return result
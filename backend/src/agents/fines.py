@@ -0,0 +1,276 @@
+"""
+IL2.1 - Evaluación masiva de multas
+IE1: Herramientas del agente respaldadas por datos precalculados
+
+Calcula en un solo paso los días de atraso y la multa de todos los préstamos
+abiertos del ledger, con operaciones vectorizadas de NumPy:
+- Tarifas por categoría (sección del libro) y tope por libro tomados de
+  reglamento_multas.txt
+- Escritura masiva de resultados en las tablas `fines` y `user_fines`
+- La herramienta calculate_fine responde "¿cuánto debo?" consultando
+  `user_fines` en lugar de calcular en el prompt
+- Al devolver un préstamo su multa se fija en la misma transacción y se
+  cobra en la devolución: `user_fines` solo suma préstamos abiertos
+
+Pensado para ejecutarse cada noche (p. ej. desde cron) y bajo demanda:
+    python src/agents/fines.py
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.ledger import LoanLedger, get_ledger
+
+FINE_RULES_PATH = os.path.join(os.path.dirname(__file__), '../data/reglamento_multas.txt')
+
+# Valores por defecto si el reglamento no los especifica
+DEFAULT_RATE = 500.0
+DEFAULT_CAP = 10000.0
+DEFAULT_BLOCK_THRESHOLD = 5000.0
+
+SECONDS_PER_DAY = 86400
+
+FINES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fines (
+	loan_id INTEGER PRIMARY KEY REFERENCES loans (id),
+	user_id TEXT NOT NULL,
+	days_overdue INTEGER NOT NULL,
+	amount REAL NOT NULL,
+	assessed_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS user_fines (
+	user_id TEXT PRIMARY KEY,
+	total REAL NOT NULL,
+	assessed_at REAL NOT NULL
+);
+"""
+
+_SQL_OPEN_LOANS = (
+	"SELECT l.id, l.user_id, l.due_at, c.section FROM loans l "
+	"JOIN copies c ON c.id = l.copy_id WHERE l.returned_at IS NULL"
+)
+# Las multas de préstamos abiertos se recalculan completas en cada evaluación;
+# las de préstamos ya devueltos se conservan como registro
+_SQL_INSERT_FINE = (
+	"INSERT INTO fines (loan_id, user_id, days_overdue, amount, assessed_at) "
+	"VALUES (?, ?, ?, ?, ?)"
+)
+# Lo adeudado corresponde a préstamos abiertos: la multa de un préstamo
+# devuelto queda fijada (y se cobra) al cerrarlo, ver FineAssessor.settle
+_SQL_OPEN_FINES = (
+	"FROM fines WHERE loan_id IN (SELECT id FROM loans WHERE returned_at IS NULL)"
+)
+_SQL_CLEAR_OPEN_FINES = "DELETE " + _SQL_OPEN_FINES
+_SQL_REBUILD_USER_FINES = (
+	"INSERT INTO user_fines (user_id, total, assessed_at) "
+	"SELECT user_id, SUM(amount), ? " + _SQL_OPEN_FINES + " GROUP BY user_id"
+)
+_SQL_REBUILD_ONE_USER_FINES = (
+	"INSERT INTO user_fines (user_id, total, assessed_at) "
+	"SELECT user_id, SUM(amount), ? " + _SQL_OPEN_FINES + " AND user_id = ? GROUP BY user_id"
+)
+_SQL_LOAN = (
+	"SELECT l.user_id, l.due_at, c.section FROM loans l "
+	"JOIN copies c ON c.id = l.copy_id WHERE l.id = ?"
+)
+_SQL_UPSERT_FINE = (
+	"INSERT OR REPLACE INTO fines (loan_id, user_id, days_overdue, amount, assessed_at) "
+	"VALUES (?, ?, ?, ?, ?)"
+)
+_SQL_USER_TOTAL = "SELECT total, assessed_at FROM user_fines WHERE user_id = ?"
+
+_AMOUNT = r'\$\s*([\d.,]+)'
+
+
+def _parse_amount(text: str) -> float:
+	"""Convierte '$10.000' (separador de miles chileno) a 10000.0."""
+	return float(text.replace('.', '').replace(',', '.'))
+
+
+def parse_fine_rules(path: str = FINE_RULES_PATH) -> Dict[str, Any]:
+	"""
+	Lee tarifas y topes desde el reglamento de multas.
+
+	Reconoce líneas como:
+	- "Multa por atraso: $500 por día por libro."          (tarifa general)
+	- "Multa por atraso (Técnica): $700 por día por libro." (tarifa por sección)
+	- "Tope de multa por libro: $10.000."
+	- "... multas pendientes superiores a $5.000 ..."
+
+	Returns:
+		Dict con 'default_rate', 'rates' (por sección), 'cap' y 'block_threshold'
+	"""
+	rules = {
+		'default_rate': DEFAULT_RATE,
+		'rates': {},
+		'cap': DEFAULT_CAP,
+		'block_threshold': DEFAULT_BLOCK_THRESHOLD
+	}
+	try:
+		with open(path, 'r', encoding='utf-8') as f:
+			content = f.read()
+	except OSError:
+		return rules
+
+	for match in re.finditer(r'Multa por atraso(?:\s*\(([^)]+)\))?:\s*' + _AMOUNT, content, re.IGNORECASE):
+		category, amount = match.group(1), _parse_amount(match.group(2).rstrip('.'))
+		if category:
+			rules['rates'][category.strip().lower()] = amount
+		else:
+			rules['default_rate'] = amount
+
+	cap = re.search(r'Tope de multa[^$]*' + _AMOUNT, content, re.IGNORECASE)
+	if cap:
+		rules['cap'] = _parse_amount(cap.group(1).rstrip('.'))
+
+	block = re.search(r'superiores a\s*' + _AMOUNT, content, re.IGNORECASE)
+	if block:
+		rules['block_threshold'] = _parse_amount(block.group(1).rstrip('.'))
+
+	return rules
+
+
+def compute_fines(due_at: np.ndarray, rates: np.ndarray, cap: float, now: float):
+	"""
+	Días de atraso y multa por préstamo, vectorizado.
+
+	Args:
+		due_at: Fechas de vencimiento (timestamps)
+		rates: Tarifa diaria de cada préstamo
+		cap: Tope de multa por libro
+		now: Momento de la evaluación
+
+	Returns:
+		(días de atraso, multa) como arrays
+	"""
+	days = np.floor((now - due_at) / SECONDS_PER_DAY)
+	days = np.maximum(days, 0).astype(np.int64)
+	amounts = np.minimum(days * rates, cap)
+	return days, amounts
+
+
+class FineAssessor:
+	"""Evalúa las multas de todo el libro de préstamos del ledger."""
+
+	def __init__(self, ledger: LoanLedger, rules: Optional[Dict[str, Any]] = None):
+		self.ledger = ledger
+		self.rules = rules or parse_fine_rules()
+		self.ledger.conn().executescript(FINES_SCHEMA)
+		self.ledger.on_close(self.settle)
+
+	def _rate(self, section: str) -> float:
+		"""Tarifa diaria de una sección."""
+		return self.rules['rates'].get(section.lower(), self.rules['default_rate'])
+
+	def assess(self, now: Optional[float] = None) -> Dict[str, Any]:
+		"""
+		Recalcula las multas de todos los préstamos abiertos.
+
+		Returns:
+			Resumen con número de préstamos, préstamos atrasados, total y duración
+		"""
+		start = time.time()
+		now = start if now is None else now
+
+		rows = self.ledger.conn().execute(_SQL_OPEN_LOANS).fetchall()
+		loan_ids, user_ids, due_at, sections = zip(*rows) if rows else ((), (), (), ())
+
+		due = np.fromiter(due_at, dtype=np.float64, count=len(rows))
+
+		# Tarifa por préstamo: se resuelve una vez por cada sección distinta
+		unique_sections, section_idx = np.unique(np.array(sections, dtype=str), return_inverse=True)
+		section_rates = np.array([self._rate(section) for section in unique_sections.tolist()], dtype=np.float64)
+		rates = section_rates[section_idx]
+
+		days, amounts = compute_fines(due, rates, self.rules['cap'], now)
+		overdue = np.flatnonzero(days > 0)
+
+		fine_rows = [
+			(loan_ids[i], user_ids[i], int(days[i]), float(amounts[i]), now)
+			for i in overdue.tolist()
+		]
+
+		def write(conn):
+			conn.execute(_SQL_CLEAR_OPEN_FINES)
+			conn.executemany(_SQL_INSERT_FINE, fine_rows)
+			conn.execute("DELETE FROM user_fines")
+			conn.execute(_SQL_REBUILD_USER_FINES, (now,))
+
+		self.ledger.write(write)
+
+		return {
+			'open_loans': len(rows),
+			'overdue_loans': len(fine_rows),
+			'total_amount': float(amounts.sum()),
+			'elapsed': time.time() - start
+		}
+
+	def settle(self, conn, loan_id: int, returned_at: float):
+		"""
+		Fija la multa de un préstamo al devolverlo (listener de on_close).
+
+		Corre en la transacción que cierra el préstamo: la multa queda con los
+		días de atraso a la fecha de devolución, deja de sumarse a lo adeudado
+		y el total del usuario se actualiza sin esperar la próxima evaluación.
+		"""
+		user_id, due_at, section = conn.execute(_SQL_LOAN, (loan_id,)).fetchone()
+		days, amounts = compute_fines(
+			np.array([due_at]), np.array([self._rate(section)]), self.rules['cap'], returned_at
+		)
+		if days[0] > 0:
+			conn.execute(_SQL_UPSERT_FINE, (loan_id, user_id, int(days[0]), float(amounts[0]), returned_at))
+		else:
+			conn.execute("DELETE FROM fines WHERE loan_id = ?", (loan_id,))
+		conn.execute("DELETE FROM user_fines WHERE user_id = ?", (user_id,))
+		conn.execute(_SQL_REBUILD_ONE_USER_FINES, (returned_at, user_id))
+
+	def loan_fine(self, loan_id: int) -> float:
+		"""Multa registrada de un préstamo (la definitiva si ya fue devuelto)."""
+		row = self.ledger.conn().execute("SELECT amount FROM fines WHERE loan_id = ?", (loan_id,)).fetchone()
+		return row[0] if row else 0.0
+
+	def user_total(self, user_id: str) -> Optional[Dict[str, float]]:
+		"""
+		Total adeudado por un usuario según la última evaluación.
+
+		Returns:
+			Dict con 'total', 'assessed_at' y 'blocked', o None si no registra multas
+		"""
+		row = self.ledger.conn().execute(_SQL_USER_TOTAL, (user_id,)).fetchone()
+		if row is None:
+			return None
+		return {
+			'total': row[0],
+			'assessed_at': row[1],
+			'blocked': row[0] > self.rules['block_threshold']
+		}
+
+
+# Instancia global del evaluador de multas
+_fine_assessor: Optional[FineAssessor] = None
+_assessor_lock = threading.Lock()
+
+def get_fine_assessor() -> FineAssessor:
+	"""Retorna el evaluador de multas global (sobre el ledger global)."""
+	global _fine_assessor
+	if _fine_assessor is None:
+		with _assessor_lock:
+			if _fine_assessor is None:
+				_fine_assessor = FineAssessor(get_ledger())
+	return _fine_assessor
+
+
+if __name__ == '__main__':
+	summary = get_fine_assessor().assess()
+	print(f"Préstamos abiertos: {summary['open_loans']:,}")
+	print(f"Préstamos con atraso: {summary['overdue_loans']:,}")
+	print(f"Total de multas: ${summary['total_amount']:,.0f} CLP")
+	print(f"Tiempo: {summary['elapsed']:.2f}s")
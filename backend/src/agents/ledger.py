@@ -0,0 +1,316 @@
+"""
+IL2.1 - Registro transaccional de préstamos y reservas
+IE1: Herramientas del agente con efectos persistentes y consistentes
+
+Ledger en SQLite (modo WAL, sin servicios externos) con tablas indexadas de
+copias, préstamos y reservas:
+- El préstamo es atómico: tomar una copia disponible y registrar el préstamo
+  ocurre en una sola transacción, por lo que dos sesiones concurrentes no
+  pueden llevarse la última copia
+- Cada hilo usa su propia conexión con caché de sentencias preparadas
+- WAL permite lecturas concurrentes mientras se escribe
+
+La cola de reservas por título vive en agents/reservations.py.
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.catalog import Book, get_catalog_store
+from agents.search_index import title_key
+
+LEDGER_PATH = os.environ.get(
+	"LEDGER_PATH",
+	os.path.abspath(os.path.join(os.path.dirname(__file__), '../../.ledger/ledger.db'))
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS copies (
+	id INTEGER PRIMARY KEY,
+	book_key TEXT NOT NULL,
+	copy_no INTEGER NOT NULL,
+	title TEXT NOT NULL,
+	section TEXT NOT NULL DEFAULT '',
+	status TEXT NOT NULL DEFAULT 'available',
+	held_for TEXT,
+	UNIQUE (book_key, copy_no)
+);
+CREATE INDEX IF NOT EXISTS idx_copies_status ON copies (book_key, status);
+
+CREATE TABLE IF NOT EXISTS loans (
+	id INTEGER PRIMARY KEY,
+	copy_id INTEGER NOT NULL REFERENCES copies (id),
+	book_key TEXT NOT NULL,
+	user_id TEXT NOT NULL,
+	loaned_at REAL NOT NULL,
+	due_at REAL NOT NULL,
+	returned_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_loans_open_user ON loans (user_id) WHERE returned_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_loans_open_due ON loans (due_at) WHERE returned_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS reservations (
+	id INTEGER PRIMARY KEY,
+	book_key TEXT NOT NULL,
+	user_id TEXT NOT NULL,
+	priority INTEGER NOT NULL DEFAULT 0,
+	created_at REAL NOT NULL,
+	status TEXT NOT NULL DEFAULT 'pending',
+	copy_id INTEGER REFERENCES copies (id),
+	expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_reservations_queue ON reservations (book_key, status, priority, id);
+CREATE INDEX IF NOT EXISTS idx_reservations_expiry ON reservations (status, expires_at);
+CREATE INDEX IF NOT EXISTS idx_reservations_user ON reservations (user_id, status);
+"""
+
+# Sentencias usadas en caliente: siempre el mismo texto para reutilizar el
+# statement preparado del caché de cada conexión
+_SQL_AVAILABLE = "SELECT COUNT(*) FROM copies WHERE book_key = ? AND status = 'available'"
+# Una copia apartada para el usuario (reserva lista) tiene prioridad sobre las libres
+_SQL_TAKE_COPY = (
+	"UPDATE copies SET status = 'loaned', held_for = NULL WHERE id = ("
+	"SELECT id FROM copies WHERE book_key = ? AND "
+	"(status = 'available' OR (status = 'held' AND held_for = ?)) "
+	"ORDER BY status = 'held' DESC LIMIT 1"
+	") RETURNING id"
+)
+_SQL_FULFILL_RESERVATION = (
+	"UPDATE reservations SET status = 'fulfilled' "
+	"WHERE book_key = ? AND user_id = ? AND status = 'ready'"
+)
+_SQL_INSERT_LOAN = (
+	"INSERT INTO loans (copy_id, book_key, user_id, loaned_at, due_at) VALUES (?, ?, ?, ?, ?)"
+)
+_SQL_CLOSE_LOAN = (
+	"UPDATE loans SET returned_at = ? WHERE id = ? AND returned_at IS NULL RETURNING copy_id, book_key"
+)
+_SQL_RELEASE_COPY = "UPDATE copies SET status = 'available', held_for = NULL WHERE id = ?"
+_SQL_OPEN_LOANS = (
+	"SELECT id, book_key, loaned_at, due_at FROM loans WHERE user_id = ? AND returned_at IS NULL"
+)
+# Claves por consulta en las búsquedas con IN (...) (bajo el límite de variables de SQLite)
+IN_CLAUSE_BATCH = 500
+
+# Forma de un ID de usuario: código alfanumérico con letras y dígitos
+# ("U001", "user-42") o RUT ("12.345.678-9")
+USER_ID_PATTERN = re.compile(
+	r'^(?:(?=\S*\d)(?=\S*[A-Za-z])[A-Za-z0-9][\w.-]{1,31}|\d{1,2}\.?\d{3}\.?\d{3}-[\dkK])$'
+)
+
+_SQL_INSERT_COPY = (
+	"INSERT OR IGNORE INTO copies (book_key, copy_no, title, section, status) VALUES (?, ?, ?, ?, ?)"
+)
+
+
+def book_section(book: Book) -> str:
+	"""Sección del libro según su ubicación ("Sección Ficción, ..." -> "Ficción")."""
+	first = book.location.split(',')[0].strip()
+	return first[len('Sección'):].strip() if first.startswith('Sección') else first
+
+
+class LoanLedger:
+	"""
+	Ledger persistente de copias, préstamos y reservas.
+
+	Las escrituras usan BEGIN IMMEDIATE, que toma el lock de escritura al
+	inicio de la transacción: la verificación de disponibilidad y el
+	préstamo no pueden intercalarse con otra sesión.
+	"""
+
+	def __init__(self, path: str = LEDGER_PATH):
+		self.path = path
+		self._local = threading.local()
+		self._write_listeners: List[Callable[[], None]] = []
+		self._close_listeners: List[Callable[[sqlite3.Connection, int, float], None]] = []
+		if os.path.dirname(path):
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+		self.conn().executescript(SCHEMA)
+
+	def conn(self) -> sqlite3.Connection:
+		"""Conexión del hilo actual (se crea y configura la primera vez)."""
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			# isolation_level=None: las transacciones se controlan explícitamente
+			conn = sqlite3.connect(self.path, isolation_level=None, timeout=10.0, cached_statements=64)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.execute("PRAGMA foreign_keys=ON")
+			self._local.conn = conn
+		return conn
+
+	def write(self, func):
+		"""Ejecuta `func(conn)` dentro de una transacción de escritura."""
+		conn = self.conn()
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			result = func(conn)
+			# Dentro del try: si COMMIT falla (SQLITE_BUSY, I/O) la conexión
+			# del hilo no queda con la transacción abierta
+			conn.execute("COMMIT")
+		except BaseException:
+			if conn.in_transaction:
+				conn.execute("ROLLBACK")
+			raise
+		for listener in self._write_listeners:
+			listener()
+		return result
+
+	def on_write(self, listener: Callable[[], None]):
+		"""Registra una función a llamar tras cada transacción de escritura confirmada."""
+		self._write_listeners.append(listener)
+
+	def on_close(self, listener: Callable[[sqlite3.Connection, int, float], None]):
+		"""
+		Registra una función a llamar con (conn, id del préstamo, fecha de
+		devolución) cada vez que se cierra un préstamo, dentro de la misma
+		transacción.
+		"""
+		self._close_listeners.append(listener)
+
+	def sync_catalog(self, books: Iterable[Book]):
+		"""
+		Registra una copia por cada libro del catálogo que aún no exista.
+
+		Los libros marcados como no disponibles en el catálogo se registran
+		como 'unavailable'; las copias existentes no se modifican.
+		"""
+		rows = [
+			(title_key(book.title), 1, book.title, book_section(book),
+			 'available' if book.available else 'unavailable')
+			for book in books
+		]
+		self.write(lambda conn: conn.executemany(_SQL_INSERT_COPY, rows))
+
+	def add_copies(self, title: str, count: int, section: str = ''):
+		"""Agrega copias adicionales de un título."""
+		key = title_key(title)
+
+		def insert(conn):
+			start = conn.execute(
+				"SELECT COALESCE(MAX(copy_no), 0) FROM copies WHERE book_key = ?", (key,)
+			).fetchone()[0]
+			conn.executemany(_SQL_INSERT_COPY, [
+				(key, start + i + 1, title, section, 'available') for i in range(count)
+			])
+
+		self.write(insert)
+
+	def available_copies(self, book_key: str) -> int:
+		"""Número de copias disponibles de un título."""
+		return self.conn().execute(_SQL_AVAILABLE, (book_key,)).fetchone()[0]
+
+	def available_copies_many(self, book_keys: Iterable[str]) -> Dict[str, int]:
+		"""Copias disponibles de varios títulos, en una consulta por bloque de claves."""
+		keys = list(dict.fromkeys(book_keys))
+		counts = dict.fromkeys(keys, 0)
+		conn = self.conn()
+		for start in range(0, len(keys), IN_CLAUSE_BATCH):
+			batch = keys[start:start + IN_CLAUSE_BATCH]
+			placeholders = ','.join('?' * len(batch))
+			counts.update(conn.execute(
+				f"SELECT book_key, COUNT(*) FROM copies WHERE status = 'available' "
+				f"AND book_key IN ({placeholders}) GROUP BY book_key", batch
+			).fetchall())
+		return counts
+
+	def checkout(self, user_id: str, book_key: str, days: int = 14) -> Optional[Dict[str, Any]]:
+		"""
+		Presta una copia disponible de forma atómica.
+		
+		Si el usuario tiene una reserva lista para este título, se le presta
+		la copia apartada y la reserva queda cumplida.
+
+		Returns:
+			Datos del préstamo, o None si no quedan copias disponibles
+		"""
+		now = time.time()
+		due_at = now + days * 86400
+
+		def take(conn):
+			rows = conn.execute(_SQL_TAKE_COPY, (book_key, user_id)).fetchall()
+			if not rows:
+				return None
+			row = rows[0]
+			conn.execute(_SQL_FULFILL_RESERVATION, (book_key, user_id))
+			cursor = conn.execute(_SQL_INSERT_LOAN, (row[0], book_key, user_id, now, due_at))
+			return {
+				'loan_id': cursor.lastrowid,
+				'copy_id': row[0],
+				'book_key': book_key,
+				'user_id': user_id,
+				'loaned_at': now,
+				'due_at': due_at
+			}
+
+		return self.write(take)
+
+	def close_loan(self, conn: sqlite3.Connection, loan_id: int) -> Optional[Tuple[int, str]]:
+		"""
+		Marca un préstamo como devuelto dentro de una transacción abierta.
+
+		La copia queda en estado 'loaned' hasta que quien llama decida si se
+		libera o se aparta para una reserva. Los listeners de on_close corren
+		en la misma transacción.
+
+		Returns:
+			(id de la copia, clave del título), o None si no estaba abierto
+		"""
+		returned_at = time.time()
+		rows = conn.execute(_SQL_CLOSE_LOAN, (returned_at, loan_id)).fetchall()
+		if not rows:
+			return None
+		for listener in self._close_listeners:
+			listener(conn, loan_id, returned_at)
+		return rows[0][0], rows[0][1]
+
+	def return_loan(self, loan_id: int) -> Optional[str]:
+		"""
+		Registra la devolución de un préstamo y libera la copia.
+
+		Para devoluciones que deben atender la cola de reservas, usar
+		ReservationQueue.return_loan.
+
+		Returns:
+			Clave del título devuelto, o None si el préstamo no estaba abierto
+		"""
+		def close(conn):
+			closed = self.close_loan(conn, loan_id)
+			if closed is None:
+				return None
+			conn.execute(_SQL_RELEASE_COPY, (closed[0],))
+			return closed[1]
+
+		return self.write(close)
+
+	def open_loans(self, user_id: str) -> List[Dict[str, Any]]:
+		"""Préstamos no devueltos de un usuario."""
+		rows = self.conn().execute(_SQL_OPEN_LOANS, (user_id,)).fetchall()
+		return [
+			{'loan_id': r[0], 'book_key': r[1], 'loaned_at': r[2], 'due_at': r[3]}
+			for r in rows
+		]
+
+
+# Instancia global del ledger
+_ledger: Optional[LoanLedger] = None
+_ledger_lock = threading.Lock()
+
+def get_ledger() -> LoanLedger:
+	"""Retorna el ledger global, sincronizado con el catálogo en memoria."""
+	global _ledger
+	if _ledger is None:
+		with _ledger_lock:
+			if _ledger is None:
+				ledger = LoanLedger()
+				store = get_catalog_store()
+				ledger.sync_catalog(store.books())
+				store.on_reload(ledger.sync_catalog)
+				_ledger = ledger
+	return _ledger
@@ -11,8 +11,10 @@ Este módulo implementa un sistema de memoria conversacional que permite:
 
 from typing import List, Dict, Any
 from datetime import datetime
+import hashlib
 import json
 import os
+import threading
 
 class ConversationMemory:
 	"""
@@ -23,6 +25,9 @@ class ConversationMemory:
 	- Summary: Resúmenes de conversaciones anteriores
 	- Retrieval: Recuperación semántica basada en embeddings
 	- User Profile: Información personal del usuario
+	
+	El agente atiende requests concurrentes (agents/executor.py) sobre la
+	misma memoria: toda lectura o modificación se hace bajo un lock.
 	"""
 	
 	def __init__(self, max_history: int = 50):
@@ -31,6 +36,7 @@ class ConversationMemory:
 		self.conversation_summary: str = ""
 		self.session_id: str = ""
 		self.user_profile: Dict[str, Any] = {}  # IE3: Información personal del usuario
+		self._lock = threading.RLock()
 		
 	def save_context(self, user_input: str, assistant_output: str, session_id: str = ""):
 		"""
@@ -41,28 +47,29 @@ class ConversationMemory:
 			assistant_output: Respuesta del asistente
 			session_id: ID de sesión para persistencia
 		"""
-		self.session_id = session_id
-		
-		# Agregar mensajes al historial
-		self.message_history.append({
-			'timestamp': datetime.now().isoformat(),
-			'role': 'user',
-			'content': user_input
-		})
-		
-		self.message_history.append({
-			'timestamp': datetime.now().isoformat(),
-			'role': 'assistant',
-			'content': assistant_output
-		})
-		
-		# Limitar el historial según max_history
-		if len(self.message_history) > self.max_history:
-			self.message_history = self.message_history[-self.max_history:]
-		
-		# Actualizar resumen si hay demasiadas conversaciones
-		if len(self.message_history) > 20:
-			self._generate_summary()
+		with self._lock:
+			self.session_id = session_id
+			
+			# Agregar mensajes al historial
+			self.message_history.append({
+				'timestamp': datetime.now().isoformat(),
+				'role': 'user',
+				'content': user_input
+			})
+			
+			self.message_history.append({
+				'timestamp': datetime.now().isoformat(),
+				'role': 'assistant',
+				'content': assistant_output
+			})
+			
+			# Limitar el historial según max_history
+			if len(self.message_history) > self.max_history:
+				self.message_history = self.message_history[-self.max_history:]
+			
+			# Actualizar resumen si hay demasiadas conversaciones
+			if len(self.message_history) > 20:
+				self._generate_summary()
 	
 	def get_recent_context(self, n: int = 5) -> List[Dict[str, Any]]:
 		"""
@@ -74,45 +81,77 @@ class ConversationMemory:
 		Returns:
 			Lista de los últimos intercambios
 		"""
-		return self.message_history[-n:]
+		with self._lock:
+			return self.message_history[-n:]
 	
 	def get_full_history(self) -> List[Dict[str, Any]]:
-		"""Retorna el historial completo."""
-		return self.message_history
+		"""Retorna el historial completo (copia)."""
+		with self._lock:
+			return list(self.message_history)
 	
-	def build_context_string(self, include_summary: bool = True) -> str:
+	def context_sections(self, include_summary: bool = True) -> Dict[str, str]:
 		"""
-		Construye una cadena de contexto para incluir en prompts.
-		
-		Args:
-			include_summary: Si incluir el resumen de conversaciones previas
+		Partes del contexto por separado, para presupuestarlas (models/token_budget.py).
 		
 		Returns:
-			String con el contexto formateado
+			{'profile': líneas del perfil, 'summary': resumen previo,
+			 'history': mensajes recientes (uno por línea, del más antiguo al más nuevo)}
 		"""
+		with self._lock:
+			profile = [f"- {key}: {value}" for key, value in self.user_profile.items()]
+			history = [
+				f"{'Usuario' if msg['role'] == 'user' else 'Asistente'}: {msg['content']}"
+				for msg in self.get_recent_context(n=3)
+			]
+			summary = self.conversation_summary if include_summary else ""
+		return {
+			'profile': "\n".join(profile),
+			'summary': summary,
+			'history': "\n".join(history)
+		}
+	
+	@staticmethod
+	def format_context(sections: Dict[str, str]) -> str:
+		"""Arma la cadena de contexto a partir de context_sections (posiblemente recortadas)."""
 		context_parts = []
 		
 		# IE3: Agregar perfil del usuario PRIMERO (muy importante)
-		if self.user_profile:
+		if sections.get('profile'):
 			context_parts.append("=== INFORMACIÓN IMPORTANTE DEL USUARIO ===")
-			for key, value in self.user_profile.items():
-				context_parts.append(f"- {key}: {value}")
+			context_parts.append(sections['profile'])
 			context_parts.append("==========================================\n")
 		
 		# Agregar resumen si existe
-		if include_summary and self.conversation_summary:
-			context_parts.append(f"Resumen de conversaciones previas: {self.conversation_summary}")
+		if sections.get('summary'):
+			context_parts.append(f"Resumen de conversaciones previas: {sections['summary']}")
 		
 		# Agregar historial reciente
-		recent = self.get_recent_context(n=3)
-		if recent:
+		if sections.get('history'):
 			context_parts.append("\nConversación reciente:")
-			for msg in recent:
-				role = "Usuario" if msg['role'] == 'user' else "Asistente"
-				context_parts.append(f"{role}: {msg['content']}")
+			context_parts.append(sections['history'])
 		
 		return "\n".join(context_parts)
 	
+	def build_context_string(self, include_summary: bool = True) -> str:
+		"""
+		Construye una cadena de contexto para incluir en prompts.
+		
+		Args:
+			include_summary: Si incluir el resumen de conversaciones previas
+		
+		Returns:
+			String con el contexto formateado
+		"""
+		return self.format_context(self.context_sections(include_summary))
+	
+	def fingerprint(self) -> str:
+		"""
+		Huella del contexto que la memoria aporta a los prompts.
+		
+		Dos preguntas idénticas con la misma huella reciben el mismo prompt.
+		"""
+		return hashlib.sha1(self.build_context_string().encode('utf-8')).hexdigest()
+	
 	def update_user_profile(self, key: str, value: str):
 		"""
 		IE3: Actualiza el perfil del usuario con información personal.
@@ -121,11 +160,13 @@ class ConversationMemory:
 			key: Clave del dato (nombre, edad, preferencias, problema, etc.)
 			value: Valor del dato
 		"""
-		self.user_profile[key] = value
+		with self._lock:
+			self.user_profile[key] = value
 	
 	def get_user_profile(self) -> Dict[str, Any]:
-		"""Retorna el perfil completo del usuario."""
-		return self.user_profile
+		"""Retorna el perfil completo del usuario (copia)."""
+		with self._lock:
+			return dict(self.user_profile)
 	
 	def _generate_summary(self):
 		"""Genera un resumen de conversaciones anteriores para ahorrar tokens."""
@@ -152,17 +193,19 @@ class ConversationMemory:
 	
 	def clear(self):
 		"""Limpia la memoria."""
-		self.message_history = []
-		self.conversation_summary = ""
+		with self._lock:
+			self.message_history = []
+			self.conversation_summary = ""
 	
 	def save_to_file(self, filepath: str):
 		"""Guarda la memoria en un archivo JSON."""
-		data = {
-			'session_id': self.session_id,
-			'message_history': self.message_history,
-			'summary': self.conversation_summary,
-			'timestamp': datetime.now().isoformat()
-		}
+		with self._lock:
+			data = {
+				'session_id': self.session_id,
+				'message_history': list(self.message_history),
+				'summary': self.conversation_summary,
+				'timestamp': datetime.now().isoformat()
+			}
 		with open(filepath, 'w', encoding='utf-8') as f:
 			json.dump(data, f, ensure_ascii=False, indent=2)
 	
@@ -171,6 +214,7 @@ class ConversationMemory:
 		if os.path.exists(filepath):
 			with open(filepath, 'r', encoding='utf-8') as f:
 				data = json.load(f)
+			with self._lock:
 				self.session_id = data.get('session_id', '')
 				self.message_history = data.get('message_history', [])
 				self.conversation_summary = data.get('summary', '')
@@ -0,0 +1,124 @@
+"""
+IL2.1 - Codificación compacta de observaciones
+IE1: Herramientas del agente con salidas eficientes para el LLM
+
+Las herramientas de búsqueda devuelven JSON (una lista de libros o un
+diccionario término -> libros), pensado para ser parseado por código. Antes
+de entrar al prompt ReAct cada observación se reescribe en forma compacta:
+- Listas de registros como tabla: una fila de encabezado y una fila por
+  registro, con valores separados por " | " (sin repetir las claves)
+- Registros sueltos como clave=valor
+- Solo los campos útiles para el modelo (OBSERVATION_FIELDS por herramienta)
+- Como máximo OBSERVATION_MAX_ROWS filas por tabla; el resto se resume con
+  un marcador "… N más"
+
+Las salidas de texto ya son breves y se dejan tal cual. El resultado original
+se conserva para los eventos de streaming y las respuestas con plantilla.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+OBSERVATION_MAX_ROWS = int(os.environ.get("OBSERVATION_MAX_ROWS", "5"))
+
+# Campos enviados al modelo por herramienta ('available' repite 'status')
+BOOK_FIELDS = ('title', 'author', 'location', 'status')
+OBSERVATION_FIELDS = {
+	'search_book': BOOK_FIELDS,
+	'search_books_batch': BOOK_FIELDS,
+}
+
+
+def _value(value: Any) -> str:
+	"""Valor de una celda en una sola línea."""
+	if value is None:
+		return ""
+	if isinstance(value, bool):
+		return "sí" if value else "no"
+	return ' '.join(str(value).replace('|', '/').split())
+
+
+def _fields(rows: Sequence[Dict[str, Any]], fields: Optional[Sequence[str]]) -> List[str]:
+	"""Columnas a mostrar: las seleccionadas presentes o, sin selección, todas en orden de aparición."""
+	keys = list(dict.fromkeys(key for row in rows for key in row))
+	if fields is None:
+		return keys
+	return [field for field in fields if field in keys]
+
+
+def _more(hidden: int) -> str:
+	return f"… {hidden} más"
+
+
+def encode_table(rows: Sequence[Dict[str, Any]], fields: Optional[Sequence[str]] = None,
+                 max_rows: int = OBSERVATION_MAX_ROWS) -> str:
+	"""
+	Lista de registros como tabla compacta.
+
+	Args:
+		rows: Registros (diccionarios)
+		fields: Columnas a incluir, en orden; None = todas
+		max_rows: Filas máximas; las restantes se resumen con "… N más"
+	"""
+	if not rows:
+		return "(sin resultados)"
+	columns = _fields(rows, fields)
+	lines = [" | ".join(columns)]
+	lines.extend(" | ".join(_value(row.get(column)) for column in columns) for row in rows[:max_rows])
+	if len(rows) > max_rows:
+		lines.append(_more(len(rows) - max_rows))
+	return "\n".join(lines)
+
+
+def encode_record(record: Dict[str, Any], fields: Optional[Sequence[str]] = None) -> str:
+	"""Registro suelto como pares clave=valor."""
+	columns = _fields([record], fields)
+	return "; ".join(f"{column}={_value(record[column])}" for column in columns)
+
+
+def _encode(data: Any, fields: Optional[Sequence[str]], max_rows: int) -> Optional[str]:
+	"""Codifica un valor JSON; None si su forma no tiene codificación compacta."""
+	if isinstance(data, list):
+		if all(isinstance(item, dict) for item in data):
+			return encode_table(data, fields, max_rows)
+		if all(not isinstance(item, (dict, list)) for item in data):
+			shown = ", ".join(_value(item) for item in data[:max_rows])
+			return shown + (f" {_more(len(data) - max_rows)}" if len(data) > max_rows else "")
+		return None
+	if isinstance(data, dict):
+		if data and all(isinstance(value, list) for value in data.values()):
+			# Resultados agrupados (p. ej. por término de búsqueda)
+			parts = []
+			for key, value in data.items():
+				encoded = _encode(value, fields, max_rows)
+				if encoded is None:
+					return None
+				parts.append(f"{_value(key)}:\n{encoded}")
+			return "\n\n".join(parts)
+		if all(not isinstance(value, (dict, list)) for value in data.values()):
+			return encode_record(data, fields)
+	return None
+
+
+def encode_observation(tool_name: str, result: str, max_rows: int = OBSERVATION_MAX_ROWS) -> str:
+	"""
+	Versión compacta de la salida de una herramienta para el prompt ReAct.
+
+	Args:
+		tool_name: Herramienta que produjo la salida (define los campos)
+		result: Salida original de la herramienta
+		max_rows: Filas máximas por tabla
+
+	Returns:
+		Salida compacta, o la original si no es JSON con forma tabular
+	"""
+	stripped = result.strip()
+	if not stripped.startswith(('[', '{')):
+		return result
+	try:
+		data = json.loads(stripped)
+	except ValueError:
+		return result
+	encoded = _encode(data, OBSERVATION_FIELDS.get(tool_name), max_rows)
+	return result if encoded is None else encoded
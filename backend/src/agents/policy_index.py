@@ -0,0 +1,232 @@
+"""
+IL2.1 - Índice de políticas, reglamento y procedimientos
+IE1: Herramientas del agente con respuestas fundamentadas en los documentos
+
+Los documentos de políticas se parsean una sola vez en secciones (una por
+cada punto del documento) y se indexan en memoria:
+- Búsqueda por palabras clave con ranking BM25, ignorando acentos y con una
+  raíz simple por prefijo ("renovar" y "renovación" comparten raíz)
+- Búsqueda vectorial opcional con los embeddings de Ollama (POLICY_VECTOR_SEARCH=1),
+  combinada con la de palabras clave por fusión de rankings
+- Recarga cuando cambia el mtime o tamaño de algún documento, verificada
+  como máximo una vez por intervalo
+
+Formato de los documentos:
+	Título del documento
+	- Tema: contenido de la sección.
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.catalog import RELOAD_CHECK_INTERVAL
+from agents.search_index import tokenize, BM25_K1, BM25_B
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+POLICY_FILES = [
+	os.path.join(DATA_DIR, 'políticas_prestamos.txt'),
+	os.path.join(DATA_DIR, 'reglamento_multas.txt'),
+	os.path.join(DATA_DIR, 'procedimientos.txt'),
+]
+
+POLICY_VECTOR_SEARCH = os.environ.get("POLICY_VECTOR_SEARCH", "0") == "1"
+
+# Largo de la raíz usada para comparar términos
+STEM_LENGTH = 5
+
+# Peso del título del documento frente al contenido de la sección
+HEADING_WEIGHT = 0.5
+
+# Constante de la fusión de rankings (Reciprocal Rank Fusion)
+RRF_K = 60
+
+# Palabras frecuentes en preguntas que no aportan a la búsqueda
+QUERY_STOPWORDS = frozenset([
+	'que', 'cual', 'cuales', 'cuanto', 'cuanta', 'cuantos', 'cuantas', 'como', 'cuando',
+	'donde', 'por', 'para', 'puedo', 'puede', 'hay', 'es', 'son', 'se', 'me', 'mi', 'tengo',
+	'si', 'no', 'con', 'sobre', 'al', 'lo', 'le', 'su', 'sus', 'politica', 'politicas'
+])
+
+
+def stem(token: str) -> str:
+	"""Raíz aproximada de un token (prefijo de largo fijo)."""
+	return token[:STEM_LENGTH]
+
+
+def policy_terms(text: str) -> List[str]:
+	"""Raíces de los términos con valor de búsqueda de un texto."""
+	return [stem(t) for t in tokenize(text) if t not in QUERY_STOPWORDS]
+
+
+class PolicySection:
+	"""Un punto de un documento de políticas."""
+
+	__slots__ = ('source', 'heading', 'text')
+
+	def __init__(self, source: str, heading: str, text: str):
+		self.source = source
+		self.heading = heading
+		self.text = text
+
+	def __repr__(self) -> str:
+		return f"PolicySection({self.heading!r}, {self.text!r})"
+
+
+def parse_policy_document(content: str, source: str) -> List[PolicySection]:
+	"""
+	Divide un documento en secciones.
+
+	Las líneas que no empiezan con '-' fijan el título vigente; cada punto
+	'- ...' es una sección y las líneas siguientes sin guion se le agregan.
+	"""
+	sections: List[PolicySection] = []
+	heading = os.path.splitext(os.path.basename(source))[0]
+	current: Optional[PolicySection] = None
+	for raw in content.split('\n'):
+		line = raw.strip()
+		if not line:
+			current = None
+			continue
+		if line.startswith('-'):
+			current = PolicySection(source, heading, line.lstrip('-').strip())
+			sections.append(current)
+		elif current is not None and raw[:1].isspace():
+			current.text += ' ' + line
+		else:
+			heading = line.rstrip(':')
+			current = None
+	return sections
+
+
+class PolicyIndex:
+	"""
+	Índice BM25 (y opcionalmente vectorial) de las secciones de políticas.
+	"""
+
+	def __init__(self, sections: List[PolicySection], embeddings=None):
+		self.sections = sections
+		self._postings: Dict[str, Dict[int, float]] = {}
+		self._idf: Dict[str, float] = {}
+		self._embeddings = embeddings
+		self._vectors: Optional[np.ndarray] = None
+		self._build()
+
+	def _build(self):
+		postings = defaultdict(dict)
+		doc_len = []
+		for doc_id, section in enumerate(self.sections):
+			length = 0.0
+			for text, weight in ((section.text, 1.0), (section.heading, HEADING_WEIGHT)):
+				for term in policy_terms(text):
+					postings[term][doc_id] = postings[term].get(doc_id, 0.0) + weight
+					length += weight
+			doc_len.append(length)
+
+		n_docs = len(self.sections)
+		avg_len = (sum(doc_len) / n_docs) if n_docs else 1.0
+		for term, docs in postings.items():
+			self._idf[term] = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+			self._postings[term] = {
+				doc_id: tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len[doc_id] / avg_len))
+				for doc_id, tf in docs.items()
+			}
+
+		if self._embeddings is not None and self.sections:
+			vectors = np.array(self._embeddings.embed_documents(
+				[f"{s.heading}: {s.text}" for s in self.sections]
+			), dtype=np.float32)
+			self._vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+	def _keyword_ranking(self, query: str) -> List[int]:
+		scores: Dict[int, float] = defaultdict(float)
+		for term in set(policy_terms(query)):
+			for doc_id, impact in self._postings.get(term, {}).items():
+				scores[doc_id] += self._idf[term] * impact
+		return sorted(scores, key=scores.get, reverse=True)
+
+	def _vector_ranking(self, query: str, limit: int) -> List[int]:
+		vector = np.asarray(self._embeddings.embed_query(query), dtype=np.float32)
+		similarity = self._vectors @ (vector / max(float(np.linalg.norm(vector)), 1e-9))
+		return np.argsort(-similarity)[:limit].tolist()
+
+	def search(self, query: str, limit: int = 3) -> List[PolicySection]:
+		"""
+		Secciones más relevantes para la consulta.
+
+		Sin búsqueda vectorial, solo se retornan secciones que comparten algún
+		término con la consulta.
+		"""
+		ranking = self._keyword_ranking(query)
+		if self._vectors is not None:
+			fused: Dict[int, float] = defaultdict(float)
+			for ranked in (ranking, self._vector_ranking(query, max(limit, 10))):
+				for rank, doc_id in enumerate(ranked):
+					fused[doc_id] += 1.0 / (RRF_K + rank)
+			ranking = sorted(fused, key=fused.get, reverse=True)
+		return [self.sections[doc_id] for doc_id in ranking[:limit]]
+
+
+def _files_signature() -> Tuple:
+	signature = []
+	for path in POLICY_FILES:
+		try:
+			stat = os.stat(path)
+			signature.append((path, stat.st_mtime_ns, stat.st_size))
+		except OSError:
+			signature.append((path, None, None))
+	return tuple(signature)
+
+
+def load_policy_sections() -> List[PolicySection]:
+	"""Lee y divide en secciones todos los documentos de políticas existentes."""
+	sections = []
+	for path in POLICY_FILES:
+		if os.path.exists(path):
+			with open(path, 'r', encoding='utf-8') as f:
+				sections.extend(parse_policy_document(f.read(), os.path.basename(path)))
+	return sections
+
+
+# Índice global, reconstruido cuando cambia algún documento
+_policy_index: Optional[PolicyIndex] = None
+_policy_signature = None
+_last_check = float('-inf')
+_index_lock = threading.Lock()
+_reload_listeners: List[Callable[[PolicyIndex], None]] = []
+
+def on_policy_reload(listener: Callable[[PolicyIndex], None]):
+	"""Registra una función a llamar con el nuevo índice tras cada recarga."""
+	_reload_listeners.append(listener)
+
+def get_policy_index() -> PolicyIndex:
+	"""Retorna el índice de políticas, recargándolo si los documentos cambiaron."""
+	global _policy_index, _policy_signature, _last_check
+	now = time.monotonic()
+	if _policy_index is not None and now - _last_check < RELOAD_CHECK_INTERVAL:
+		return _policy_index
+	reloaded = False
+	with _index_lock:
+		if _policy_index is None or now - _last_check >= RELOAD_CHECK_INTERVAL:
+			_last_check = now
+			signature = _files_signature()
+			if _policy_index is None or signature != _policy_signature:
+				embeddings = None
+				if POLICY_VECTOR_SEARCH:
+					from models.llm import get_embeddings
+					embeddings = get_embeddings()
+				_policy_index = PolicyIndex(load_policy_sections(), embeddings)
+				_policy_signature = signature
+				reloaded = True
+		index = _policy_index
+	if reloaded:
+		for listener in _reload_listeners:
+			listener(index)
+	return index
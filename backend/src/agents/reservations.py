@@ -0,0 +1,264 @@
+"""
+IL2.1 - Cola de reservas por título
+IE1: Herramientas del agente con efectos persistentes y consistentes
+
+Cada título tiene una cola de reservas ordenada por (prioridad, orden de
+llegada). Las filas viven en la tabla `reservations` del ledger y, en memoria,
+cada cola es un heap que se reconstruye desde SQLite la primera vez que se usa:
+- Reservar retorna la posición del usuario en la cola
+- Al devolver un préstamo, la copia se aparta para el siguiente de la cola
+  en O(log n) (heappop), en la misma transacción que cierra el préstamo
+- Las reservas listas que no se retiran a tiempo se expiran en lotes,
+  recorriendo solo el índice por fecha de expiración. El barrido se hace
+  al operar con la cola o consultar disponibilidad (como máximo una vez por
+  EXPIRY_CHECK_INTERVAL) y también puede ejecutarse desde cron:
+    python src/agents/reservations.py
+
+Reglas tomadas de políticas y procedimientos: máximo 2 reservas activas por
+usuario y 48 horas para retirar un libro reservado.
+"""
+
+import heapq
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.ledger import LoanLedger, get_ledger
+
+MAX_ACTIVE_RESERVATIONS = 2
+HOLD_SECONDS = 48 * 3600
+EXPIRY_BATCH_SIZE = 500
+# Segundos mínimos entre barridos de expiración automáticos
+EXPIRY_CHECK_INTERVAL = 60.0
+
+_SQL_PENDING_QUEUE = (
+	"SELECT priority, id, user_id FROM reservations "
+	"WHERE book_key = ? AND status = 'pending' ORDER BY priority, id"
+)
+_SQL_ACTIVE_FOR_USER = (
+	"SELECT COUNT(*) FROM reservations WHERE user_id = ? AND status IN ('pending', 'ready')"
+)
+_SQL_EXISTING = (
+	"SELECT id, status, priority, expires_at FROM reservations "
+	"WHERE book_key = ? AND user_id = ? AND status IN ('pending', 'ready')"
+)
+_SQL_INSERT = (
+	"INSERT INTO reservations (book_key, user_id, priority, created_at) VALUES (?, ?, ?, ?)"
+)
+_SQL_POSITION = (
+	"SELECT COUNT(*) FROM reservations WHERE book_key = ? AND status = 'pending' "
+	"AND (priority < ? OR (priority = ? AND id < ?))"
+)
+_SQL_HOLD_FREE_COPY = (
+	"UPDATE copies SET status = 'held', held_for = ? WHERE id = ("
+	"SELECT id FROM copies WHERE book_key = ? AND status = 'available' LIMIT 1"
+	") RETURNING id"
+)
+_SQL_MARK_READY = (
+	"UPDATE reservations SET status = 'ready', copy_id = ?, expires_at = ? "
+	"WHERE id = ? AND status = 'pending'"
+)
+_SQL_HOLD_COPY = "UPDATE copies SET status = 'held', held_for = ? WHERE id = ?"
+_SQL_RELEASE_COPY = "UPDATE copies SET status = 'available', held_for = NULL WHERE id = ?"
+_SQL_DUE_HOLDS = (
+	"SELECT id, book_key, copy_id FROM reservations "
+	"WHERE status = 'ready' AND expires_at < ? ORDER BY expires_at LIMIT ?"
+)
+_SQL_EXPIRE = "UPDATE reservations SET status = 'expired' WHERE id = ?"
+
+
+class ReservationQueue:
+	"""
+	Colas de reservas por título respaldadas por heaps en memoria.
+
+	Los heaps solo se modifican bajo `_lock`. Si una transacción falla, el
+	heap del título se descarta y se vuelve a cargar desde la base de datos.
+	"""
+
+	def __init__(self, ledger: LoanLedger):
+		self.ledger = ledger
+		self._heaps: Dict[str, List[Tuple[int, int, str]]] = {}
+		self._lock = threading.RLock()
+		self._next_expiry = 0.0
+
+	def _heap(self, conn: sqlite3.Connection, book_key: str) -> List[Tuple[int, int, str]]:
+		"""Heap de reservas pendientes del título (cargado desde SQLite si hace falta)."""
+		heap = self._heaps.get(book_key)
+		if heap is None:
+			# Las filas ya vienen ordenadas: una lista ordenada es un heap válido
+			heap = [tuple(row) for row in conn.execute(_SQL_PENDING_QUEUE, (book_key,))]
+			self._heaps[book_key] = heap
+		return heap
+
+	def _transaction(self, book_keys: List[str], func):
+		"""Ejecuta `func` en una transacción; si falla, invalida los heaps tocados."""
+		try:
+			return self.ledger.write(func)
+		except BaseException:
+			for key in book_keys:
+				self._heaps.pop(key, None)
+			raise
+
+	def enqueue(self, user_id: str, book_key: str, priority: int = 0) -> Dict[str, Any]:
+		"""
+		Agrega al usuario a la cola del título.
+
+		Si no hay cola y queda una copia libre, la copia se aparta de inmediato.
+
+		Args:
+			user_id: ID del usuario
+			book_key: Clave normalizada del título
+			priority: Menor valor = atendido antes (0 = normal)
+
+		Returns:
+			Dict con 'status' ('pending', 'ready' o 'limit'), 'reservation_id',
+			'position' (1 = siguiente en la cola) y 'expires_at' si está lista
+		"""
+		self.expire_due()
+		with self._lock:
+			def reserve(conn):
+				existing = conn.execute(_SQL_EXISTING, (book_key, user_id)).fetchone()
+				if existing:
+					reservation_id, status, existing_priority, expires_at = existing
+					return self._describe(conn, book_key, reservation_id, status, existing_priority, expires_at)
+
+				active = conn.execute(_SQL_ACTIVE_FOR_USER, (user_id,)).fetchone()[0]
+				if active >= MAX_ACTIVE_RESERVATIONS:
+					return {'status': 'limit', 'reservation_id': None, 'position': None}
+
+				heap = self._heap(conn, book_key)
+				reservation_id = conn.execute(_SQL_INSERT, (book_key, user_id, priority, time.time())).lastrowid
+
+				if not heap:
+					held = conn.execute(_SQL_HOLD_FREE_COPY, (user_id, book_key)).fetchall()
+					if held:
+						expires_at = time.time() + HOLD_SECONDS
+						conn.execute(_SQL_MARK_READY, (held[0][0], expires_at, reservation_id))
+						return {'status': 'ready', 'reservation_id': reservation_id,
+						        'position': 0, 'expires_at': expires_at}
+
+				result = self._describe(conn, book_key, reservation_id, 'pending', priority, None)
+				result['new_entry'] = (priority, reservation_id, user_id)
+				return result
+
+			result = self._transaction([book_key], reserve)
+			new_entry = result.pop('new_entry', None)
+			if new_entry:
+				heapq.heappush(self._heap(self.ledger.conn(), book_key), new_entry)
+			return result
+
+	def _describe(self, conn: sqlite3.Connection, book_key: str, reservation_id: int,
+	              status: str, priority: int, expires_at: Optional[float]) -> Dict[str, Any]:
+		"""Estado de una reserva con su posición en la cola."""
+		if status == 'ready':
+			return {'status': 'ready', 'reservation_id': reservation_id,
+			        'position': 0, 'expires_at': expires_at}
+		ahead = conn.execute(_SQL_POSITION, (book_key, priority, priority, reservation_id)).fetchone()[0]
+		return {'status': 'pending', 'reservation_id': reservation_id, 'position': ahead + 1}
+
+	def _promote(self, conn: sqlite3.Connection, book_key: str, copy_id: int) -> Optional[str]:
+		"""
+		Aparta la copia para el siguiente de la cola, o la libera si no hay nadie.
+
+		Las entradas del heap que ya no están pendientes se descartan al pasar.
+
+		Returns:
+			ID del usuario al que se apartó la copia, o None
+		"""
+		heap = self._heap(conn, book_key)
+		expires_at = time.time() + HOLD_SECONDS
+		while heap:
+			_, reservation_id, user_id = heapq.heappop(heap)
+			if conn.execute(_SQL_MARK_READY, (copy_id, expires_at, reservation_id)).rowcount:
+				conn.execute(_SQL_HOLD_COPY, (user_id, copy_id))
+				return user_id
+		conn.execute(_SQL_RELEASE_COPY, (copy_id,))
+		return None
+
+	def return_loan(self, loan_id: int) -> Optional[Dict[str, Any]]:
+		"""
+		Registra una devolución y atiende la cola del título.
+
+		Returns:
+			Dict con 'book_key' y 'promoted_user' (o None si la copia quedó
+			libre), o None si el préstamo no estaba abierto
+		"""
+		self.expire_due()
+		with self._lock:
+			touched: List[str] = []
+
+			def close(conn):
+				closed = self.ledger.close_loan(conn, loan_id)
+				if closed is None:
+					return None
+				copy_id, book_key = closed
+				touched.append(book_key)
+				return {'book_key': book_key, 'promoted_user': self._promote(conn, book_key, copy_id)}
+
+			return self._transaction(touched, close)
+
+	def expire_holds(self, batch_size: int = EXPIRY_BATCH_SIZE, now: Optional[float] = None) -> int:
+		"""
+		Expira las reservas listas cuyo plazo de retiro venció.
+
+		Trabaja por lotes (una transacción corta por lote) usando el índice
+		por fecha de expiración; cada copia liberada pasa al siguiente de su cola.
+
+		Returns:
+			Número de reservas expiradas
+		"""
+		now = time.time() if now is None else now
+		total = 0
+		while True:
+			with self._lock:
+				touched: List[str] = []
+
+				def sweep(conn):
+					rows = conn.execute(_SQL_DUE_HOLDS, (now, batch_size)).fetchall()
+					for reservation_id, book_key, copy_id in rows:
+						touched.append(book_key)
+						conn.execute(_SQL_EXPIRE, (reservation_id,))
+						self._promote(conn, book_key, copy_id)
+					return len(rows)
+
+				expired = self._transaction(touched, sweep)
+			total += expired
+			if expired < batch_size:
+				return total
+
+	def expire_due(self) -> int:
+		"""
+		Barrido de expiración si pasó EXPIRY_CHECK_INTERVAL desde el anterior.
+
+		Returns:
+			Número de reservas expiradas (0 si aún no correspondía barrer)
+		"""
+		now = time.time()
+		with self._lock:
+			if now < self._next_expiry:
+				return 0
+			self._next_expiry = now + EXPIRY_CHECK_INTERVAL
+		return self.expire_holds(now=now)
+
+
+# Instancia global de la cola de reservas
+_reservation_queue: Optional[ReservationQueue] = None
+_queue_lock = threading.Lock()
+
+def get_reservation_queue() -> ReservationQueue:
+	"""Retorna la cola de reservas global (sobre el ledger global)."""
+	global _reservation_queue
+	if _reservation_queue is None:
+		with _queue_lock:
+			if _reservation_queue is None:
+				_reservation_queue = ReservationQueue(get_ledger())
+	return _reservation_queue
+
+
+if __name__ == '__main__':
+	expired = get_reservation_queue().expire_holds()
+	print(f"Reservas expiradas: {expired:,}")
@@ -0,0 +1,270 @@
+"""
+IL2.1 - Índice de búsqueda del catálogo
+IE1: Herramientas del agente con búsqueda eficiente y resultados acotados
+
+Índice invertido de tokens sobre título, autor y ubicación de cada libro:
+- Normalización de mayúsculas y acentos ("garcia marquez" = "García Márquez")
+- Ranking BM25 con pesos por campo (el título pesa más que la ubicación)
+- Búsqueda por prefijo ("prog" encuentra "programación")
+- Índice de trigramas sobre el vocabulario para tolerar errores de tipeo
+- Límite de resultados para no inundar el contexto del LLM
+- Búsqueda exacta de títulos en O(1) por clave normalizada, con respaldo
+  aproximado (distancia de edición acotada) para títulos casi iguales
+"""
+
+import heapq
+import math
+import os
+import re
+import sys
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.catalog import Book, get_catalog_store
+
+# Peso de cada campo en la frecuencia de términos (BM25F simplificado)
+FIELD_WEIGHTS = (('title', 3.0), ('author', 2.0), ('location', 0.5))
+
+# Parámetros BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Palabras sin valor de búsqueda (incluye el texto fijo de las ubicaciones)
+STOPWORDS = frozenset([
+	'de', 'del', 'la', 'las', 'el', 'los', 'y', 'e', 'en', 'un', 'una', 'a', 'o',
+	'seccion', 'estante', 'nivel'
+])
+
+# Postings recorridos como máximo por término de consulta (ordenados por impacto)
+MAX_POSTINGS_PER_TERM = 5000
+
+# Expansiones por término de consulta y su peso relativo
+MAX_EXPANSIONS = 30
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+FUZZY_MIN_SIMILARITY = 0.5
+
+# Distancia de edición máxima aceptada al resolver un título aproximado
+MAX_TITLE_DISTANCE = 3
+TITLE_CANDIDATES = 20
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold(text: str) -> str:
+	"""Pasa a minúsculas y elimina acentos/diacríticos."""
+	decomposed = unicodedata.normalize('NFKD', text.lower())
+	return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+	"""Tokens normalizados de un texto, sin stopwords."""
+	return [t for t in _TOKEN_RE.findall(fold(text)) if t not in STOPWORDS]
+
+
+def title_key(title: str) -> str:
+	"""Clave normalizada de un título: sin acentos, comillas ni puntuación."""
+	return ' '.join(_TOKEN_RE.findall(fold(title)))
+
+
+def bounded_edit_distance(a: str, b: str, max_distance: int) -> int:
+	"""
+	Distancia de Levenshtein entre `a` y `b`, cortando apenas supera el máximo.
+
+	Returns:
+		La distancia, o max_distance + 1 si es mayor que max_distance
+	"""
+	if abs(len(a) - len(b)) > max_distance:
+		return max_distance + 1
+	previous = list(range(len(b) + 1))
+	for i, char_a in enumerate(a, 1):
+		current = [i]
+		for j, char_b in enumerate(b, 1):
+			current.append(min(
+				previous[j] + 1,
+				current[j - 1] + 1,
+				previous[j - 1] + (char_a != char_b)
+			))
+		if min(current) > max_distance:
+			return max_distance + 1
+		previous = current
+	return min(previous[-1], max_distance + 1)
+
+
+def trigrams(token: str) -> List[str]:
+	"""Trigramas de un token, con bordes marcados para favorecer inicios y finales."""
+	padded = f" {token} "
+	return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class CatalogIndex:
+	"""
+	Índice invertido del catálogo con ranking BM25.
+
+	Las listas de postings se guardan como arrays compactos (ids de documento
+	e impacto BM25 precalculado), ordenadas por impacto descendente. Así una
+	consulta recorre como máximo MAX_POSTINGS_PER_TERM entradas por término
+	aunque el término aparezca en cientos de miles de libros.
+	"""
+
+	def __init__(self, books: List[Book]):
+		self.books = books
+		self._postings: Dict[str, Tuple[array, array]] = {}
+		self._idf: Dict[str, float] = {}
+		self._titles: Dict[str, int] = {}
+		self._vocab: List[str] = []
+		self._trigrams: Dict[str, List[str]] = {}
+		# Trigramas distintos de cada token (denominador de Jaccard)
+		self._gram_counts: Dict[str, int] = {}
+		self._build()
+
+	def _build(self):
+		postings = defaultdict(dict)
+		doc_len = array('f')
+
+		for doc_id, book in enumerate(self.books):
+			self._titles.setdefault(title_key(book.title), doc_id)
+			length = 0.0
+			for field, weight in FIELD_WEIGHTS:
+				for token in tokenize(getattr(book, field)):
+					entry = postings[token]
+					entry[doc_id] = entry.get(doc_id, 0.0) + weight
+					length += weight
+			doc_len.append(length)
+
+		n_docs = len(self.books)
+		avg_len = (sum(doc_len) / n_docs) if n_docs else 1.0
+		for token, docs in postings.items():
+			impacts = []
+			for doc_id, tf in docs.items():
+				norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[doc_id] / avg_len)
+				impacts.append((tf * (BM25_K1 + 1) / (tf + norm), doc_id))
+			impacts.sort(reverse=True)
+			self._postings[token] = (
+				array('I', (doc_id for _, doc_id in impacts)),
+				array('f', (impact for impact, _ in impacts))
+			)
+			self._idf[token] = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+		self._vocab = sorted(self._postings)
+
+		grams = defaultdict(list)
+		for token in self._vocab:
+			token_grams = set(trigrams(token))
+			self._gram_counts[token] = len(token_grams)
+			for gram in token_grams:
+				grams[gram].append(token)
+		self._trigrams = dict(grams)
+
+	def search(self, query: str, limit: int = 10, prefix: bool = True) -> List[Tuple[Book, float]]:
+		"""
+		Busca libros por título, autor o ubicación.
+
+		Args:
+			query: Texto de búsqueda
+			limit: Número máximo de resultados
+			prefix: Si expandir términos por prefijo y similitud de trigramas
+
+		Returns:
+			Lista de (libro, score) ordenada por relevancia descendente
+		"""
+		terms = tokenize(query)
+		if not terms or not self.books:
+			return []
+
+		scores: Dict[int, float] = defaultdict(float)
+
+		for term in terms:
+			expansions = self._expand(term, prefix)
+			# El presupuesto de postings se reparte entre las expansiones del término
+			budget = max(limit, MAX_POSTINGS_PER_TERM // max(1, len(expansions)))
+			for token, boost in expansions.items():
+				doc_ids, impacts = self._postings[token]
+				weight = boost * self._idf[token]
+				for doc_id, impact in zip(doc_ids[:budget], impacts[:budget]):
+					scores[doc_id] += weight * impact
+
+		best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+		return [(self.books[doc_id], score) for doc_id, score in best]
+
+	def lookup_title(self, title: str) -> Optional[Book]:
+		"""
+		Resuelve un título al libro correspondiente.
+
+		Primero busca la clave normalizada en el diccionario de títulos (O(1));
+		si no existe, toma los mejores candidatos del índice invertido y
+		acepta el más cercano dentro de una distancia de edición acotada.
+
+		Returns:
+			El libro encontrado o None
+		"""
+		key = title_key(title)
+		if not key:
+			return None
+		doc_id = self._titles.get(key)
+		if doc_id is not None:
+			return self.books[doc_id]
+
+		max_distance = min(MAX_TITLE_DISTANCE, max(1, len(key) // 5))
+		best, best_distance = None, max_distance + 1
+		for book, _ in self.search(title, limit=TITLE_CANDIDATES):
+			distance = bounded_edit_distance(key, title_key(book.title), best_distance - 1)
+			if distance < best_distance:
+				best, best_distance = book, distance
+				if distance == 1:
+					break
+		return best
+
+	def _expand(self, term: str, prefix: bool) -> Dict[str, float]:
+		"""Términos del vocabulario que representan a `term`, con su peso."""
+		expansions = {}
+		if term in self._postings:
+			expansions[term] = 1.0
+
+		if prefix and len(term) >= 3:
+			start = bisect_left(self._vocab, term)
+			for token in self._vocab[start:start + MAX_EXPANSIONS]:
+				if not token.startswith(term):
+					break
+				expansions.setdefault(token, PREFIX_WEIGHT)
+
+			if not expansions:
+				for token, similarity in self._similar_tokens(term):
+					expansions.setdefault(token, FUZZY_WEIGHT * similarity)
+
+		return expansions
+
+	def _similar_tokens(self, term: str) -> List[Tuple[str, float]]:
+		"""Tokens del vocabulario con alta similitud de trigramas (Jaccard)."""
+		term_grams = set(trigrams(term))
+		shared: Dict[str, int] = defaultdict(int)
+		for gram in term_grams:
+			for token in self._trigrams.get(gram, ()):
+				shared[token] += 1
+
+		similar = []
+		for token, common in shared.items():
+			similarity = common / (len(term_grams) + self._gram_counts[token] - common)
+			if similarity >= FUZZY_MIN_SIMILARITY:
+				similar.append((token, similarity))
+		return heapq.nlargest(MAX_EXPANSIONS, similar, key=lambda item: item[1])
+
+
+# Índice global, reconstruido cuando el catálogo se recarga (nueva lista de libros)
+_catalog_index: Optional[CatalogIndex] = None
+_index_lock = threading.Lock()
+
+def get_catalog_index() -> CatalogIndex:
+	"""Retorna el índice del catálogo actual (lo construye la primera vez)."""
+	global _catalog_index
+	store = get_catalog_store()
+	books = store.books()
+	if _catalog_index is None or _catalog_index.books is not books:
+		with _index_lock:
+			if _catalog_index is None or _catalog_index.books is not books:
+				_catalog_index = CatalogIndex(books)
+	return _catalog_index
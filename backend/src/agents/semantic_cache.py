@@ -0,0 +1,190 @@
+"""
+IL2.1 - Caché semántica de respuestas
+IE4: Reutilización de respuestas para preguntas equivalentes
+
+Muchas preguntas son paráfrasis de la misma consulta de políticas
+("¿cuántos días de préstamo?" / "¿por cuánto tiempo me prestan un libro?").
+La pregunta se convierte en embedding y se compara (similitud coseno) contra
+las respuestas anteriores guardadas en una matriz NumPy en memoria; sobre el
+umbral, se responde sin ejecutar el agente.
+
+Se evita reutilizar respuestas que no son equivalentes:
+- Solo se guardan respuestas obtenidas únicamente con herramientas
+  genéricas (políticas), o respuestas sin herramientas a preguntas del
+  dominio de políticas; las de libros, préstamos o multas dependen de la
+  entidad consultada (y sin herramientas no hay garantía de lo contrario)
+- Las preguntas deben mencionar los mismos números ("5 días" != "6 días")
+- Se omite la caché si la sesión tiene perfil de usuario o la pregunta alude
+  a la conversación o a datos personales (la respuesta sería personalizada)
+- Las entradas vencen por TTL y se descartan al recargarse las políticas
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.search_index import fold
+from agents.router import detect_domain
+from agents.policy_index import on_policy_reload
+from monitoring.metrics import get_metrics_collector
+
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_SIZE = int(os.environ.get("SEMANTIC_CACHE_SIZE", "2048"))
+SEMANTIC_CACHE_TTL = float(os.environ.get("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "1") == "1"
+
+# Herramientas cuyas respuestas no dependen de una entidad concreta
+SEMANTIC_CACHEABLE_TOOLS = frozenset(['get_policies'])
+
+# Candidatos revisados por consulta (por si el más similar no cumple los filtros)
+_CANDIDATES = 5
+
+# Preguntas que dependen de la conversación o del usuario
+_MEMORY_DEPENDENT = re.compile(
+	r'\b(?:me llamo|mi nombre|soy|tengo \d+ anos|recuerdas|te dije|dijiste|antes|anterior|'
+	r'ese|esa|esos|esas|eso|lo mismo|tambien|y si|mis?)\b'
+)
+
+_NUMBER_RE = re.compile(r'\d+')
+
+
+def memory_dependent(question: str, memory) -> bool:
+	"""Indica si la respuesta puede depender del perfil o de la conversación."""
+	if memory is not None and memory.get_user_profile():
+		return True
+	return bool(_MEMORY_DEPENDENT.search(fold(question)))
+
+
+def _numbers(question: str) -> FrozenSet[str]:
+	return frozenset(n.lstrip('0') or '0' for n in _NUMBER_RE.findall(question))
+
+
+class SemanticAnswerCache:
+	"""
+	Índice vectorial en memoria de preguntas ya respondidas.
+
+	Los embeddings normalizados se guardan en una matriz de capacidad fija;
+	al llenarse, cada nueva entrada reemplaza a la más antigua (buffer
+	circular), de modo que insertar es O(1) y buscar es un producto
+	matriz-vector.
+	"""
+
+	def __init__(self, embeddings, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+	             capacity: int = SEMANTIC_CACHE_SIZE, ttl: float = SEMANTIC_CACHE_TTL):
+		self.embeddings = embeddings
+		self.threshold = threshold
+		self.capacity = capacity
+		self.ttl = ttl
+		self._vectors: Optional[np.ndarray] = None
+		self._expires = np.zeros(capacity, dtype=np.float64)
+		self._answers: List[Optional[str]] = [None] * capacity
+		self._numbers: List[FrozenSet[str]] = [frozenset()] * capacity
+		self._latency = np.zeros(capacity, dtype=np.float64)
+		self._next = 0
+		self._lock = threading.Lock()
+		self.metrics = get_metrics_collector()
+
+	def _embed(self, question: str) -> np.ndarray:
+		vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+		return vector / max(float(np.linalg.norm(vector)), 1e-9)
+
+	def lookup(self, question: str, memory=None) -> Tuple[Optional[str], Optional[np.ndarray]]:
+		"""
+		Busca una respuesta previa para una pregunta equivalente.
+
+		Returns:
+			(respuesta o None, embedding de la pregunta para store(); None si
+			la caché no aplica a esta pregunta)
+		"""
+		if memory_dependent(question, memory):
+			self.metrics.track_semantic_cache('bypass')
+			return None, None
+
+		start = time.time()
+		try:
+			vector = self._embed(question)
+		except Exception:
+			# Sin embeddings (Ollama no disponible) la consulta sigue por el agente
+			self.metrics.track_semantic_cache('bypass')
+			return None, None
+
+		numbers = _numbers(question)
+		with self._lock:
+			answer, saved = None, 0.0
+			if self._vectors is not None and self._vectors.shape[1] == vector.shape[0]:
+				similarity = self._vectors @ vector
+				similarity[self._expires < time.time()] = -1.0
+				for i in np.argsort(-similarity)[:_CANDIDATES].tolist():
+					if similarity[i] < self.threshold:
+						break
+					if self._numbers[i] == numbers:
+						answer, saved = self._answers[i], float(self._latency[i])
+						break
+
+		lookup_latency = time.time() - start
+		if answer is None:
+			self.metrics.track_semantic_cache('miss', lookup_latency=lookup_latency)
+			return None, vector
+		self.metrics.track_semantic_cache('hit', max(0.0, saved - lookup_latency), lookup_latency)
+		return answer, vector
+
+	def store(self, vector: Optional[np.ndarray], question: str, answer: str,
+	          latency: float, tools_used: Iterable[str]):
+		"""
+		Guarda la respuesta si es reutilizable.
+
+		Args:
+			vector: Embedding retornado por lookup() (None = no aplica)
+			latency: Tiempo que tomó obtener la respuesta con el agente
+			tools_used: Herramientas ejecutadas para responder
+		"""
+		if vector is None or not answer:
+			return
+		tools_used = set(tools_used)
+		if tools_used:
+			if not tools_used <= SEMANTIC_CACHEABLE_TOOLS:
+				return
+		elif detect_domain(question) != 'policies':
+			# Sin herramientas, la respuesta puede ser específica de la entidad consultada
+			return
+		with self._lock:
+			if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+				self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+				self._expires[:] = 0.0
+			i = self._next
+			self._vectors[i] = vector
+			self._expires[i] = time.time() + self.ttl
+			self._answers[i] = answer
+			self._numbers[i] = _numbers(question)
+			self._latency[i] = latency
+			self._next = (i + 1) % self.capacity
+
+	def invalidate(self):
+		"""Descarta todas las respuestas guardadas."""
+		with self._lock:
+			self._expires[:] = 0.0
+
+
+# Caché global, conectada a las embeddings de Ollama
+_semantic_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+def get_semantic_cache() -> Optional[SemanticAnswerCache]:
+	"""Retorna la caché semántica global, o None si está deshabilitada."""
+	global _semantic_cache
+	if not SEMANTIC_CACHE_ENABLED:
+		return None
+	if _semantic_cache is None:
+		with _cache_lock:
+			if _semantic_cache is None:
+				from models.llm import get_embeddings
+				cache = SemanticAnswerCache(get_embeddings())
+				on_policy_reload(lambda index: cache.invalidate())
+				_semantic_cache = cache
+	return _semantic_cache
@@ -0,0 +1,114 @@
+"""
+IL2.1 - Ejecución especulativa de herramientas
+IE6: Toma de decisiones adaptativa según el tipo de consulta
+
+La primera herramienta que pedirá el agente suele ser predecible a partir de
+la pregunta (fast_path.predict_actions). En lugar de esperar a que el LLM
+termine su primera generación, esas herramientas de solo lectura se lanzan
+en segundo plano apenas empieza el razonamiento:
+- Si la primera acción del modelo coincide (misma herramienta y argumentos
+  equivalentes), se usa el resultado ya calculado
+- Si no coincide, el resultado se descarta (se cancela si aún no empezó)
+
+Se registra en MetricsCollector cada ejecución anticipada: aprovechada,
+desperdiciada (con el tiempo de trabajo perdido) o cancelada a tiempo.
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.search_index import fold
+from agents.tool_registry import ToolRegistry, ToolInputError
+from monitoring.metrics import get_metrics_collector
+
+SPECULATION_ENABLED = os.environ.get("TOOL_SPECULATION", "1") == "1"
+
+
+class Speculation:
+	"""Herramientas anticipadas para la primera generación de un request."""
+
+	def __init__(self, registry: ToolRegistry, pool: ThreadPoolExecutor,
+	             call: Callable[[str, str], Any], actions: List[Dict[str, str]]):
+		"""
+		Args:
+			registry: Registro para normalizar los argumentos
+			pool: Pool donde se ejecutan las herramientas
+			call: Función (herramienta, input) -> resultado, como LibraryAgent._call_tool
+			actions: Acciones predichas ('tool', 'input')
+		"""
+		self.registry = registry
+		self.metrics = get_metrics_collector()
+		self._futures: Dict[Tuple[str, str], Future] = {}
+		self._elapsed: Dict[Tuple[str, str], float] = {}
+		self._settled = False
+		for action in actions:
+			key = self._key(action['tool'], action['input'])
+			if key is not None and key not in self._futures:
+				self._futures[key] = pool.submit(self._run, key, call, action)
+
+	def _key(self, tool_name: str, tool_input: str) -> Optional[Tuple[str, str]]:
+		"""(herramienta, argumentos validados sin mayúsculas ni acentos), o None si no son válidos."""
+		spec = self.registry.get(tool_name)
+		if spec is None:
+			return None
+		try:
+			arguments = spec.parse(tool_input)
+		except ToolInputError:
+			return None
+		normalized = {
+			k: ' '.join(fold(v).split()) if isinstance(v, str) else v
+			for k, v in arguments.items()
+		}
+		return tool_name, json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+
+	def _run(self, key: Tuple[str, str], call: Callable[[str, str], Any], action: Dict[str, str]) -> Any:
+		start = time.time()
+		try:
+			return call(action['tool'], action['input'])
+		finally:
+			self._elapsed[key] = time.time() - start
+
+	def __len__(self) -> int:
+		return len(self._futures)
+
+	def settle(self, actions: List[Dict[str, Any]]) -> List[Optional[Future]]:
+		"""
+		Asigna los resultados anticipados a las acciones del modelo y descarta el resto.
+
+		Solo se llama una vez (con las acciones de la primera generación); las
+		llamadas siguientes no asignan nada.
+
+		Returns:
+			Por cada acción, el Future con su resultado anticipado o None
+		"""
+		if self._settled:
+			return [None] * len(actions)
+		self._settled = True
+
+		prefetched: List[Optional[Future]] = []
+		used = set()
+		for action in actions:
+			key = self._key(action['tool'], action['input'])
+			if key in self._futures and key not in used:
+				used.add(key)
+				prefetched.append(self._futures[key])
+				self.metrics.track_speculation('hit', action['tool'])
+			else:
+				prefetched.append(None)
+
+		for key, future in self._futures.items():
+			if key in used:
+				continue
+			if future.cancel():
+				self.metrics.track_speculation('cancelled', key[0])
+			else:
+				# Ya en ejecución: el trabajo perdido se conoce al terminar
+				future.add_done_callback(
+					lambda f, key=key: self.metrics.track_speculation('wasted', key[0], self._elapsed.get(key, 0.0))
+				)
+		return prefetched
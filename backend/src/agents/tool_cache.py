@@ -0,0 +1,145 @@
+"""
+IL2.1 - Caché de resultados de herramientas
+IE1: Herramientas del agente sin recomputar consultas repetidas
+
+Las llamadas idénticas a herramientas de solo lectura (mismos argumentos ya
+validados) se sirven desde memoria:
+- Cada entrada vence según el TTL de la herramienta
+- Tamaño acotado con desalojo LRU
+- Invalidación explícita por fuente de datos: al recargarse el catálogo o
+  las políticas, o al escribir en el ledger, se descartan las entradas de las
+  herramientas que dependen de esa fuente
+
+Las herramientas se declaran cacheables en AGENT_TOOLS ('cacheable', 'ttl',
+'sources'); las que modifican datos (create_loan, reserve_book, return_book) no lo son.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.tools import AGENT_TOOLS
+from agents.catalog import get_catalog_store
+from agents.ledger import get_ledger
+from agents.policy_index import get_policy_index, on_policy_reload
+
+TOOL_CACHE_SIZE = int(os.environ.get("TOOL_CACHE_SIZE", "1024"))
+TOOL_CACHE_TTL = float(os.environ.get("TOOL_CACHE_TTL", "300"))
+
+
+class ToolResultCache:
+	"""
+	Caché LRU con TTL de resultados de herramientas.
+
+	La clave es (herramienta, argumentos en JSON canónico), de modo que
+	'{"title": "1984"}' y '1984' comparten entrada tras la validación.
+	"""
+
+	def __init__(self, tools: List[Dict[str, Any]], max_entries: int = TOOL_CACHE_SIZE,
+	             default_ttl: float = TOOL_CACHE_TTL):
+		self.max_entries = max_entries
+		self._ttl: Dict[str, float] = {}
+		self._sources: Dict[str, Tuple[str, ...]] = {}
+		for tool in tools:
+			if tool.get('cacheable'):
+				self._ttl[tool['name']] = tool.get('ttl', default_ttl)
+				self._sources[tool['name']] = tuple(tool.get('sources', ()))
+		self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+		self._checks: Dict[str, Callable[[], Any]] = {}
+		self._lock = threading.RLock()
+		# Aumenta con cada invalidación: un resultado calculado antes de una
+		# invalidación no se guarda después de ella
+		self.generation = 0
+
+	def cacheable(self, tool_name: str) -> bool:
+		return tool_name in self._ttl
+
+	def register_source(self, source: str, check: Callable[[], Any]):
+		"""
+		Registra la verificación de cambios de una fuente de datos.
+
+		`check` se llama antes de cada lectura de una herramienta que depende
+		de la fuente; si detecta un cambio, la recarga dispara la invalidación.
+		"""
+		self._checks[source] = check
+
+	@staticmethod
+	def _key(tool_name: str, arguments: Dict[str, Any]) -> Tuple[str, str]:
+		return tool_name, json.dumps(arguments, sort_keys=True, ensure_ascii=False)
+
+	def get(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+		"""Resultado vigente para la llamada, o None."""
+		if not self.cacheable(tool_name):
+			return None
+		for source in self._sources[tool_name]:
+			check = self._checks.get(source)
+			if check:
+				check()
+
+		key = self._key(tool_name, arguments)
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None:
+				return None
+			if entry[0] < time.monotonic():
+				del self._entries[key]
+				return None
+			self._entries.move_to_end(key)
+			return entry[1]
+
+	def put(self, tool_name: str, arguments: Dict[str, Any], result: str, generation: int):
+		"""
+		Guarda el resultado si la herramienta es cacheable.
+
+		Args:
+			generation: Valor de `generation` leído antes de calcular el resultado
+		"""
+		if not self.cacheable(tool_name):
+			return
+		with self._lock:
+			if generation != self.generation:
+				return
+			key = self._key(tool_name, arguments)
+			self._entries[key] = (time.monotonic() + self._ttl[tool_name], result)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def invalidate(self, source: Optional[str] = None):
+		"""Descarta las entradas de herramientas que dependen de `source` (o todas)."""
+		with self._lock:
+			self.generation += 1
+			if source is None:
+				self._entries.clear()
+				return
+			for key in [k for k in self._entries if source in self._sources.get(k[0], ())]:
+				del self._entries[key]
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+
+# Caché global, conectado a las fuentes de datos de las herramientas
+_tool_cache: Optional[ToolResultCache] = None
+_cache_lock = threading.Lock()
+
+def get_tool_cache() -> ToolResultCache:
+	"""Retorna la caché global de resultados de herramientas."""
+	global _tool_cache
+	if _tool_cache is None:
+		with _cache_lock:
+			if _tool_cache is None:
+				cache = ToolResultCache(AGENT_TOOLS)
+				store = get_catalog_store()
+				store.on_reload(lambda books: cache.invalidate('catalog'))
+				cache.register_source('catalog', store.books)
+				get_ledger().on_write(lambda: cache.invalidate('ledger'))
+				on_policy_reload(lambda index: cache.invalidate('policies'))
+				cache.register_source('policies', get_policy_index)
+				_tool_cache = cache
+	return _tool_cache
@@ -0,0 +1,208 @@
+"""
+IL2.1 - Registro tipado de herramientas
+IE1: Invocación de herramientas con argumentos validados
+
+Deriva un esquema JSON de la firma de cada función de AGENT_TOOLS y lo usa para:
+- Describir las herramientas en el system prompt (argumentos y tipos)
+- Parsear el "Action Input" como objeto JSON ({"title": "Cien años de soledad"}),
+  sin partir títulos que contienen comas o comillas
+- Validar y convertir los argumentos (p. ej. "14" -> 14) antes de llamar
+
+Se acepta también el formato anterior (argumentos separados por coma) para
+las entradas que no son JSON, como las de la ruta rápida.
+"""
+
+import inspect
+import json
+import os
+import sys
+import threading
+import typing
+from typing import Any, Callable, Dict, List, Optional
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.tools import AGENT_TOOLS
+
+_JSON_TYPES = {str: 'string', int: 'integer', float: 'number', bool: 'boolean'}
+
+
+class ToolInputError(ValueError):
+	"""Argumentos de una herramienta que no cumplen su esquema."""
+
+
+def _type_schema(annotation) -> Dict[str, Any]:
+	"""Esquema JSON de una anotación de tipo (str, int, List[str], Union[...])."""
+	origin = typing.get_origin(annotation)
+	if annotation in _JSON_TYPES:
+		return {'type': _JSON_TYPES[annotation]}
+	if annotation is list or origin in (list, List):
+		args = typing.get_args(annotation)
+		return {'type': 'array', 'items': _type_schema(args[0]) if args else {'type': 'string'}}
+	if origin is typing.Union:
+		options = [a for a in typing.get_args(annotation) if a is not type(None)]
+		if len(options) == 1:
+			return _type_schema(options[0])
+		return {'type': [_type_schema(a)['type'] for a in options]}
+	return {'type': 'string'}
+
+
+def _coerce(value: Any, schema: Dict[str, Any], name: str) -> Any:
+	"""Convierte un valor al tipo del esquema o lanza ToolInputError."""
+	types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+	for json_type in types:
+		try:
+			if json_type == 'integer':
+				if isinstance(value, bool):
+					raise ValueError
+				number = float(value)
+				if number != int(number):
+					raise ValueError
+				return int(number)
+			if json_type == 'number':
+				return float(value)
+			if json_type == 'boolean':
+				if isinstance(value, str):
+					return value.strip().lower() in ('true', 'si', 'sí', '1')
+				return bool(value)
+			if json_type == 'array':
+				if isinstance(value, str):
+					text = value.strip()
+					value = json.loads(text) if text.startswith('[') else text.split(';')
+				if not isinstance(value, (list, tuple)):
+					value = [value]
+				return [_coerce(item, schema['items'], name) for item in value
+				        if not (isinstance(item, str) and not item.strip())]
+			if isinstance(value, (dict, list)):
+				raise ValueError
+			return str(value).strip()
+		except (TypeError, ValueError):
+			continue
+	raise ToolInputError(f"el argumento '{name}' debe ser de tipo {'/'.join(types)} (recibido: {value!r})")
+
+
+class ToolSpec:
+	"""Herramienta con su esquema de argumentos derivado de la firma."""
+
+	def __init__(self, name: str, description: str, func: Callable):
+		self.name = name
+		self.description = description
+		self.func = func
+		self.properties: Dict[str, Dict[str, Any]] = {}
+		self.required: List[str] = []
+		self.defaults: Dict[str, Any] = {}
+
+		hints = typing.get_type_hints(func)
+		for param in inspect.signature(func).parameters.values():
+			self.properties[param.name] = _type_schema(hints.get(param.name, str))
+			if param.default is inspect.Parameter.empty:
+				self.required.append(param.name)
+			else:
+				self.defaults[param.name] = param.default
+
+	@property
+	def schema(self) -> Dict[str, Any]:
+		"""Esquema JSON del objeto de argumentos."""
+		return {'type': 'object', 'properties': self.properties, 'required': self.required}
+
+	def signature_hint(self) -> str:
+		"""Ejemplo compacto de argumentos para el prompt: {"title": "string", ...}."""
+		parts = []
+		for name, schema in self.properties.items():
+			json_type = schema['type'] if isinstance(schema['type'], str) else '|'.join(schema['type'])
+			if json_type == 'array':
+				json_type = f"[{schema['items']['type']}, ...]"
+			if name in self.defaults and self.defaults[name] is not None:
+				json_type += f" (opcional, {self.defaults[name]})"
+			elif name in self.defaults:
+				json_type += " (opcional)"
+			parts.append(f'"{name}": {json_type}')
+		return '{' + ', '.join(parts) + '}'
+
+	def validate(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+		"""Valida y convierte un objeto de argumentos según el esquema."""
+		unknown = [key for key in arguments if key not in self.properties]
+		if unknown:
+			raise ToolInputError(f"argumentos desconocidos para {self.name}: {', '.join(unknown)}")
+		missing = [key for key in self.required if arguments.get(key) in (None, '')]
+		if missing:
+			raise ToolInputError(f"faltan argumentos para {self.name}: {', '.join(missing)}")
+		return {
+			key: _coerce(value, self.properties[key], key)
+			for key, value in arguments.items() if value is not None
+		}
+
+	def parse(self, tool_input: str) -> Dict[str, Any]:
+		"""
+		Convierte el "Action Input" en argumentos validados.
+
+		- '{"title": "..."}': objeto JSON con argumentos por nombre
+		- '["A", "B"], 5': argumentos posicionales en JSON
+		- 'a, b, c': argumentos separados por coma ('a; b' es una lista)
+
+		Si el texto separado por comas no cumple el esquema y el resto de los
+		argumentos es opcional, el texto completo se usa como primer argumento.
+		"""
+		text = tool_input.strip()
+		if text.startswith('{'):
+			try:
+				arguments = json.loads(text)
+			except ValueError as e:
+				raise ToolInputError(f"JSON inválido para {self.name}: {e}")
+			if not isinstance(arguments, dict):
+				raise ToolInputError(f"se esperaba un objeto JSON para {self.name}")
+			return self.validate(arguments)
+
+		if text.startswith('['):
+			try:
+				return self._positional(json.loads(f"[{text}]"))
+			except ValueError:
+				pass
+
+		try:
+			return self._positional([s.strip() for s in text.split(',')])
+		except ToolInputError:
+			if not self.properties or len(self.required) > 1:
+				raise
+			first = next(iter(self.properties))
+			return self.validate({first: text})
+
+	def _positional(self, values: List[Any]) -> Dict[str, Any]:
+		if len(values) > len(self.properties):
+			raise ToolInputError(
+				f"{self.name} recibe como máximo {len(self.properties)} argumentos ({len(values)} recibidos)"
+			)
+		return self.validate(dict(zip(self.properties, values)))
+
+
+class ToolRegistry:
+	"""Herramientas disponibles para el agente, indexadas por nombre."""
+
+	def __init__(self, tools: List[Dict[str, Any]]):
+		self.specs: Dict[str, ToolSpec] = {
+			tool['name']: ToolSpec(tool['name'], tool['description'], tool['func'])
+			for tool in tools
+		}
+
+	def get(self, name: str) -> Optional[ToolSpec]:
+		return self.specs.get(name)
+
+	def prompt_block(self) -> str:
+		"""Lista de herramientas con sus argumentos para el system prompt."""
+		return '\n'.join(
+			f"- {spec.name} {spec.signature_hint()}: {spec.description.split(' Input:')[0]}"
+			for spec in self.specs.values()
+		)
+
+
+# Registro global construido a partir de AGENT_TOOLS
+_tool_registry: Optional[ToolRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_tool_registry() -> ToolRegistry:
+	"""Retorna el registro global de herramientas."""
+	global _tool_registry
+	if _tool_registry is None:
+		with _registry_lock:
+			if _tool_registry is None:
+				_tool_registry = ToolRegistry(AGENT_TOOLS)
+	return _tool_registry
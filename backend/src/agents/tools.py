@@ -11,87 +11,152 @@ Este módulo define las herramientas que el agente puede utilizar para:
 
 import json
 import os
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+import re
+import sys
+from typing import List, Dict, Any, Optional, Union
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Ruta al catálogo de libros
-CATALOG_PATH = os.path.join(os.path.dirname(__file__), '../../data/catalogo_libros.txt')
-POLICIES_PATH = os.path.join(os.path.dirname(__file__), '../../data/políticas_prestamos.txt')
+from agents.catalog import get_catalog_store, CATALOG_PATH
+from agents.search_index import get_catalog_index, title_key
+from agents.ledger import get_ledger, USER_ID_PATTERN
+from agents.reservations import get_reservation_queue, MAX_ACTIVE_RESERVATIONS
+from agents.fines import get_fine_assessor
+from agents.policy_index import get_policy_index
+
+# Tamaño máximo de la respuesta de get_policies (caracteres)
+MAX_POLICY_CHARS = 800
 
 def load_catalog() -> List[Dict[str, Any]]:
-	"""Carga el catálogo de libros desde el archivo."""
-	try:
-		with open(CATALOG_PATH, 'r', encoding='utf-8') as f:
-			content = f.read()
-		# Parsear el catálogo (formato simple)
-		books = []
-		for line in content.split('\n'):
-			if '|' in line:
-				parts = [p.strip() for p in line.split('|')]
-				if len(parts) >= 3:
-					books.append({
-						'title': parts[0],
-						'author': parts[1] if len(parts) > 1 else '',
-						'genre': parts[2] if len(parts) > 2 else '',
-						'available': True  # Por defecto disponible
-					})
-		return books
-	except:
-		return []
-
-
-def search_book(search_term: str) -> str:
+	"""Retorna el catálogo de libros (desde la copia en memoria)."""
+	return [book.to_dict() for book in get_catalog_store().books()]
+
+
+def search_book(search_term: str, limit: int = 10) -> str:
 	"""
 	Herramienta 1: Buscar libros en el catálogo.
 	
+	Usa el índice invertido del catálogo: ignora mayúsculas y acentos,
+	acepta prefijos y ordena por relevancia (BM25).
+	
 	Args:
-		search_term: Término de búsqueda (título, autor o género)
+		search_term: Término de búsqueda (título, autor o sección)
+		limit: Número máximo de resultados (default: 10)
 	
 	Returns:
 		Lista de libros encontrados en formato JSON
 	"""
-	books = load_catalog()
-	results = []
-	search_lower = search_term.lower()
-	
-	for book in books:
-		if (search_lower in book.get('title', '').lower() or
-		    search_lower in book.get('author', '').lower() or
-		    search_lower in book.get('genre', '').lower()):
-			results.append(book)
+	results = get_catalog_index().search(search_term, limit=int(limit))
 	
 	if not results:
 		return "No se encontraron libros con el término: " + search_term
 	
-	return json.dumps(results, ensure_ascii=False, indent=2)
+	return json.dumps([book.to_dict() for book, _ in results], ensure_ascii=False)
 
 
 def check_availability(title: str) -> str:
 	"""
 	Herramienta 2: Verificar disponibilidad de un libro específico.
 	
+	El título se resuelve ignorando mayúsculas, acentos, comillas y
+	puntuación, y tolera pequeñas diferencias de escritura.
+	
 	Args:
 		title: Título del libro
 	
 	Returns:
 		Estado de disponibilidad
 	"""
-	books = load_catalog()
+	book = get_catalog_index().lookup_title(title)
+	
+	if book is None:
+		return f"No se encontró el libro '{title}' en el catálogo."
+	
+	# Las copias apartadas con plazo vencido vuelven a estar disponibles
+	get_reservation_queue().expire_due()
+	if get_ledger().available_copies(title_key(book.title)) > 0:
+		return f"El libro '{book.title}' está disponible para préstamo."
+	return f"El libro '{book.title}' no está disponible actualmente."
+
+
+def _as_list(items) -> List[str]:
+	"""Normaliza una lista de términos: lista, JSON '["a", "b"]' o texto 'a; b'."""
+	if isinstance(items, (list, tuple)):
+		values = items
+	else:
+		text = str(items).strip()
+		try:
+			values = json.loads(text) if text.startswith('[') else text.split(';')
+		except ValueError:
+			values = text.strip('[]').split(';')
+	return [str(v).strip().strip('"\'') for v in values if str(v).strip()]
+
+
+def check_availability_many(titles: List[str]) -> str:
+	"""
+	Herramienta 2b: Verificar la disponibilidad de varios libros en una llamada.
+	
+	Todos los títulos se resuelven contra el mismo índice y las copias
+	disponibles se consultan en una sola pasada sobre el ledger.
+	
+	Args:
+		titles: Lista de títulos (lista, JSON o separados por ';')
+	
+	Returns:
+		Estado de disponibilidad de cada título, uno por línea
+	"""
+	titles = _as_list(titles)
+	if not titles:
+		return "No se indicaron títulos para verificar."
 	
-	for book in books:
-		if book.get('title', '').lower() == title.lower():
-			if book.get('available', False):
-				return f"El libro '{title}' está disponible para préstamo."
-			else:
-				return f"El libro '{title}' no está disponible actualmente."
+	index = get_catalog_index()
+	books = [(title, index.lookup_title(title)) for title in titles]
+	get_reservation_queue().expire_due()
+	counts = get_ledger().available_copies_many(
+		title_key(book.title) for _, book in books if book is not None
+	)
 	
-	return f"No se encontró el libro '{title}' en el catálogo."
+	lines = ["Disponibilidad:"]
+	for title, book in books:
+		if book is None:
+			lines.append(f"- '{title}': no se encontró en el catálogo")
+		elif counts[title_key(book.title)] > 0:
+			lines.append(f"- '{book.title}': disponible para préstamo")
+		else:
+			lines.append(f"- '{book.title}': no disponible actualmente")
+	return "\n".join(lines)
+
+
+def search_books_batch(search_terms: List[str], limit: int = 5) -> str:
+	"""
+	Herramienta 1b: Buscar varios términos en el catálogo en una llamada.
+	
+	Args:
+		search_terms: Lista de términos (lista, JSON o separados por ';')
+		limit: Resultados máximos por término (default: 5)
+	
+	Returns:
+		JSON con los libros encontrados por término
+	"""
+	terms = list(dict.fromkeys(_as_list(search_terms)))
+	if not terms:
+		return "No se indicaron términos de búsqueda."
+	
+	index = get_catalog_index()
+	results = {
+		term: [book.to_dict() for book, _ in index.search(term, limit=int(limit))]
+		for term in terms
+	}
+	return json.dumps(results, ensure_ascii=False)
 
 
 def create_loan(user_id: str, book_title: str, days: int = 14) -> str:
 	"""
 	Herramienta 3: Crear un préstamo de libro.
 	
+	El préstamo se registra en el ledger de forma atómica: si dos sesiones
+	piden la última copia a la vez, solo una lo obtiene.
+	
 	Args:
 		user_id: ID del usuario
 		book_title: Título del libro
@@ -100,36 +165,60 @@ def create_loan(user_id: str, book_title: str, days: int = 14) -> str:
 	Returns:
 		Confirmación del préstamo
 	"""
-	due_date = datetime.now() + timedelta(days=days)
-	due_str = due_date.strftime('%Y-%m-%d')
+	days = int(days)
+	book = get_catalog_index().lookup_title(book_title)
+	if book is None:
+		return f"No se puede crear el préstamo: No se encontró el libro '{book_title}' en el catálogo."
 	
-	# Validar disponibilidad
-	availability = check_availability(book_title)
-	if "está disponible" not in availability:
-		return f"No se puede crear el préstamo: {availability}"
+	get_reservation_queue().expire_due()
+	loan = get_ledger().checkout(user_id, title_key(book.title), days)
+	if loan is None:
+		return f"No se puede crear el préstamo: El libro '{book.title}' no está disponible actualmente."
+	
+	due_str = datetime.fromtimestamp(loan['due_at']).strftime('%Y-%m-%d')
 	
 	return (f"Préstamo creado exitosamente:\n"
-	        f"- Libro: {book_title}\n"
+	        f"- N° de préstamo: {loan['loan_id']}\n"
+	        f"- Libro: {book.title}\n"
 	        f"- Usuario: {user_id}\n"
 	        f"- Fecha de vencimiento: {due_str}\n"
 	        f"- Duración: {days} días")
 
 
-def calculate_fine(days_overdue: int, base_fine: float = 500.0) -> str:
+def calculate_fine(days_overdue: Union[int, str], base_fine: Optional[float] = None) -> str:
 	"""
 	Herramienta 4: Calcular multa por retraso en devolución.
 	
+	Si en lugar de días recibe un ID de usuario (ledger.USER_ID_PATTERN),
+	responde con el total adeudado según la última evaluación masiva de
+	multas (agents/fines.py). En otro texto ("5 días") se usa el primer número.
+	
 	Args:
-		days_overdue: Días de retraso
-		base_fine: Multa base por día
+		days_overdue: Días de retraso, o ID de usuario
+		base_fine: Multa base por día (default: tarifa del reglamento)
 	
 	Returns:
 		Cálculo de multa en formato legible
 	"""
+	assessor = get_fine_assessor()
+	
+	# Los parámetros llegan como texto desde el agente
+	try:
+		days_overdue = int(days_overdue)
+	except ValueError:
+		text = str(days_overdue).strip()
+		if USER_ID_PATTERN.match(text) and not _DAYS_TEXT.match(text):
+			return _user_fine_summary(assessor, text)
+		number = re.search(r'\d+', text)
+		if number is None:
+			raise ValueError(f"días de retraso no válidos: '{text}' (usar un número o un ID de usuario)")
+		days_overdue = int(number.group())
+	base_fine = assessor.rules['default_rate'] if base_fine is None else float(base_fine)
+	
 	if days_overdue <= 0:
 		return "No hay multa aplicable."
 	
-	total_fine = days_overdue * base_fine
+	total_fine = min(days_overdue * base_fine, assessor.rules['cap'])
 	
 	return (f"Cálculo de multa:\n"
 	        f"- Días de retraso: {days_overdue}\n"
@@ -137,35 +226,91 @@ def calculate_fine(days_overdue: int, base_fine: float = 500.0) -> str:
 	        f"- Total a pagar: ${total_fine:,.0f} CLP")
 
 
-def get_policies(query: str) -> str:
+# Días escritos junto al número ("10d", "5dias"), que también parecen un ID
+_DAYS_TEXT = re.compile(r'^\d+\s*d(?:[ií]as?)?$', re.IGNORECASE)
+
+
+def _user_fine_summary(assessor, user_id: str) -> str:
+	"""Total de multas de un usuario según la última evaluación."""
+	fines = assessor.user_total(user_id)
+	if fines is None or fines['total'] <= 0:
+		return f"El usuario {user_id} no registra multas pendientes."
+	
+	assessed_str = datetime.fromtimestamp(fines['assessed_at']).strftime('%Y-%m-%d %H:%M')
+	summary = (f"Multas pendientes del usuario {user_id}:\n"
+	           f"- Total adeudado: ${fines['total']:,.0f} CLP\n"
+	           f"- Calculado el: {assessed_str}")
+	if fines['blocked']:
+		summary += "\n- Préstamos bloqueados hasta regularizar el pago"
+	return summary
+
+
+def get_policies(query: str, limit: int = 3) -> str:
 	"""
 	Herramienta 5: Consultar políticas y reglamentos de la biblioteca.
 	
+	Busca en el índice de secciones de políticas, reglamento de multas y
+	procedimientos, y retorna las secciones más relevantes (hasta
+	MAX_POLICY_CHARS caracteres).
+	
 	Args:
 		query: Consulta sobre políticas
+		limit: Número máximo de secciones (default: 3)
 	
 	Returns:
-		Información relevante de las políticas
+		Secciones relevantes de las políticas
 	"""
-	try:
-		with open(POLICIES_PATH, 'r', encoding='utf-8') as f:
-			content = f.read()
-		
-		# Buscar términos clave en las políticas
-		query_lower = query.lower()
-		
-		# Retornar secciones relevantes basadas en la consulta
-		if 'día' in query_lower or 'días' in query_lower:
-			return "Según las políticas: El préstamo de libros es por 14 días naturales con posibilidad de renovación."
-		elif 'multa' in query_lower or 'retraso' in query_lower:
-			return "Según las políticas: Las multas se calculan a razón de $500 CLP por día de retraso."
-		elif 'renovación' in query_lower or 'renovar' in query_lower:
-			return "Según las políticas: Se puede renovar el préstamo hasta 2 veces si no hay reservas pendientes."
-		else:
-			return "Las políticas de la biblioteca incluyen: préstamos de 14 días, renovaciones permitidas, y multas por retraso."
-			
-	except:
+	index = get_policy_index()
+	sections = index.search(query, limit=int(limit))
+	
+	if sections:
+		header = "Según las políticas de la biblioteca:"
+	elif index.sections:
+		header = "No se encontró una sección específica; resumen de las políticas:"
+		sections = index.sections
+	else:
 		return "No se pudo acceder a las políticas en este momento."
+	
+	lines = [header]
+	size = len(header)
+	for section in sections:
+		line = f"- [{section.heading}] {section.text}"
+		if size + len(line) + 1 > MAX_POLICY_CHARS and len(lines) > 1:
+			break
+		lines.append(line)
+		size += len(line) + 1
+	return "\n".join(lines)
+
+
+def return_book(loan_id: int) -> str:
+	"""
+	Herramienta 7: Registrar la devolución de un préstamo.
+	
+	Si el título tiene reservas pendientes, la copia devuelta se aparta para
+	el siguiente de la cola en la misma transacción.
+	
+	Args:
+		loan_id: N° de préstamo
+	
+	Returns:
+		Confirmación de la devolución
+	"""
+	# El evaluador fija la multa del préstamo al cerrarlo (listener del ledger)
+	assessor = get_fine_assessor()
+	returned = get_reservation_queue().return_loan(int(loan_id))
+	if returned is None:
+		return f"No se puede registrar la devolución: el préstamo {loan_id} no existe o ya fue devuelto."
+	
+	fine = assessor.loan_fine(int(loan_id))
+	fine_line = f"\n- Multa por atraso a pagar: ${fine:,.0f} CLP" if fine > 0 else ""
+	if returned['promoted_user']:
+		return (f"Devolución registrada:\n"
+		        f"- N° de préstamo: {loan_id}\n"
+		        f"- La copia quedó apartada para el usuario {returned['promoted_user']} (reserva en espera)"
+		        + fine_line)
+	return (f"Devolución registrada:\n"
+	        f"- N° de préstamo: {loan_id}\n"
+	        f"- La copia quedó disponible para préstamo" + fine_line)
 
 
 def reserve_book(user_id: str, book_title: str) -> str:
@@ -179,24 +324,67 @@ def reserve_book(user_id: str, book_title: str) -> str:
 	Returns:
 		Confirmación de reserva
 	"""
+	book = get_catalog_index().lookup_title(book_title)
+	if book is None:
+		return f"No se puede reservar: No se encontró el libro '{book_title}' en el catálogo."
+	
+	reservation = get_reservation_queue().enqueue(user_id, title_key(book.title))
+	
+	if reservation['status'] == 'limit':
+		return (f"No se puede reservar '{book.title}': el usuario {user_id} ya tiene "
+		        f"{MAX_ACTIVE_RESERVATIONS} reservas activas (máximo permitido).")
+	
+	if reservation['status'] == 'ready':
+		pickup_str = datetime.fromtimestamp(reservation['expires_at']).strftime('%Y-%m-%d %H:%M')
+		return (f"Reserva lista para retiro:\n"
+		        f"- N° de reserva: {reservation['reservation_id']}\n"
+		        f"- Libro: {book.title}\n"
+		        f"- Usuario: {user_id}\n"
+		        f"- Estado: Copia apartada\n"
+		        f"- Retirar antes de: {pickup_str}")
+	
 	return (f"Reserva creada exitosamente:\n"
-	        f"- Libro: {book_title}\n"
+	        f"- N° de reserva: {reservation['reservation_id']}\n"
+	        f"- Libro: {book.title}\n"
 	        f"- Usuario: {user_id}\n"
 	        f"- Estado: Pendiente\n"
+	        f"- Posición en la cola: {reservation['position']}\n"
 	        f"- Se le notificará cuando el libro esté disponible")
 
 
-# Lista de herramientas disponibles para el agente
+# Lista de herramientas disponibles para el agente.
+# 'cacheable': resultados reutilizables por 'ttl' segundos (solo lectura);
+# 'sources': datos de los que dependen (se invalidan cuando cambian)
 AGENT_TOOLS = [
 	{
 		'name': 'search_book',
-		'description': 'Busca libros en el catálogo por título, autor o género. Input: término de búsqueda.',
-		'func': search_book
+		'description': 'Busca libros en el catálogo por título, autor o sección. Input: término de búsqueda, límite de resultados (opcional, default 10).',
+		'func': search_book,
+		'cacheable': True,
+		'sources': ('catalog',)
 	},
 	{
 		'name': 'check_availability',
 		'description': 'Verifica si un libro específico está disponible. Input: título del libro.',
-		'func': check_availability
+		'func': check_availability,
+		'cacheable': True,
+		'ttl': 60,
+		'sources': ('catalog', 'ledger')
+	},
+	{
+		'name': 'check_availability_many',
+		'description': 'Verifica la disponibilidad de varios libros en una sola llamada. Input: títulos separados por punto y coma (;).',
+		'func': check_availability_many,
+		'cacheable': True,
+		'ttl': 60,
+		'sources': ('catalog', 'ledger')
+	},
+	{
+		'name': 'search_books_batch',
+		'description': 'Busca varios términos en el catálogo en una sola llamada. Input: términos separados por punto y coma (;).',
+		'func': search_books_batch,
+		'cacheable': True,
+		'sources': ('catalog',)
 	},
 	{
 		'name': 'create_loan',
@@ -205,17 +393,28 @@ AGENT_TOOLS = [
 	},
 	{
 		'name': 'calculate_fine',
-		'description': 'Calcula la multa por retraso en devolución. Input: días de retraso.',
-		'func': calculate_fine
+		'description': 'Calcula la multa por retraso en devolución. Input: días de retraso, o ID de usuario para consultar cuánto debe.',
+		'func': calculate_fine,
+		'cacheable': True,
+		'ttl': 60,
+		'sources': ('ledger',)
 	},
 	{
 		'name': 'get_policies',
 		'description': 'Consulta políticas y reglamentos de la biblioteca. Input: consulta sobre políticas.',
-		'func': get_policies
+		'func': get_policies,
+		'cacheable': True,
+		'ttl': 600,
+		'sources': ('policies',)
 	},
 	{
 		'name': 'reserve_book',
 		'description': 'Reserva un libro no disponible. Input: ID de usuario, título del libro.',
 		'func': reserve_book
+	},
+	{
+		'name': 'return_book',
+		'description': 'Registra la devolución de un préstamo y atiende la cola de reservas. Input: N° de préstamo.',
+		'func': return_book
 	}
 ]
@@ -8,12 +8,14 @@ IE5: Planificación de tareas
 IE6: Toma de decisiones adaptativas
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import requests
 import os
 import time
+import json
 
 # Importar el agente y sus dependencias
 import sys
@@ -21,9 +23,12 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from agents.agent import get_agent
+from agents.executor import get_agent_executor, AdmissionRejected
+from agents.tool_registry import get_tool_registry
 from monitoring.metrics import get_metrics_collector
 from monitoring.logger import get_logger
 from monitoring.security import SecurityValidator, get_rate_limiter
+from utils.single_flight import AsyncSingleFlight, flight_key
 
 # Base de Ollama y modelo LLM a utilizar
 OLLAMA_URL = os.environ.get("OLLAMA_BASE", "http://localhost:11434")
@@ -47,11 +52,17 @@ app.add_middleware(
 # Instancia global del agente
 agent = get_agent()
 
+# Pool acotado para ejecutar el agente fuera del event loop
+agent_executor = get_agent_executor()
+
 # Sistema de observabilidad
 metrics = get_metrics_collector()
 logger = get_logger("backend/logs")
 rate_limiter = get_rate_limiter()
 
+# Preguntas idénticas concurrentes comparten una sola ejecución del agente
+chat_flight = AsyncSingleFlight('chat')
+
 class ChatRequest(BaseModel):
 	"""Payload de entrada del endpoint de chat."""
 	question: str
@@ -71,6 +82,17 @@ class PlanResponse(BaseModel):
 	objective: str
 
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+	"""Agente saturado: rechazo inmediato para que el cliente reintente más tarde."""
+	logger.warning('admission_rejected', {'path': request.url.path, 'reason': exc.reason})
+	return JSONResponse(
+		status_code=exc.status_code,
+		content={"detail": str(exc), "reason": exc.reason},
+		headers={"Retry-After": str(exc.retry_after)}
+	)
+
+
 @app.get("/")
 async def root():
 	"""Endpoint raíz con información de la API."""
@@ -79,6 +101,7 @@ async def root():
 		"description": "Agente funcional con memoria, herramientas y planificación",
 		"endpoints": {
 			"/api/chat": "Chat con el agente",
+			"/api/chat/stream": "Chat con el agente en streaming (SSE)",
 			"/api/plan": "Planificar tareas",
 			"/api/tools": "Listar herramientas disponibles",
 			"/api/memory": "Consultar memoria del agente"
@@ -100,11 +123,73 @@ async def chat(req: ChatRequest):
 	# Generar trace ID único para trazabilidad
 	trace_id = logger.generate_trace_id()
 	
+	rejection = _validate_request(req)
+	if rejection:
+		return ChatResponse(answer=rejection)
+	
+	# El agente es síncrono: se ejecuta en el pool para no bloquear el event loop.
+	# Si la misma pregunta (con la misma memoria) ya está en ejecución, se
+	# espera ese resultado en lugar de generar otra respuesta.
+	key = flight_key(req.question, 'agent', agent.memory.fingerprint())
+	deadline = agent_executor.deadline()
+	answer = await chat_flight.do(
+		key, lambda: agent_executor.run(_process_chat, req, trace_id, deadline, deadline=deadline)
+	)
+	return ChatResponse(answer=answer)
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(req: ChatRequest):
+	"""
+	Chat con el agente en streaming (Server-Sent Events).
+	
+	Los pasos ReAct se emiten como eventos 'thought', 'action' y 'observation';
+	la respuesta final llega token a token en eventos 'token' y termina con
+	un evento 'done' que contiene la respuesta completa.
+	"""
+	trace_id = logger.generate_trace_id()
+	
+	rejection = _validate_request(req)
+	if not rejection:
+		# Con la cola llena se responde 503 antes de abrir el stream
+		agent_executor.check_admission()
+	
+	async def event_source():
+		if rejection:
+			yield _sse({'type': 'done', 'answer': rejection})
+			return
+		deadline = agent_executor.deadline()
+		try:
+			async for event in agent_executor.stream(_process_chat_stream, req, trace_id, deadline, deadline=deadline):
+				yield _sse(event)
+		except AdmissionRejected as e:
+			yield _sse({'type': 'error', 'message': str(e)})
+			yield _sse({'type': 'done', 'answer': f"⚠️ {e}"})
+	
+	return StreamingResponse(
+		event_source(),
+		media_type="text/event-stream",
+		headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+	)
+
+
+def _sse(event: dict) -> str:
+	"""Serializa un evento del agente en formato Server-Sent Events."""
+	return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def _validate_request(req: ChatRequest):
+	"""
+	IE6: Validaciones de seguridad previas a ejecutar el agente.
+	
+	Returns:
+		Mensaje para el usuario si el request se rechaza, None si es válido
+	"""
 	# IE6: Validación de seguridad - Rate Limiting
 	is_allowed, rate_error = rate_limiter.check_rate_limit(req.session_id)
 	if not is_allowed:
 		logger.warning('rate_limit_exceeded', {'session_id': req.session_id})
-		return ChatResponse(answer=f"⚠️ {rate_error}. Por favor espera un momento.")
+		return f"⚠️ {rate_error}. Por favor espera un momento."
 	
 	# IE6: Validación de seguridad - Prompt Injection
 	is_valid, validation_error = SecurityValidator.validate_input(req.question)
@@ -114,8 +199,20 @@ async def chat(req: ChatRequest):
 			'error': validation_error
 		})
 		metrics.track_error('security', 'InvalidInput', validation_error)
-		return ChatResponse(answer="⚠️ Por seguridad, no puedo procesar esta consulta.")
+		return "⚠️ Por seguridad, no puedo procesar esta consulta."
+	
+	return None
+
+
+def _process_chat(req: ChatRequest, trace_id: str, deadline: float = None) -> str:
+	"""
+	Ejecuta el agente para un request ya validado (en un hilo del pool).
+	
+	El agente ajusta su razonamiento para responder antes de `deadline`.
 	
+	Returns:
+		Respuesta del agente o mensaje de error
+	"""
 	# Iniciar tracking de métricas y logging
 	start_time = time.time()
 	
@@ -127,7 +224,7 @@ async def chat(req: ChatRequest):
 	try:
 		# Usar el agente con memoria y herramientas
 		agent_start = time.time()
-		answer = agent.think(req.question)
+		answer = agent.think(req.question, deadline=deadline)
 		agent_end = time.time()
 		
 		# Registrar latencia del agente
@@ -146,7 +243,7 @@ async def chat(req: ChatRequest):
 		if len(metrics.metrics_data['requests']) % 10 == 0:
 			metrics.save_to_file('backend/logs/metrics.json')
 		
-		return ChatResponse(answer=answer)
+		return answer
 		
 	except Exception as e:
 		# Registrar error
@@ -164,7 +261,54 @@ async def chat(req: ChatRequest):
 		# Guardar métricas en caso de error
 		metrics.save_to_file('backend/logs/metrics.json')
 		
-		return ChatResponse(answer=f"Error en el agente: {error_msg}")
+		return f"Error en el agente: {error_msg}"
+
+
+def _process_chat_stream(req: ChatRequest, trace_id: str, deadline: float = None):
+	"""
+	Versión en streaming de _process_chat (se consume en un hilo del pool).
+	
+	Yields:
+		Eventos del agente; en caso de error, un evento 'error' y uno 'done'
+	"""
+	start_time = time.time()
+	
+	sanitized_query = SecurityValidator.sanitize_pii(req.question)
+	metrics.start_request(trace_id, sanitized_query, req.session_id)
+	logger.log_request_start(trace_id, sanitized_query, req.session_id)
+	
+	try:
+		answer = ""
+		first_token_time = None
+		for event in agent.think_stream(req.question, deadline=deadline):
+			if event['type'] == 'token' and first_token_time is None:
+				first_token_time = time.time()
+				metrics.track_component('agent.first_token', start_time, first_token_time)
+			if event['type'] == 'done':
+				answer = event['answer']
+			yield event
+		
+		end_time = time.time()
+		metrics.track_component('agent.think', start_time, end_time, {
+			'query_length': len(req.question),
+			'response_length': len(answer)
+		})
+		metrics.end_request(answer, status="success")
+		logger.log_request_end(answer, status="success", latency=end_time - start_time)
+		
+	except Exception as e:
+		error_msg = str(e)
+		
+		metrics.track_error('api', type(e).__name__, error_msg)
+		metrics.end_request("", status="error")
+		logger.error('request_failed', {
+			'error_type': type(e).__name__,
+			'error_message': error_msg,
+			'latency': time.time() - start_time
+		})
+		
+		yield {'type': 'error', 'message': error_msg}
+		yield {'type': 'done', 'answer': f"Error en el agente: {error_msg}"}
 
 
 @app.get("/api/metrics")
@@ -195,24 +339,25 @@ async def plan(req: PlanRequest):
 	Crea un plan jerárquico para alcanzar un objetivo.
 	"""
 	try:
-		steps = agent.plan_task(req.objective)
+		steps = await agent_executor.run(agent.plan_task, req.objective)
 		
 		return PlanResponse(plan=steps, objective=req.objective)
+	except AdmissionRejected:
+		raise
 	except Exception as e:
 		return PlanResponse(plan=[f"Error: {str(e)}"], objective=req.objective)
 
 
 @app.get("/api/tools")
 async def list_tools():
-	"""Lista las herramientas disponibles del agente."""
-	# Herramientas hardcodeadas para evitar problemas de importación
+	"""Lista las herramientas disponibles del agente (desde el registro de herramientas)."""
 	tools = [
-		{"name": "search_book", "description": "Buscar libros por término"},
-		{"name": "check_availability", "description": "Verificar disponibilidad de un libro"},
-		{"name": "create_loan", "description": "Crear un préstamo"},
-		{"name": "calculate_fine", "description": "Calcular multa por retraso"},
-		{"name": "get_policies", "description": "Consultar políticas"},
-		{"name": "reserve_book", "description": "Reservar un libro"}
+		{
+			"name": spec.name,
+			"description": spec.description.split(' Input:')[0],
+			"parameters": spec.schema
+		}
+		for spec in get_tool_registry().specs.values()
 	]
 	return {"tools": tools}
 
@@ -1,6 +1,11 @@
 from langchain_community.llms import Ollama
+from langchain_community.chat_models import ChatOllama
 from langchain_community.embeddings import OllamaEmbeddings
 from typing import Optional
+import os
+
+from .llm_cache import with_cache
+from .token_budget import LLM_NUM_CTX
 
 """
 IL1.3 - Integración LLM + Herramientas de Recuperación
@@ -9,10 +14,34 @@ IL1.3 - Integración LLM + Herramientas de Recuperación
 """
 
 OLLAMA_BASE = "http://localhost:11434"
+# Mantiene el modelo (y su caché KV) cargado entre llamadas consecutivas
+OLLAMA_KEEP_ALIVE = "30m"
+# Temperatura por defecto (sin definir = valor por defecto del modelo, sin caché);
+# con LLM_TEMPERATURE=0 las respuestas son deterministas y se cachean
+_temperature = os.environ.get("LLM_TEMPERATURE", "")
+LLM_TEMPERATURE = float(_temperature) if _temperature else None
+
+# Cascada de modelos (opcional, p. ej. OLLAMA_SMALL_MODEL=qwen2.5-coder:1.5b):
+# el pequeño elige acciones y planifica, el grande redacta la respuesta final
+# (vacío o igual al grande = un solo modelo)
+LLM_MODEL = os.environ.get("OLLAMA_MODEL", "qwen2.5-coder:7b")
+LLM_SMALL_MODEL = os.environ.get("OLLAMA_SMALL_MODEL", "")
+
+
+def get_llm(model: str = LLM_MODEL, temperature: Optional[float] = LLM_TEMPERATURE) -> Ollama:
+	# Envuelto con la caché de completions (models/llm_cache.py)
+	# num_ctx fijo: los prompts se ajustan a esa ventana (models/token_budget.py)
+	return with_cache(Ollama(model=model, base_url=OLLAMA_BASE, keep_alive=OLLAMA_KEEP_ALIVE,
+	                         temperature=temperature, num_ctx=LLM_NUM_CTX))
 
 
-def get_llm(model: str = "qwen2.5-coder:7b") -> Ollama:
-	return Ollama(model=model, base_url=OLLAMA_BASE)
+def get_chat_llm(model: str = LLM_MODEL, format: Optional[str] = None,
+                 temperature: Optional[float] = LLM_TEMPERATURE) -> ChatOllama:
+	# Cliente por mensajes: un prefijo (system + turnos previos) idéntico entre
+	# llamadas permite a Ollama reutilizar la caché KV y evaluar solo lo nuevo.
+	# format="json" restringe la salida a JSON válido
+	return with_cache(ChatOllama(model=model, base_url=OLLAMA_BASE, keep_alive=OLLAMA_KEEP_ALIVE,
+	                             format=format, temperature=temperature, num_ctx=LLM_NUM_CTX))
 
 
 def get_embeddings(model: str = "nomic-embed-text"):
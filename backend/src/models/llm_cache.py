@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from monitoring.metrics import get_metrics_collector
+
+"""
+IL1.3 - Caché de completions del LLM
+- Las llamadas con prompt idéntico (mismo modelo, opciones y texto) se
+  responden sin invocar a Ollama: pruebas de regresión, preguntas frecuentes
+  con memoria vacía, pasos ReAct repetidos.
+- Nivel L1: LRU en memoria del proceso. Nivel L2: SQLite en disco, compartido
+  entre reinicios, con límite de tamaño (se descartan las entradas menos usadas).
+- Solo se cachean configuraciones deterministas (temperature == 0).
+"""
+
+LLM_CACHE_PATH = os.environ.get(
+	"LLM_CACHE_PATH",
+	os.path.abspath(os.path.join(os.path.dirname(__file__), '../../.llm_cache/completions.db'))
+)
+LLM_CACHE_L1_SIZE = int(os.environ.get("LLM_CACHE_L1_SIZE", "512"))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") == "1"
+
+# Cada cuántas escrituras en L2 se verifica el límite de tamaño
+_L2_SIZE_CHECK_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+	key TEXT PRIMARY KEY,
+	model TEXT NOT NULL,
+	response TEXT NOT NULL,
+	metadata TEXT NOT NULL DEFAULT '{}',
+	size INTEGER NOT NULL,
+	created_at REAL NOT NULL,
+	last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_completions_lru ON completions (last_used_at);
+"""
+
+
+class CompletionCache:
+	"""Caché de dos niveles (memoria + SQLite) de respuestas del LLM."""
+
+	def __init__(self, path: str = LLM_CACHE_PATH, l1_size: int = LLM_CACHE_L1_SIZE,
+	             max_bytes: int = LLM_CACHE_MAX_BYTES):
+		self.path = path
+		self.l1_size = l1_size
+		self.max_bytes = max_bytes
+		self._l1: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+		self._lock = threading.Lock()
+		self._local = threading.local()
+		self._writes = 0
+		if os.path.dirname(path):
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+		self._conn().executescript(SCHEMA)
+
+	def _conn(self) -> sqlite3.Connection:
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			self._local.conn = conn
+		return conn
+
+	def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any], str]]:
+		"""
+		Busca una respuesta cacheada.
+
+		Returns:
+			(respuesta, metadatos, nivel 'l1'/'l2'), o None
+		"""
+		with self._lock:
+			entry = self._l1.get(key)
+			if entry is not None:
+				self._l1.move_to_end(key)
+				return entry[0], entry[1], 'l1'
+
+		conn = self._conn()
+		row = conn.execute("SELECT response, metadata FROM completions WHERE key = ?", (key,)).fetchone()
+		if row is None:
+			return None
+		conn.execute("UPDATE completions SET last_used_at = ? WHERE key = ?", (time.time(), key))
+		metadata = json.loads(row[1])
+		self._put_l1(key, row[0], metadata)
+		return row[0], metadata, 'l2'
+
+	def put(self, key: str, model: str, response: str, metadata: Dict[str, Any]):
+		"""Guarda una respuesta en ambos niveles."""
+		self._put_l1(key, response, metadata)
+		now = time.time()
+		conn = self._conn()
+		conn.execute(
+			"INSERT OR REPLACE INTO completions (key, model, response, metadata, size, created_at, last_used_at) "
+			"VALUES (?, ?, ?, ?, ?, ?, ?)",
+			(key, model, response, json.dumps(metadata), len(response.encode('utf-8')), now, now)
+		)
+		with self._lock:
+			self._writes += 1
+			check = self._writes % _L2_SIZE_CHECK_EVERY == 0
+		if check:
+			self._enforce_size(conn)
+
+	def _put_l1(self, key: str, response: str, metadata: Dict[str, Any]):
+		with self._lock:
+			self._l1[key] = (response, metadata)
+			self._l1.move_to_end(key)
+			while len(self._l1) > self.l1_size:
+				self._l1.popitem(last=False)
+
+	def _enforce_size(self, conn: sqlite3.Connection):
+		"""Descarta las entradas menos usadas hasta quedar bajo el 90% del límite."""
+		total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+		if total <= self.max_bytes:
+			return
+		target = total - int(self.max_bytes * 0.9)
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			freed = 0
+			for key, size in conn.execute("SELECT key, size FROM completions ORDER BY last_used_at").fetchall():
+				conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+				freed += size
+				if freed >= target:
+					break
+			conn.execute("COMMIT")
+		except BaseException:
+			if conn.in_transaction:
+				conn.execute("ROLLBACK")
+			raise
+
+
+def _prompt_payload(prompt: Any) -> Any:
+	"""Representación serializable del prompt (texto o lista de mensajes)."""
+	if isinstance(prompt, str):
+		return prompt
+	return [(getattr(m, 'type', ''), getattr(m, 'content', str(m))) for m in prompt]
+
+
+class CachedLLM:
+	"""
+	Envoltorio de un cliente Ollama (Ollama o ChatOllama) con caché de completions.
+
+	Expone invoke() y stream() con la misma firma; el resto de los atributos
+	se delegan al cliente. Con temperature distinta de 0 no se usa la caché.
+	"""
+
+	def __init__(self, llm, cache: CompletionCache):
+		self.llm = llm
+		self.cache = cache
+		self.is_chat = isinstance(llm, BaseChatModel)
+		self.metrics = get_metrics_collector()
+
+	def __getattr__(self, name):
+		return getattr(self.llm, name)
+
+	@property
+	def deterministic(self) -> bool:
+		return getattr(self.llm, 'temperature', None) == 0
+
+	def _client_params(self) -> Dict[str, Any]:
+		"""
+		Parámetros que el cliente envía a Ollama (modelo, formato y todas las
+		opciones: temperatura, num_ctx, top_k/top_p, num_predict, etc.).
+		"""
+		params = getattr(self.llm, '_default_params', None)
+		if not isinstance(params, dict):
+			params = {
+				'model': self.llm.model,
+				'format': getattr(self.llm, 'format', None),
+				'options': {'temperature': self.llm.temperature}
+			}
+		# keep_alive solo afecta cuánto tiempo queda cargado el modelo
+		return {k: v for k, v in params.items() if k != 'keep_alive'}
+
+	def _key(self, prompt: Any, stop, kwargs: Dict[str, Any]) -> str:
+		payload = {
+			'client': self._client_params(),
+			'call': {'stop': list(stop) if stop else None, **kwargs},
+			'prompt': _prompt_payload(prompt)
+		}
+		return hashlib.sha256(
+			json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+		).hexdigest()
+
+	def _wrap(self, text: str, metadata: Dict[str, Any], chunk: bool = False):
+		if not self.is_chat:
+			return text
+		cls = AIMessageChunk if chunk else AIMessage
+		return cls(content=text, response_metadata=metadata)
+
+	def invoke(self, prompt: Any, stop=None, **kwargs):
+		if not self.deterministic:
+			self.metrics.track_llm_cache('bypass')
+			return self.llm.invoke(prompt, stop=stop, **kwargs)
+
+		key = self._key(prompt, stop, kwargs)
+		cached = self.cache.get(key)
+		if cached is not None:
+			self.metrics.track_llm_cache(cached[2])
+			return self._wrap(cached[0], {'cache_hit': True, 'cache_tier': cached[2]})
+
+		self.metrics.track_llm_cache('miss')
+		response = self.llm.invoke(prompt, stop=stop, **kwargs)
+		text = response.content if self.is_chat else response
+		metadata = {'done_reason': (getattr(response, 'response_metadata', None) or {}).get('done_reason')}
+		self.cache.put(key, self.llm.model, text, metadata)
+		return response
+
+	def stream(self, prompt: Any, stop=None, **kwargs) -> Iterator[Any]:
+		"""
+		Streaming con caché: un acierto se entrega como un único fragmento.
+
+		Solo se guarda una generación consumida hasta el final (si quien
+		consume corta el stream, la respuesta parcial no se cachea).
+		"""
+		if not self.deterministic:
+			self.metrics.track_llm_cache('bypass')
+			yield from self.llm.stream(prompt, stop=stop, **kwargs)
+			return
+
+		key = self._key(prompt, stop, kwargs)
+		cached = self.cache.get(key)
+		if cached is not None:
+			self.metrics.track_llm_cache(cached[2])
+			yield self._wrap(cached[0], {'cache_hit': True, 'cache_tier': cached[2]}, chunk=True)
+			return
+
+		self.metrics.track_llm_cache('miss')
+		parts = []
+		chunks = self.llm.stream(prompt, stop=stop, **kwargs)
+		try:
+			for chunk in chunks:
+				parts.append(chunk.content if self.is_chat else chunk)
+				yield chunk
+		finally:
+			chunks.close()
+		self.cache.put(key, self.llm.model, ''.join(parts), {})
+
+
+# Caché global de completions
+_completion_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+def get_completion_cache() -> CompletionCache:
+	"""Retorna la caché global de completions."""
+	global _completion_cache
+	if _completion_cache is None:
+		with _cache_lock:
+			if _completion_cache is None:
+				_completion_cache = CompletionCache()
+	return _completion_cache
+
+
+def with_cache(llm):
+	"""Envuelve el cliente con la caché de completions (si está habilitada)."""
+	if not LLM_CACHE_ENABLED:
+		return llm
+	return CachedLLM(llm, get_completion_cache())
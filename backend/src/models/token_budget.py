@@ -0,0 +1,174 @@
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.metrics import get_metrics_collector
+from monitoring.logger import get_logger
+
+"""
+IL1.3 - Presupuesto de tokens de los prompts
+- Estimación rápida de tokens (sin tokenizador): evita enviar a Ollama
+  prompts que superan la ventana de contexto, que Ollama trunca en silencio.
+- El prompt se arma por secciones (system, perfil, historial, contexto
+  recuperado, observaciones); si el total supera el presupuesto se recortan
+  primero las de menor valor, conservando la parte más útil de cada una
+  (el inicio del contexto recuperado, los mensajes más recientes).
+- Cada prompt registra su desglose de tokens por sección.
+"""
+
+# Ventana de contexto configurada en Ollama (num_ctx) y tokens reservados para la respuesta
+LLM_NUM_CTX = int(os.environ.get("LLM_NUM_CTX", "4096"))
+LLM_OUTPUT_RESERVE = int(os.environ.get("LLM_OUTPUT_RESERVE", "512"))
+
+# Caracteres por token en palabras largas (los tokenizadores BPE las parten en trozos)
+CHARS_PER_TOKEN = 4
+
+TRIM_MARKER = " […]"
+
+_PIECE_RE = re.compile(r'\w+|[^\w\s]')
+
+
+def count_tokens(text: str) -> int:
+	"""
+	Estimación de tokens de un texto.
+
+	Cada signo de puntuación cuenta como un token y cada palabra como uno
+	por cada CHARS_PER_TOKEN caracteres; para español con tokenizadores
+	BPE (qwen, llama) el error típico es menor al 15%.
+	"""
+	return sum((len(piece) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN for piece in _PIECE_RE.findall(text))
+
+
+class PromptSection:
+	"""
+	Parte de un prompt.
+
+	value: prioridad para conservarla (None = no se recorta; con menor
+	       valor se recorta antes)
+	keep: 'head' conserva el inicio (contexto ordenado por relevancia),
+	      'tail' conserva el final (historial: se descarta lo más antiguo)
+	separator: unidad de recorte (se descartan unidades completas)
+	"""
+
+	__slots__ = ('name', 'text', 'value', 'keep', 'separator', 'tokens')
+
+	def __init__(self, name: str, text: str, value: Optional[int] = None,
+	             keep: str = 'head', separator: str = '\n'):
+		self.name = name
+		self.text = text or ""
+		self.value = value
+		self.keep = keep
+		self.separator = separator
+		self.tokens = count_tokens(self.text)
+
+
+def trim_text(text: str, max_tokens: int, keep: str = 'head', separator: str = '\n') -> str:
+	"""
+	Recorta un texto a max_tokens descartando unidades completas.
+
+	Si ni una unidad cabe, se corta la unidad por caracteres y se marca.
+	"""
+	if max_tokens <= 0:
+		return ""
+	if count_tokens(text) <= max_tokens:
+		return text
+
+	units = text.split(separator)
+	if keep == 'tail':
+		units.reverse()
+	kept: List[str] = []
+	used = 0
+	for unit in units:
+		tokens = count_tokens(unit)
+		if used + tokens > max_tokens:
+			if not kept:
+				# Proporción de caracteres que cabe en el presupuesto restante
+				chars = max(0, len(unit) * (max_tokens - count_tokens(TRIM_MARKER)) // max(tokens, 1))
+				kept.append(unit[:chars] + TRIM_MARKER if keep == 'head' else TRIM_MARKER + unit[-chars:] if chars else "")
+			break
+		kept.append(unit)
+		used += tokens
+	if keep == 'tail':
+		kept.reverse()
+	return separator.join(kept)
+
+
+class TokenBudget:
+	"""Reparte la ventana de contexto entre las secciones de un prompt."""
+
+	def __init__(self, num_ctx: int = LLM_NUM_CTX, output_reserve: int = LLM_OUTPUT_RESERVE):
+		self.limit = num_ctx - output_reserve
+
+	def fit(self, sections: List[PromptSection], reserve: int = 0) -> Tuple[Dict[str, str], Dict[str, Any]]:
+		"""
+		Recorta las secciones hasta que el total quepa en el presupuesto.
+
+		Args:
+			sections: Secciones del prompt
+			reserve: Tokens que se dejan libres para contenido posterior
+			         (p. ej. observaciones de herramientas)
+
+		Returns:
+			(texto final de cada sección, desglose con 'limit', 'reserve',
+			'total', 'sections' (tokens por sección) y 'trimmed' (tokens descartados))
+		"""
+		excess = sum(s.tokens for s in sections) - (self.limit - reserve)
+		texts = {s.name: s.text for s in sections}
+		tokens = {s.name: s.tokens for s in sections}
+		trimmed: Dict[str, int] = {}
+
+		trimmable = sorted((s for s in sections if s.value is not None), key=lambda s: s.value)
+		for section in trimmable:
+			if excess <= 0:
+				break
+			text = trim_text(section.text, section.tokens - excess, section.keep, section.separator)
+			after = count_tokens(text)
+			texts[section.name] = text
+			tokens[section.name] = after
+			if after < section.tokens:
+				trimmed[section.name] = section.tokens - after
+			excess -= section.tokens - after
+
+		return texts, {
+			'limit': self.limit,
+			'reserve': reserve,
+			'total': sum(tokens.values()),
+			'sections': tokens,
+			'trimmed': trimmed
+		}
+
+	def fit_text(self, text: str, available: int) -> Tuple[str, int]:
+		"""
+		Ajusta un texto que se agrega a un prompt ya armado.
+
+		Returns:
+			(texto recortado a `available` tokens, tokens descartados)
+		"""
+		tokens = count_tokens(text)
+		if tokens <= available:
+			return text, 0
+		fitted = trim_text(text, available, 'head')
+		return fitted, tokens - count_tokens(fitted)
+
+
+def record_budget(component: str, report: Dict[str, Any]):
+	"""Registra (log y métricas del request) el desglose de tokens de un prompt."""
+	get_metrics_collector().track_prompt_budget(component, report)
+	get_logger().info('prompt_budget', {'component': component, **report})
+
+
+# Presupuesto global, según la ventana de contexto configurada
+_token_budget: Optional[TokenBudget] = None
+_budget_lock = threading.Lock()
+
+def get_token_budget() -> TokenBudget:
+	"""Retorna el presupuesto de tokens global."""
+	global _token_budget
+	if _token_budget is None:
+		with _budget_lock:
+			if _token_budget is None:
+				_token_budget = TokenBudget()
+	return _token_budget
@@ -26,11 +26,38 @@ class MetricsCollector:
             'tools': defaultdict(list),
             'rag': defaultdict(list),
             'errors': [],
-            'resources': []
+            'resources': [],
+            'queue': [],
+            'llm_calls': [],
+            'early_stops': [],
+            'fast_path': [],
+            'react_runs': [],
+            'action_repairs': [],
+            'llm_cache': defaultdict(int),
+            'semantic_cache': [],
+            'coalesced': [],
+            'admission': [],
+            'deadline_hits': [],
+            'speculation': [],
+            'model_calls': [],
+            'prompt_budgets': [],
+            'observations': []
         }
-        self.current_request = None
-        self.lock = threading.Lock()
+        # Cada hilo de trabajo atiende su propio request
+        self._local = threading.local()
+        self.lock = threading.RLock()
         self.process = psutil.Process(os.getpid())
+        self.in_flight = 0
+        self.queue_depth = 0
+    
+    @property
+    def current_request(self) -> Optional[Dict[str, Any]]:
+        """Request en curso del hilo actual."""
+        return getattr(self._local, 'request', None)
+    
+    @current_request.setter
+    def current_request(self, value: Optional[Dict[str, Any]]):
+        self._local.request = value
         
     def start_request(self, trace_id: str, query: str, session_id: str = "default"):
         """Inicia el tracking de un nuevo request."""
@@ -43,6 +70,8 @@ class MetricsCollector:
                 'start_timestamp': datetime.now().isoformat(),
                 'components': {},
                 'tools_used': [],
+                'llm_calls': [],
+                'tokens_saved': 0,
                 'errors': [],
                 'resources_start': self._capture_resources()
             }
@@ -94,12 +123,18 @@ class MetricsCollector:
             self.current_request['components'][component_name] = component_data
     
     def track_tool(self, tool_name: str, latency: float, success: bool, 
-                   input_data: str = "", output_data: str = ""):
-        """Registra el uso de una herramienta del agente."""
+                   input_data: str = "", output_data: str = "", cache_hit: Optional[bool] = None):
+        """
+        Registra el uso de una herramienta del agente.
+        
+        cache_hit: True/False si la herramienta es cacheable (acierto o fallo
+        de la caché de resultados), None si no lo es.
+        """
         tool_data = {
             'tool_name': tool_name,
             'latency': latency,
             'success': success,
+            'cache_hit': cache_hit,
             'input': input_data[:200],  # Limitar tamaño
             'output': output_data[:200],
             'timestamp': datetime.now().isoformat()
@@ -110,6 +145,415 @@ class MetricsCollector:
             if self.current_request:
                 self.current_request['tools_used'].append(tool_data)
     
+    def track_llm_call(self, iteration: int, prompt_tokens: int, completion_tokens: int,
+                       latency: float, metadata: Optional[Dict] = None):
+        """
+        Registra una llamada al LLM dentro del bucle ReAct.
+        
+        prompt_tokens son los tokens de prompt que Ollama tuvo que evaluar
+        (prompt_eval_count): con caché KV solo cuenta la parte nueva del prompt.
+        """
+        call_data = {
+            'iteration': iteration,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'latency': latency,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        if metadata:
+            call_data.update(metadata)
+        
+        with self.lock:
+            self.metrics_data['llm_calls'].append(call_data)
+            if self.current_request:
+                self.current_request['llm_calls'].append(call_data)
+    
+    def track_early_stop(self, tokens_generated: int, tokens_saved: int):
+        """Registra una generación cortada por stop sequence tras una acción."""
+        with self.lock:
+            self.metrics_data['early_stops'].append({
+                'tokens_generated': tokens_generated,
+                'tokens_saved': tokens_saved,
+                'timestamp': datetime.now().isoformat()
+            })
+            if self.current_request:
+                self.current_request['tokens_saved'] += tokens_saved
+    
+    def track_fast_path(self, hit: bool, intent: Optional[str] = None, confidence: float = 0.0):
+        """Registra si una consulta se resolvió por la ruta rápida o con el LLM."""
+        with self.lock:
+            self.metrics_data['fast_path'].append({
+                'hit': hit,
+                'intent': intent,
+                'confidence': confidence,
+                'timestamp': datetime.now().isoformat()
+            })
+            if self.current_request:
+                self.current_request['fast_path'] = hit
+    
+    def _fast_path_stats(self) -> Dict[str, Any]:
+        """Aciertos de la ruta rápida frente a consultas derivadas al LLM."""
+        entries = self.metrics_data['fast_path']
+        hits = sum(1 for e in entries if e['hit'])
+        return {
+            'fast_path_hits': hits,
+            'llm_fallbacks': len(entries) - hits,
+            'fast_path_hit_rate': hits / len(entries) if entries else 0
+        }
+    
+    def track_model_call(self, tier: str, purpose: str, latency: float, prompt_tokens: int = 0,
+                         completion_tokens: int = 0, escalation: Optional[str] = None):
+        """
+        Registra una llamada al LLM según su nivel en la cascada de modelos.
+        
+        Args:
+            tier: 'small' (elige acciones y planifica) o 'large' (respuesta final)
+            purpose: 'react' o 'plan'
+            escalation: Motivo si la llamada al modelo grande reemplaza la
+                        salida del pequeño ('final_answer', 'parse_error', 'error')
+        """
+        with self.lock:
+            self.metrics_data['model_calls'].append({
+                'tier': tier,
+                'purpose': purpose,
+                'latency': latency,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'escalation': escalation,
+                'timestamp': datetime.now().isoformat()
+            })
+            if self.current_request:
+                calls = self.current_request.setdefault('model_calls', {})
+                calls[tier] = calls.get(tier, 0) + 1
+    
+    def _model_tier_stats(self) -> Dict[str, Any]:
+        """Llamadas, latencia y tokens por nivel de la cascada de modelos."""
+        calls = self.metrics_data['model_calls']
+        by_tier = defaultdict(list)
+        escalations = defaultdict(int)
+        for call in calls:
+            by_tier[call['tier']].append(call)
+            if call['escalation']:
+                escalations[call['escalation']] += 1
+        requests = self.metrics_data['requests']
+        return {
+            'llm_tiers': {
+                tier: {
+                    'calls': len(tier_calls),
+                    'avg_latency': sum(c['latency'] for c in tier_calls) / len(tier_calls),
+                    'total_latency': sum(c['latency'] for c in tier_calls),
+                    'prompt_tokens': sum(c['prompt_tokens'] for c in tier_calls),
+                    'completion_tokens': sum(c['completion_tokens'] for c in tier_calls),
+                    'avg_calls_per_request': (
+                        sum(r.get('model_calls', {}).get(tier, 0) for r in requests) / len(requests)
+                        if requests else 0
+                    )
+                }
+                for tier, tier_calls in by_tier.items()
+            },
+            'llm_escalations': sum(escalations.values()),
+            'llm_escalations_by_reason': dict(escalations)
+        }
+    
+    def track_iterations(self, iterations: int, answered: bool):
+        """Registra las iteraciones (llamadas al LLM) de un bucle ReAct."""
+        with self.lock:
+            self.metrics_data['react_runs'].append({
+                'iterations': iterations,
+                'answered': answered,
+                'timestamp': datetime.now().isoformat()
+            })
+            if self.current_request:
+                self.current_request['iterations'] = iterations
+    
+    def track_deadline(self, outcome: str, iterations: int, remaining: float):
+        """
+        Registra un bucle ReAct cortado por el plazo del request.
+        
+        Args:
+            outcome: 'forced_final' (se pidió la respuesta final antes) o
+                     'templated' (respuesta con plantilla, sin LLM)
+            iterations: Iteraciones realizadas
+            remaining: Segundos que quedaban del plazo al responder
+        """
+        with self.lock:
+            self.metrics_data['deadline_hits'].append({
+                'outcome': outcome,
+                'iterations': iterations,
+                'remaining': remaining,
+                'timestamp': datetime.now().isoformat()
+            })
+            if self.current_request:
+                self.current_request['deadline_hit'] = outcome
+    
+    def track_action_repair(self, tool_name: str, success: bool, latency: float):
+        """Registra un intento de reparar los argumentos de una acción con el LLM en modo JSON."""
+        with self.lock:
+            self.metrics_data['action_repairs'].append({
+                'tool_name': tool_name,
+                'success': success,
+                'latency': latency,
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    def track_llm_cache(self, outcome: str):
+        """
+        Registra el resultado de una consulta a la caché de completions.
+        
+        outcome: 'l1' o 'l2' (acierto en ese nivel), 'miss' o 'bypass'
+        (configuración no determinista, no se consulta la caché)
+        """
+        with self.lock:
+            self.metrics_data['llm_cache'][outcome] += 1
+            if self.current_request and outcome in ('l1', 'l2'):
+                self.current_request['llm_cache_hits'] = self.current_request.get('llm_cache_hits', 0) + 1
+    
+    def _llm_cache_stats(self) -> Dict[str, Any]:
+        """Aciertos por nivel de la caché de completions."""
+        counts = self.metrics_data['llm_cache']
+        hits = counts['l1'] + counts['l2']
+        lookups = hits + counts['miss']
+        return {
+            'llm_cache_l1_hits': counts['l1'],
+            'llm_cache_l2_hits': counts['l2'],
+            'llm_cache_misses': counts['miss'],
+            'llm_cache_bypassed': counts['bypass'],
+            'llm_cache_hit_rate': hits / lookups if lookups else 0
+        }
+    
+    def track_semantic_cache(self, outcome: str, latency_saved: float = 0.0, lookup_latency: float = 0.0):
+        """
+        Registra una consulta a la caché semántica de respuestas.
+        
+        outcome: 'hit', 'miss' o 'bypass' (la pregunta depende de la memoria)
+        """
+        with self.lock:
+            self.metrics_data['semantic_cache'].append({
+                'outcome': outcome,
+                'latency_saved': latency_saved,
+                'lookup_latency': lookup_latency,
+                'timestamp': datetime.now().isoformat()
+            })
+            if self.current_request:
+                self.current_request['semantic_cache'] = outcome
+    
+    def _semantic_cache_stats(self) -> Dict[str, Any]:
+        """Aciertos y latencia ahorrada por la caché semántica."""
+        entries = self.metrics_data['semantic_cache']
+        hits = [e for e in entries if e['outcome'] == 'hit']
+        lookups = [e for e in entries if e['outcome'] != 'bypass']
+        return {
+            'semantic_cache_hits': len(hits),
+            'semantic_cache_misses': len(lookups) - len(hits),
+            'semantic_cache_bypassed': len(entries) - len(lookups),
+            'semantic_cache_hit_rate': len(hits) / len(lookups) if lookups else 0,
+            'semantic_cache_latency_saved': sum(e['latency_saved'] for e in hits),
+            'semantic_cache_avg_lookup_latency': (
+                sum(e['lookup_latency'] for e in lookups) / len(lookups) if lookups else 0
+            )
+        }
+    
+    def track_coalesced(self, flight: str, wait_time: float):
+        """
+        Registra un request que reutilizó el resultado de otro idéntico en vuelo.
+        
+        Args:
+            flight: Punto de coalescencia ('chat', 'generate_answer')
+            wait_time: Tiempo esperando a la ejecución compartida
+        """
+        with self.lock:
+            self.metrics_data['coalesced'].append({
+                'flight': flight,
+                'wait_time': wait_time,
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    def _coalesced_stats(self) -> Dict[str, Any]:
+        """Requests servidos por una ejecución compartida."""
+        entries = self.metrics_data['coalesced']
+        by_flight = defaultdict(int)
+        for e in entries:
+            by_flight[e['flight']] += 1
+        return {
+            'coalesced_requests': len(entries),
+            'coalesced_by_flight': dict(by_flight),
+            'avg_coalesced_wait': sum(e['wait_time'] for e in entries) / len(entries) if entries else 0
+        }
+    
+    def track_speculation(self, outcome: str, tool_name: str, work_time: float = 0.0):
+        """
+        Registra el destino de una herramienta ejecutada de forma especulativa.
+        
+        Args:
+            outcome: 'hit' (la primera acción del modelo la usó), 'wasted'
+                     (se ejecutó y se descartó) o 'cancelled' (descartada antes de ejecutarse)
+            tool_name: Herramienta anticipada
+            work_time: Tiempo de ejecución desperdiciado (solo 'wasted')
+        """
+        with self.lock:
+            self.metrics_data['speculation'].append({
+                'outcome': outcome,
+                'tool_name': tool_name,
+                'work_time': work_time,
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    def _speculation_stats(self) -> Dict[str, Any]:
+        """Aciertos y trabajo desperdiciado de la ejecución especulativa."""
+        entries = self.metrics_data['speculation']
+        hits = sum(1 for e in entries if e['outcome'] == 'hit')
+        wasted = [e for e in entries if e['outcome'] == 'wasted']
+        return {
+            'speculative_calls': len(entries),
+            'speculation_hits': hits,
+            'speculation_wasted': len(wasted),
+            'speculation_cancelled': len(entries) - hits - len(wasted),
+            'speculation_hit_rate': hits / len(entries) if entries else 0,
+            'speculation_wasted_time': sum(e['work_time'] for e in wasted)
+        }
+    
+    def track_prompt_budget(self, component: str, report: Dict[str, Any]):
+        """
+        Registra el desglose de tokens por sección de un prompt.
+        
+        Args:
+            component: Quién armó el prompt ('agent', 'generate_answer')
+            report: Desglose de TokenBudget.fit ('limit', 'total', 'sections', 'trimmed')
+        """
+        with self.lock:
+            self.metrics_data['prompt_budgets'].append({
+                'component': component,
+                'total': report['total'],
+                'limit': report['limit'],
+                'sections': dict(report['sections']),
+                'trimmed': dict(report['trimmed']),
+                'timestamp': datetime.now().isoformat()
+            })
+            if self.current_request:
+                self.current_request.setdefault('prompt_budget', {})[component] = report
+    
+    def _prompt_budget_stats(self) -> Dict[str, Any]:
+        """Tokens promedio por sección y recortes por falta de presupuesto."""
+        entries = self.metrics_data['prompt_budgets']
+        sections = defaultdict(list)
+        trimmed = defaultdict(int)
+        for e in entries:
+            for name, tokens in e['sections'].items():
+                sections[name].append(tokens)
+            for name, tokens in e['trimmed'].items():
+                trimmed[name] += tokens
+        return {
+            'prompts_budgeted': len(entries),
+            'prompts_trimmed': sum(1 for e in entries if any(e['trimmed'].values())),
+            'avg_budgeted_prompt_tokens': sum(e['total'] for e in entries) / len(entries) if entries else 0,
+            'avg_tokens_by_section': {name: sum(v) / len(v) for name, v in sections.items()},
+            'trimmed_tokens_by_section': dict(trimmed)
+        }
+    
+    def track_observation(self, tool_name: str, raw_chars: int, rendered_chars: int,
+                          raw_tokens: int, rendered_tokens: int):
+        """
+        Registra el tamaño de una observación antes y después de codificarla para el prompt.
+        
+        Args:
+            tool_name: Herramienta que produjo la observación
+            raw_chars, raw_tokens: Tamaño de la salida original
+            rendered_chars, rendered_tokens: Tamaño de la versión compacta
+        """
+        with self.lock:
+            self.metrics_data['observations'].append({
+                'tool_name': tool_name,
+                'raw_chars': raw_chars,
+                'rendered_chars': rendered_chars,
+                'raw_tokens': raw_tokens,
+                'rendered_tokens': rendered_tokens,
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    def _observation_stats(self) -> Dict[str, Any]:
+        """Tamaño original vs. compacto de las observaciones enviadas al LLM."""
+        entries = self.metrics_data['observations']
+        raw = sum(e['raw_tokens'] for e in entries)
+        rendered = sum(e['rendered_tokens'] for e in entries)
+        by_tool = defaultdict(lambda: {'count': 0, 'raw_tokens': 0, 'rendered_tokens': 0})
+        for e in entries:
+            stats = by_tool[e['tool_name']]
+            stats['count'] += 1
+            stats['raw_tokens'] += e['raw_tokens']
+            stats['rendered_tokens'] += e['rendered_tokens']
+        return {
+            'observations_encoded': len(entries),
+            'observation_raw_chars': sum(e['raw_chars'] for e in entries),
+            'observation_rendered_chars': sum(e['rendered_chars'] for e in entries),
+            'observation_raw_tokens': raw,
+            'observation_rendered_tokens': rendered,
+            'observation_token_savings': 1 - rendered / raw if raw else 0,
+            'observation_tokens_by_tool': dict(by_tool)
+        }
+    
+    def _tool_cache_stats(self) -> Dict[str, Any]:
+        """Aciertos y fallos de la caché de resultados de herramientas."""
+        hits = misses = 0
+        by_tool = {}
+        for tool_name, calls in self.metrics_data['tools'].items():
+            tool_hits = sum(1 for c in calls if c.get('cache_hit') is True)
+            tool_misses = sum(1 for c in calls if c.get('cache_hit') is False)
+            if tool_hits or tool_misses:
+                by_tool[tool_name] = tool_hits / (tool_hits + tool_misses)
+            hits += tool_hits
+            misses += tool_misses
+        return {
+            'tool_cache_hits': hits,
+            'tool_cache_misses': misses,
+            'tool_cache_hit_rate': hits / (hits + misses) if hits + misses else 0,
+            'tool_cache_hit_rate_by_tool': by_tool
+        }
+    
+    def _react_stats(self) -> Dict[str, Any]:
+        """Iteraciones por respuesta, cortes por plazo y reparaciones de argumentos."""
+        answered = [r['iterations'] for r in self.metrics_data['react_runs'] if r['answered']]
+        repairs = self.metrics_data['action_repairs']
+        repaired = sum(1 for r in repairs if r['success'])
+        hits = self.metrics_data['deadline_hits']
+        n_requests = len(self.metrics_data['requests'])
+        return {
+            'deadline_hits': len(hits),
+            'deadline_forced_final': sum(1 for h in hits if h['outcome'] == 'forced_final'),
+            'deadline_templated': sum(1 for h in hits if h['outcome'] == 'templated'),
+            'deadline_hit_rate': len(hits) / n_requests if n_requests else 0,
+            'react_answered_requests': len(answered),
+            'react_unanswered_requests': len(self.metrics_data['react_runs']) - len(answered),
+            'avg_iterations_per_answered_request': sum(answered) / len(answered) if answered else 0,
+            'action_repairs': len(repairs),
+            'action_repair_success_rate': repaired / len(repairs) if repairs else 0
+        }
+    
+    def _llm_stats(self) -> Dict[str, Any]:
+        """Estadísticas de tokens de las llamadas al LLM."""
+        calls = self.metrics_data['llm_calls']
+        n = len(calls)
+        by_iteration = defaultdict(list)
+        for call in calls:
+            by_iteration[call['iteration']].append(call['prompt_tokens'])
+        
+        requests = self.metrics_data['requests']
+        total_saved = sum(s['tokens_saved'] for s in self.metrics_data['early_stops'])
+        
+        return {
+            'total_llm_calls': n,
+            'early_stops': len(self.metrics_data['early_stops']),
+            'total_tokens_saved': total_saved,
+            'avg_tokens_saved_per_request': (
+                sum(r.get('tokens_saved', 0) for r in requests) / len(requests) if requests else 0
+            ),
+            'avg_prompt_tokens': sum(c['prompt_tokens'] for c in calls) / n if n > 0 else 0,
+            'avg_completion_tokens': sum(c['completion_tokens'] for c in calls) / n if n > 0 else 0,
+            'avg_prompt_tokens_by_iteration': {
+                it: sum(tokens) / len(tokens) for it, tokens in sorted(by_iteration.items())
+            }
+        }
+    
     def track_rag(self, component: str, latency: float, metadata: Optional[Dict] = None):
         """Registra métricas del sistema RAG."""
         rag_data = {
@@ -124,6 +568,61 @@ class MetricsCollector:
         with self.lock:
             self.metrics_data['rag'][component].append(rag_data)
     
+    def track_queue_wait(self, wait_time: float, in_flight: int):
+        """Registra el tiempo de espera en cola antes de ejecutar el agente."""
+        with self.lock:
+            self.in_flight = in_flight
+            self.metrics_data['queue'].append({
+                'wait_time': wait_time,
+                'in_flight': in_flight,
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    def set_in_flight(self, in_flight: int):
+        """Actualiza el número de requests del agente en ejecución."""
+        with self.lock:
+            self.in_flight = in_flight
+    
+    def track_admission(self, outcome: str, queue_depth: int):
+        """
+        Registra una decisión del control de admisión.
+        
+        Args:
+            outcome: 'enqueued' (espera un cupo), 'queue_full' (rechazado) o
+                     'expired' (plazo vencido en la cola, descartado)
+            queue_depth: Requests en la cola en ese momento
+        """
+        with self.lock:
+            self.queue_depth = queue_depth
+            self.metrics_data['admission'].append({
+                'outcome': outcome,
+                'queue_depth': queue_depth,
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    def set_queue_depth(self, queue_depth: int):
+        """Actualiza el número de requests esperando un cupo."""
+        with self.lock:
+            self.queue_depth = queue_depth
+    
+    def _queue_stats(self) -> Dict[str, Any]:
+        """Estadísticas de espera en la cola del pool de trabajo."""
+        waits = sorted(q['wait_time'] for q in self.metrics_data['queue'])
+        n = len(waits)
+        admission = self.metrics_data['admission']
+        depths = [a['queue_depth'] for a in admission if a['outcome'] == 'enqueued']
+        return {
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': max(depths) if depths else 0,
+            'avg_queue_depth': sum(depths) / len(depths) if depths else 0,
+            'rejected_queue_full': sum(1 for a in admission if a['outcome'] == 'queue_full'),
+            'expired_in_queue': sum(1 for a in admission if a['outcome'] == 'expired'),
+            'avg_queue_wait': sum(waits) / n if n > 0 else 0,
+            'p95_queue_wait': waits[int(n * 0.95)] if n > 0 else 0,
+            'max_queue_wait': waits[-1] if n > 0 else 0
+        }
+    
     def track_error(self, error_type: str, error_message: str, component: str):
         """Registra un error."""
         error_data = {
@@ -178,7 +677,19 @@ class MetricsCollector:
                     'tool_usage': {},
                     'most_used_tool': None,
                     'avg_cpu_percent': 0,
-                    'avg_memory_mb': 0
+                    'avg_memory_mb': 0,
+                    **self._queue_stats(),
+                    **self._llm_stats(),
+                    **self._fast_path_stats(),
+                    **self._react_stats(),
+                    **self._tool_cache_stats(),
+                    **self._llm_cache_stats(),
+                    **self._semantic_cache_stats(),
+                    **self._coalesced_stats(),
+                    **self._speculation_stats(),
+                    **self._model_tier_stats(),
+                    **self._prompt_budget_stats(),
+                    **self._observation_stats()
                 }
             
             # Latencias
@@ -220,7 +731,43 @@ class MetricsCollector:
                 
                 # Recursos
                 'avg_cpu_percent': sum(r['resource_usage']['cpu_percent'] for r in requests) / n if n > 0 else 0,
-                'avg_memory_mb': sum(r['resource_usage']['memory_mb'] for r in requests) / n if n > 0 else 0
+                'avg_memory_mb': sum(r['resource_usage']['memory_mb'] for r in requests) / n if n > 0 else 0,
+                
+                # Cola de ejecución del agente
+                **self._queue_stats(),
+                
+                # Tokens del LLM
+                **self._llm_stats(),
+                
+                # Ruta rápida sin LLM
+                **self._fast_path_stats(),
+                
+                # Iteraciones ReAct y reparación de acciones
+                **self._react_stats(),
+                
+                # Caché de resultados de herramientas
+                **self._tool_cache_stats(),
+                
+                # Caché de completions del LLM
+                **self._llm_cache_stats(),
+                
+                # Caché semántica de respuestas
+                **self._semantic_cache_stats(),
+                
+                # Requests idénticos coalescidos
+                **self._coalesced_stats(),
+                
+                # Herramientas anticipadas
+                **self._speculation_stats(),
+                
+                # Cascada de modelos
+                **self._model_tier_stats(),
+                
+                # Presupuesto de tokens de los prompts
+                **self._prompt_budget_stats(),
+                
+                # Observaciones compactas
+                **self._observation_stats()
             }
     
     def get_component_stats(self, component_name: str) -> Dict[str, Any]:
@@ -281,7 +828,22 @@ class MetricsCollector:
                 'tools': defaultdict(list),
                 'rag': defaultdict(list),
                 'errors': [],
-                'resources': []
+                'resources': [],
+                'queue': [],
+                'llm_calls': [],
+                'early_stops': [],
+                'fast_path': [],
+                'react_runs': [],
+                'action_repairs': [],
+                'llm_cache': defaultdict(int),
+                'semantic_cache': [],
+                'coalesced': [],
+                'admission': [],
+                'deadline_hits': [],
+                'speculation': [],
+                'model_calls': [],
+                'prompt_budgets': [],
+                'observations': []
             }
             self.current_request = None
 
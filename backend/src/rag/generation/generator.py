@@ -1,5 +1,9 @@
+import hashlib
+from typing import Iterator
 from .prompts import POLICIES_SYSTEM, POLICIES_USER_TEMPLATE, BOOKS_SYSTEM, BOOKS_USER_TEMPLATE
 from ...models.llm import get_llm
+from ...models.token_budget import PromptSection, get_token_budget, record_budget
+from ...utils.single_flight import SingleFlight, flight_key
 
 """
 IL1.1 - Formulación de Prompts Optimizados
@@ -9,14 +13,45 @@ IL1.3 - Arquitectura de Solución Integrada
 - Integración LLM (Ollama) + recuperación (inyectada vía "context")
   para controlar el tamaño de contexto y priorizar información relevante
   antes de invocar el modelo.
+- El prompt se ajusta al presupuesto de tokens (models/token_budget.py).
+- Preguntas idénticas concurrentes (mismo dominio y contexto) comparten
+  una sola invocación.
 """
 
-def generate_answer(question: str, context: str, domain: str = 'policies') -> str:
+_answer_flight = SingleFlight('generate_answer')
+
+
+def build_prompt(question: str, context: str, domain: str = 'policies') -> str:
 	# Selección del sistema y plantilla según dominio (políticas/libros)
-	llm = get_llm()
 	if domain == 'policies':
-		prompt = f"<system>{POLICIES_SYSTEM}</system>\n" + POLICIES_USER_TEMPLATE.format(context=context, question=question)
+		system, template = POLICIES_SYSTEM, POLICIES_USER_TEMPLATE
 	else:
-		prompt = f"<system>{BOOKS_SYSTEM}</system>\n" + BOOKS_USER_TEMPLATE.format(context=context, question=question)
+		system, template = BOOKS_SYSTEM, BOOKS_USER_TEMPLATE
+	# El contexto llega ordenado por relevancia: si no cabe en la ventana del
+	# modelo se descartan los fragmentos del final
+	texts, budget = get_token_budget().fit([
+		PromptSection('system', system),
+		PromptSection('question', template.format(context="", question=question)),
+		PromptSection('context', context, value=1, separator='\n\n'),
+	])
+	record_budget('generate_answer', budget)
+	return f"<system>{system}</system>\n" + template.format(context=texts['context'], question=question)
+
+
+def generate_answer(question: str, context: str, domain: str = 'policies') -> str:
+	# El contexto recuperado es la "memoria" de la respuesta: forma parte de la clave
+	key = flight_key(question, domain, hashlib.sha1(context.encode('utf-8')).hexdigest())
+	return _answer_flight.do(key, _invoke, question, context, domain)
+
+
+def _invoke(question: str, context: str, domain: str) -> str:
+	llm = get_llm()
 	# Invocación al LLM con el prompt construido
-	return llm.invoke(prompt)
+	return llm.invoke(build_prompt(question, context, domain))
+
+
+def generate_answer_stream(question: str, context: str, domain: str = 'policies') -> Iterator[str]:
+	# Igual que generate_answer, pero entrega los tokens a medida que Ollama los genera
+	llm = get_llm()
+	for chunk in llm.stream(build_prompt(question, context, domain)):
+		yield chunk
@@ -0,0 +1,119 @@
+"""
+IL2.1 - Coalescencia de requests idénticos (single-flight)
+IE6: Evitar generaciones duplicadas ante picos de la misma pregunta
+
+Cuando muchos usuarios hacen la misma pregunta a la vez (p. ej. tras un aviso
+de la biblioteca), cada request dispararía su propia generación en Ollama.
+Las llamadas concurrentes con la misma clave esperan a una única ejecución
+y comparten su resultado (o su excepción). La clave se descarta al terminar:
+no es una caché, solo deduplica lo que está en vuelo.
+
+La clave combina la pregunta normalizada, el dominio y una huella del
+contexto que cambia la respuesta (memoria de la sesión o contexto recuperado).
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.metrics import get_metrics_collector
+
+
+def normalize_question(question: str) -> str:
+	"""Pregunta sin mayúsculas, acentos, puntuación ni espacios repetidos."""
+	text = unicodedata.normalize('NFKD', question.lower())
+	text = ''.join(c for c in text if not unicodedata.combining(c))
+	return ' '.join(re.findall(r'\w+', text))
+
+
+def flight_key(question: str, domain: str, fingerprint: str = "") -> str:
+	"""Clave de coalescencia: pregunta normalizada + dominio + huella del contexto."""
+	raw = f"{domain}\x00{normalize_question(question)}\x00{fingerprint}"
+	return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class _Call:
+	__slots__ = ('done', 'result', 'error')
+
+	def __init__(self):
+		self.done = threading.Event()
+		self.result = None
+		self.error = None
+
+
+class SingleFlight:
+	"""Coalescencia para código síncrono (hilos)."""
+
+	def __init__(self, name: str):
+		self.name = name
+		self._calls: Dict[str, _Call] = {}
+		self._lock = threading.Lock()
+		self.metrics = get_metrics_collector()
+
+	def do(self, key: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+		"""
+		Ejecuta `func` o, si ya hay una ejecución en vuelo con la misma clave,
+		espera su resultado.
+		"""
+		with self._lock:
+			call = self._calls.get(key)
+			leader = call is None
+			if leader:
+				call = self._calls[key] = _Call()
+
+		if not leader:
+			start = time.time()
+			call.done.wait()
+			self.metrics.track_coalesced(self.name, time.time() - start)
+			if call.error is not None:
+				raise call.error
+			return call.result
+
+		try:
+			call.result = func(*args, **kwargs)
+		except BaseException as e:
+			call.error = e
+			raise
+		finally:
+			with self._lock:
+				del self._calls[key]
+			call.done.set()
+		return call.result
+
+
+class AsyncSingleFlight:
+	"""
+	Coalescencia para corrutinas (event loop de FastAPI).
+
+	La ejecución compartida corre en su propia tarea: si el cliente que la
+	inició se desconecta, los demás siguen esperando el resultado.
+	"""
+
+	def __init__(self, name: str):
+		self.name = name
+		self._tasks: Dict[str, asyncio.Task] = {}
+		self.metrics = get_metrics_collector()
+
+	async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+		"""
+		Espera el resultado de `func()` compartido entre llamadas con la misma clave.
+		"""
+		task = self._tasks.get(key)
+		if task is not None:
+			start = time.time()
+			try:
+				return await asyncio.shield(task)
+			finally:
+				self.metrics.track_coalesced(self.name, time.time() - start)
+
+		task = asyncio.ensure_future(func())
+		self._tasks[key] = task
+		task.add_done_callback(lambda t: self._tasks.pop(key, None))
+		return await asyncio.shield(task)
@@ -2,7 +2,7 @@ import streamlit as st
 from src.rag.indexing.indexer import build_or_load_vectorstore
 from src.rag.retrieval.retriever import retrieve_relevant
 from src.utils.formatting import format_context
-from src.rag.generation.generator import generate_answer
+from src.rag.generation.generator import generate_answer_stream
 from src.agents.router import detect_domain
 
 st.set_page_config(page_title="Sistema RAG Librería", page_icon="📚", layout="wide")
@@ -45,7 +45,10 @@ with col_chat:
 		domain = detect_domain(q)
 		retrieved = retrieve_relevant(vs, q, k=k)
 		ctx = format_context(retrieved)
-		answer = generate_answer(q, ctx, domain=domain)
+		st.chat_message("user").markdown(q)
+		# La respuesta se muestra a medida que el modelo la genera
+		with st.chat_message("assistant"):
+			answer = st.write_stream(generate_answer_stream(q, ctx, domain=domain))
 		st.session_state.messages.append({"role": "assistant", "content": answer})
 		st.experimental_rerun()
 